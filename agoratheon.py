@@ -6,95 +6,460 @@ v1.1: スミレん司会搭載版
 
 import sys
 import os
+import time
+import atexit
 import argparse
-import readline  # 入力履歴用
+from typing import Optional
 
 # パスを通す
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from api import API_MAP, ICONS
-from models import Discussion
-from personas import SumireHost
+from api import API_MAP, ICONS, BaseAPI
+from api.clients import role_options
+from api.ratelimit import all_limiters
+from api.resilience import ProviderError, open_breakers, unavailable
+from models import BackgroundSaver, Discussion, DiscussionStore
+from models.journal import atomic_write
+from utils.datacache import DataFileCache
+from utils.health import HEALTHY_STATUSES, HealthCache, run_checks
+from utils.hedge import Hedger
+from utils.speculation import Speculation, SpeculationStats
+from utils.summarizer import BackgroundSummarizer
+from utils import telemetry
+from utils.tokens import estimate_tokens
+
+
+# 【これまでの討論】【指示】などの見出し分のトークン数
+PROMPT_OVERHEAD_TOKENS = 16
+
+# /autorun・バッチ実行（batch.py）でスミレんに渡す入力（ユーザーの発言の代わり）
+AUTORUN_INPUT = "これまでの議論を踏まえて、次に発言すべき人を選んでください"
+
+# /autorun で次の振り分けを始める、受信中の発言の文字数
+AUTORUN_PREFETCH_CHARS = 200
+
+# /autorun の振り分けに渡す直前の発言の長さ（末尾から）
+AUTORUN_EXCERPT_CHARS = 400
+
+# 振り分けがこの秒数で決まらなければ（LLMに聞いていれば）見込みの相手を先に呼び出す
+SPECULATE_AFTER = 0.05
+
+# /summarize でそのまま渡す直近の発言数（それより前は全体のまとめ・ブロック要約で補う）
+SUMMARIZE_RECENT_MESSAGES = 20
+
+# まだ全体のまとめに入っていないブロック要約がこの数たまったら、まとめに畳み込む
+DIGEST_FOLD_BLOCKS = 4
+
+# ブロック要約・全体のまとめの最大トークン数（これで履歴の要約部分の大きさが決まる）
+BLOCK_SUMMARY_MAX_TOKENS = 512
+DIGEST_MAX_TOKENS = 1024
 
 
 class AgoraTheon:
     """AI討論会メインクラス"""
     
-    def __init__(self, discussion_file: str, data_files: list = None, auto_mode: bool = True):
+    def __init__(self, discussion_file: str, data_files: list = None, auto_mode: bool = True,
+                 streaming: bool = True, window_block: int = 8, summarize_evicted: bool = False,
+                 hedge: list = None, metrics_file: str = None, speculate: bool = False):
         self.discussion_file = discussion_file
+        self._store = DiscussionStore(discussion_file.replace('.md', '.json'))
         self.discussion = self._load_or_create(discussion_file)
+        
+        # 保存はバックグラウンドで行う（終了時に残りを書き出す）
+        self._saver = BackgroundSaver(self._store)
+        atexit.register(self._saver.close)
         self.auto_mode = auto_mode  # スミレん司会モード
+        self.streaming = streaming  # トークンを逐次表示するか
+        
+        # 履歴の区切り単位（開始位置をこの件数ごとにずらし、プロンプト先頭を固定する。0ならスライディング）
+        self.window_block = window_block
+        # 履歴から外れたブロックを要約して残すか
+        self.summarize_evicted = summarize_evicted
+        self._window_start = None  # 直近ターンの履歴開始位置
+        self._summarizer = None  # 要約のバックグラウンド実行（遅延初期化）
+        
+        # 直近ターンの計測結果（初回トークンまでの時間など）
+        self.last_turn_stats = None
+        # 発言ごとに計測値の集計を書き出すファイル（.prom なら Prometheus、それ以外は JSON）
+        self.metrics_file = metrics_file
+        # 計測値の集計（新しい発言の分だけ積み上げる）
+        self._telemetry = telemetry.TelemetryAggregate()
+        self._telemetry_count = 0  # 集計済みの発言数
+        
+        # 初回トークンが遅いときに予備リクエストを出すAI（"all" で全員）
+        self.hedge_providers = set(API_MAP.keys()) if hedge and "all" in hedge else set(hedge or [])
+        self._hedger = Hedger()
+        
+        # 司会モードで、振り分けを待たずに見込みの相手を先に呼び出すか
+        self.speculate = speculate
+        self.speculation_stats = SpeculationStats()
         
         if data_files:
-            self.discussion.data_files.extend(data_files)
+            self.discussion.add_data_files(data_files)
         
         # APIインスタンス（遅延初期化）
         self._apis = {}
         
+        # 参考資料のキャッシュ（ファイルが変わるまで読み直さない）
+        self._data_cache = DataFileCache()
+        
+        # ヘルスチェック結果のキャッシュ（遅延初期化）
+        self._health_cache = None
+        
+        # /panel 用のイベントループ（asyncクライアントを使い回すため1つを保持）
+        self._loop = None
+        
         # スミレん司会（v1.1）
         self._sumire = None
         if self.auto_mode:
             try:
+                from personas import SumireHost  # requests を使うので必要になってから読み込む
                 self._sumire = SumireHost()
+                # 最初の振り分けでモデル読み込みを待たないよう先に読み込ませる
+                self._sumire.start_warmup()
             except Exception as e:
                 print(f"⚠️ スミレん司会の初期化に失敗: {e}")
                 self.auto_mode = False
     
     def _load_or_create(self, filepath: str) -> Discussion:
-        """討論ファイルを読み込むか新規作成（JSONのみ対応）"""
+        """討論ファイルを読み込むか新規作成（スナップショットJSON + ジャーナルを再生）"""
         title = os.path.splitext(os.path.basename(filepath))[0]
-        json_file = filepath.replace('.md', '.json')
+        discussion = Discussion(title=title)
         
-        # JSONファイルがあれば読み込み
-        if os.path.exists(json_file):
-            with open(json_file, 'r', encoding='utf-8') as f:
-                return Discussion.from_json(f.read())
+        data = self._store.load(discussion.to_dict())
+        if data is not None:
+            return Discussion.from_dict(data)
         
-        return Discussion(title=title)
+        discussion.record_creation()
+        return discussion
     
     def _get_api(self, name: str):
-        """APIインスタンスを取得（遅延初期化）"""
+        """
+        APIインスタンスを取得（遅延初期化）
+        
+        Raises:
+            ValueError: 不明なAI・APIキー未設定
+            ProviderError: SDKが入っていない・読み込めない（SDKは初回使用時に読み込む）
+        """
         if name not in self._apis:
             if name not in API_MAP:
                 raise ValueError(f"Unknown API: {name}")
-            self._apis[name] = API_MAP[name]()
+            try:
+                api = API_MAP[name]()
+            except ImportError as e:
+                raise ProviderError(name, f"SDKを読み込めません: {e}") from e
+            # 履歴を区切り単位ごとに1ブロックにまとめて送る
+            api.history_block = self.window_block or 1
+            self._apis[name] = api
         return self._apis[name]
     
-    def _get_context(self) -> str:
-        """討論コンテキストを取得"""
-        context = self.discussion.get_context()
+    def _get_context(self, apis: list, prompt: str = "") -> tuple[list, str, dict]:
+        """
+        討論コンテキストを取得（参考資料 + トークン予算に収まる直近の履歴）
+        
+        参考資料と履歴は分けて返し、APIラッパー側で変わりにくい順に並べる（プロンプトキャッシュ用）
         
-        # 参考資料があれば追加
-        data_context = []
-        for filepath in self.discussion.data_files:
-            if os.path.exists(filepath):
-                with open(filepath, 'r', encoding='utf-8') as f:
-                    data_context.append(f"【資料: {filepath}】\n{f.read()}")
+        Args:
+            apis: 送信先のAPI（複数の場合は一番小さい予算に合わせる）
+            prompt: 追加のユーザープロンプト
         
-        if data_context:
-            return "\n\n".join(data_context) + "\n\n" + context
-        return context
+        Returns:
+            (履歴（発言ごと、古い順）, 参考資料ブロック,
+             {"tokens": 送信する推定トークン数, "messages": 履歴の発言数})
+        """
+        # 出来上がった要約を反映してから履歴を組み立てる
+        self._apply_summaries()
+        
+        data_block = self._data_cache.get_block(self.discussion.data_files)
+        data_tokens = self._data_cache.block_tokens if data_block else 0
+        
+        # システムプロンプト・指示・参考資料を除いた残りを履歴に使う
+        fixed_tokens = max(
+            estimate_tokens(api.SYSTEM_PROMPT) + estimate_tokens(prompt or api.DEFAULT_INSTRUCTION)
+            for api in apis
+        ) + PROMPT_OVERHEAD_TOKENS
+        budget = min(api.CONTEXT_BUDGET for api in apis) - fixed_tokens - data_tokens
+        history, history_tokens, count = self.discussion.get_context_window(
+            max(0, budget), block_size=self.window_block
+        )
+        self._window_start = self.discussion.active_count() - count
+        
+        info = {"tokens": fixed_tokens + data_tokens + history_tokens, "messages": count,
+                "summaries": len(history) - count}
+        return history, data_block, info
     
     def _auto_save(self):
-        """JSONのみ自動保存"""
-        json_file = self.discussion_file.replace('.md', '.json')
-        with open(json_file, 'w', encoding='utf-8') as f:
-            f.write(self.discussion.to_json())
+        """変更分だけジャーナルに追記（バックグラウンドでまとめて書き込み）"""
+        self._saver.submit(self.discussion.pop_events())
     
     def call_api(self, api_name: str, prompt: str = "") -> str:
-        """指定したAPIを呼び出して発言を追加"""
-        api = self._get_api(api_name)
-        context = self._get_context()
+        """指定したAPIを呼び出して発言を追加（失敗した場合は何も保存しない）"""
+        try:
+            return self._call_api(api_name, prompt)
+        except ProviderError as e:
+            return self._failure_text(api_name, e)
+    
+    def take_turn(self, api_name: str, instruction: str = "", routing_latency: float = None) -> str:
+        """
+        指示を添えて1ターン進める（バッチ実行など無人で進める用。討論の最初なら討論テーマを伝える）
+        
+        Args:
+            api_name: 発言させるAI
+            instruction: 指示（討論の最初ならテーマへの補足）
+            routing_latency: 振り分けにかかった秒数（計測値として発言に記録）
+        
+        Raises:
+            ProviderError: 呼び出しに失敗した（発言は追加しない）
+        """
+        prompt = self._build_prompt(instruction, self.discussion.get_context(max_messages=1))
+        return self._call_api(api_name, prompt, routing_latency=routing_latency)
+    
+    def route_next(self) -> Optional[tuple]:
+        """
+        スミレん司会に次の発言者を振り分けてもらう（/autorun と同じく直前の発言を添える。停止中のAIには振らない）
         
-        response = api.generate(context, prompt)
+        Returns:
+            (AI名, スミレんのセリフ, 振り分けにかかった秒数)。司会が使えなければ None
+        """
+        if self._sumire is None:
+            return None
+        last = self.discussion.get_last_message()
+        start = time.perf_counter()
+        target, intro = self._sumire.route(
+            self._autorun_input(last.speaker if last else "", last.content if last else ""),
+            self.discussion.get_context(max_messages=10), last.speaker if last else "",
+            exclude=unavailable(API_MAP.keys()))
+        return target, intro, time.perf_counter() - start
+    
+    def _call_api(self, api_name: str, prompt: str = "", routing_latency: float = None,
+                  on_partial=None, speculation: Speculation = None) -> str:
+        """
+        指定したAPIを呼び出して発言を追加
         
-        # 発言を追加
-        self.discussion.add_message(api.NAME, api.ICON, response)
+        Args:
+            api_name: 呼び出すAI
+            prompt: 指示
+            routing_latency: スミレんの振り分けにかかった秒数（計測値として発言に記録）
+            on_partial: 受信中の発言が AUTORUN_PREFETCH_CHARS 文字に達したとき（届かなければ受信完了時）に
+                        途中までのテキストを渡して1回だけ呼ぶ関数（ストリーミング時のみ）
+            speculation: 先に始めておいた api_name への呼び出し（その受信内容を使う）
+        
+        Raises:
+            ProviderError: 呼び出しに失敗した（発言は追加しない）
+        """
+        try:
+            api = self._get_api(api_name)
+        except ValueError as e:
+            # APIキー未設定など。呼び出せないAIとして扱う
+            raise ProviderError(api_name, str(e)) from e
+        deltas = None
+        start = time.perf_counter()
+        speculation_saved = None
+        if speculation is not None and speculation.name == api.NAME:
+            history, data, context_info = speculation.history, speculation.data, speculation.context_info
+            usage = speculation.usage
+            deltas = speculation.deltas()
+            # 応答時間は呼び出しを始めた時点から数え、振り分けと重なった分は別に記録する
+            speculation_saved = start - speculation.started
+            start = speculation.started
+        else:
+            history, data, context_info = self._get_context([api], prompt)
+            usage = {}
+        
+        if self.streaming:
+            # トークンを受信しながら表示し、完了後に確定
+            if deltas is None:
+                deltas = self._response_deltas(api, history, prompt, data, usage)
+            if on_partial:
+                deltas = self._watch_partial(deltas, on_partial)
+            response, ttft = self._render_stream(api, deltas)
+            if speculation_saved is not None:
+                # 採用前に受信済みの分は表示時刻ではなく受信時刻で数える
+                ttft = speculation.first_token - start if speculation.first_token is not None else None
+        elif deltas is not None or api.NAME in self.hedge_providers:
+            if deltas is None:
+                deltas = self._response_deltas(api, history, prompt, data, usage)
+            response = "".join(deltas).strip()
+            ttft = None
+        else:
+            response = api.generate(history, prompt, data=data, usage=usage)
+            ttft = None
+        total = time.perf_counter() - start
+        
+        self.last_turn_stats = {"api": api.NAME, "ttft": ttft, "total": total, "usage": usage,
+                                "speculation_saved": speculation_saved, **context_info}
+        
+        # 発言を追加（完了したテキストのみ）
+        self.discussion.add_message(api.NAME, api.ICON, response, telemetry=telemetry.make_telemetry(
+            api.NAME, api.model_id, usage, total, ttft=ttft, routing_latency=routing_latency,
+            speculation_saved=speculation_saved))
         
         # 自動保存
         self._auto_save()
+        self._write_metrics()
+        
+        # 外れたブロックを要約しておく（次のターンから使われる）
+        self._summarize_evicted()
+        
+        stats_line = f"⏱️ {self._format_turn_stats(self.last_turn_stats)}"
+        if self.streaming:
+            return stats_line
+        return f"{api.ICON}{api.NAME}: {response}\n{stats_line}"
+    
+    def _response_deltas(self, api, history: list, prompt: str, data: str, usage: dict):
+        """
+        応答のテキスト差分を返す
+        
+        ヘッジ対象のAIは、初回トークンが遅ければ予備リクエストを出して先に応答した方を使う
+        （ストリーミングOFFなら完了した方）
+        """
+        if self.streaming:
+            request = lambda u: api.stream(history, prompt, data=data, usage=u)
+        else:
+            request = lambda u: iter([api.generate(history, prompt, data=data, usage=u)])
+        
+        if api.NAME not in self.hedge_providers:
+            return request(usage)
+        return self._hedger.stream(api.NAME, request, usage)
+    
+    def _watch_partial(self, deltas, on_partial):
+        """差分をそのまま流しつつ、AUTORUN_PREFETCH_CHARS 文字たまったら on_partial を1回呼ぶ"""
+        chunks = []
+        length = 0
+        for delta in deltas:
+            if chunks is not None:
+                chunks.append(delta)
+                length += len(delta)
+                if length >= AUTORUN_PREFETCH_CHARS:
+                    on_partial("".join(chunks))
+                    chunks = None
+            yield delta
+        if chunks:
+            on_partial("".join(chunks))
+    
+    def _render_stream(self, api, deltas) -> tuple[str, float]:
+        """
+        ストリーミング応答を逐次表示
+        
+        Args:
+            api: 応答しているAPI（表示用）
+            deltas: テキスト差分のイテレータ
+        
+        Returns:
+            (応答全文, 初回トークンまでの秒数)
+        """
+        print(f"{api.ICON}{api.NAME}: ", end="", flush=True)
+        
+        start = time.perf_counter()
+        ttft = None
+        chunks = []
+        try:
+            for delta in deltas:
+                if ttft is None:
+                    ttft = time.perf_counter() - start
+                if not chunks:
+                    # generate() と同様に先頭の空白は表示しない
+                    delta = delta.lstrip()
+                    if not delta:
+                        continue
+                chunks.append(delta)
+                print(delta, end="", flush=True)
+        finally:
+            print()
+        
+        return "".join(chunks).strip(), ttft
+    
+    def _failure_text(self, api_name: str, error: ProviderError) -> str:
+        """呼び出し失敗の表示（討論には保存しない）"""
+        return f"❌ {ICONS.get(api_name, '')}{api_name}: {error}（発言は保存していません）"
+    
+    def _format_turn_stats(self, stats: dict) -> str:
+        """ターン計測結果の表示"""
+        ttft = f"{stats['ttft']:.2f}秒" if stats["ttft"] is not None else "-"
+        text = (f"初回トークン: {ttft} / 完了: {stats['total']:.2f}秒"
+                f" / 送信: 約{stats['tokens']:,}トークン（履歴 {stats['messages']}件"
+                + (f" + 要約 {stats['summaries']}件" if stats.get("summaries") else "") + "）")
+        usage = stats.get("usage")
+        if usage and usage.get("input_tokens"):
+            text += f" / キャッシュ読込: {usage['cached_tokens']:,}/{usage['input_tokens']:,}"
+        if stats.get("speculation_saved") is not None:
+            text += f" / 先行呼び出しで {stats['speculation_saved']:.2f}秒短縮"
+        return text
+    
+    def cmd_panel(self, prompt: str = "") -> str:
+        """全参加者に同じコンテキストを同時に送り、API_MAP順に発言を追加"""
+        apis = []
+        errors = []
+        for name in API_MAP.keys():
+            try:
+                apis.append(self._get_api(name))
+            except Exception as e:
+                errors.append(f"❌ {ICONS[name]}{name}: {e}")
+        if not apis:
+            return "\n".join(errors)
+        
+        prompt = self._build_prompt(prompt, self.discussion.get_context(max_messages=1))
+        # 全員に同じコンテキストを送るため、一番小さい予算に合わせる
+        history, data, context_info = self._get_context(apis, prompt)
+        
+        start = time.perf_counter()
+        results = self._run_async(self._panel_round(apis, history, prompt, data))
+        wall = time.perf_counter() - start
+        
+        lines = errors[:]
+        timings = []
+        for api, (response, elapsed, usage) in zip(apis, results):
+            if isinstance(response, ProviderError):
+                # 失敗したAIの分は保存しない
+                lines.append(self._failure_text(api.NAME, response))
+                lines.append("")
+                continue
+            self.discussion.add_message(api.NAME, api.ICON, response, telemetry=telemetry.make_telemetry(
+                api.NAME, api.model_id, usage, elapsed))
+            lines.append(f"{api.ICON}{api.NAME}: {response}")
+            lines.append("")
+            timings.append(f"{api.NAME} {elapsed:.2f}秒")
+        
+        self._auto_save()
+        self._write_metrics()
+        self._summarize_evicted()
+        
+        lines.append(f"⏱️ パネル完了: {wall:.2f}秒（{', '.join(timings)}）"
+                     f" / 送信: 約{context_info['tokens']:,}トークン×{len(apis)}（履歴 {context_info['messages']}件）")
+        return "\n".join(lines)
+    
+    async def _panel_round(self, apis: list, history: list, prompt: str, data: str) -> list:
+        """全APIを並行に呼び出す（結果は apis と同じ順序の (応答, 秒数, 使用量)）"""
+        import asyncio
+        
+        async def timed(api):
+            start = time.perf_counter()
+            usage = {}
+            try:
+                response = await api.agenerate(history, prompt, data=data, usage=usage)
+            except ProviderError as e:
+                response = e
+            return response, time.perf_counter() - start, usage
         
-        return f"{api.ICON}{api.NAME}: {response}"
+        return await asyncio.gather(*(timed(api) for api in apis))
+    
+    def _run_async(self, coro):
+        """コルーチンを専用イベントループで実行"""
+        if self._loop is None:
+            import asyncio  # 読み込みが重いので /panel を使うときだけ
+            self._loop = asyncio.new_event_loop()
+        return self._loop.run_until_complete(coro)
+    
+    def close(self):
+        """保存待ちの変更を書き出し、このインスタンスのイベントループと asyncio用クライアントを閉じる"""
+        self._saver.close()
+        if self._loop is not None:
+            from api.clients import aclose_clients
+            try:
+                self._loop.run_until_complete(aclose_clients())
+            finally:
+                self._loop.close()
+                self._loop = None
     
     def cmd_filter(self) -> str:
         """直前の発言をフィルタリング"""
@@ -102,7 +467,7 @@ class AgoraTheon:
         if not last:
             return "フィルタ対象の発言がありません"
         
-        # Grok（キャラ無し）でフィルタリング
+        # Grok（キャラ無し）でフィルタリング（AGORATHEON_FILTER_API / _MODEL で変更可）
         filter_prompt = f"""以下の発言から不適切な表現（性的、暴力的、差別的など）を除去し、
 穏当な表現に書き換えてください。
 元の意味はできるだけ保持してください。
@@ -113,19 +478,7 @@ class AgoraTheon:
 【書き換え後の発言のみを出力】"""
         
         try:
-            from openai import OpenAI
-            import os
-            client = OpenAI(
-                api_key=os.environ.get('GROK_API_KEY'),
-                base_url="https://api.x.ai/v1"
-            )
-            response = client.chat.completions.create(
-                model="grok-3-fast",
-                messages=[{"role": "user", "content": filter_prompt}],
-                temperature=0.3,
-                max_tokens=2048
-            )
-            filtered = response.choices[0].message.content.strip()
+            filtered = self._complete_as("filter", filter_prompt)
         except Exception as e:
             return f"フィルタエラー: {e}"
         
@@ -142,13 +495,17 @@ class AgoraTheon:
     
     def cmd_summarize(self) -> str:
         """これまでの議論を要約"""
-        context = self.discussion.get_context()
+        context = self.discussion.get_context(max_messages=SUMMARIZE_RECENT_MESSAGES)
         if not context:
             return "要約する議論がありません"
         
-        # Geminiで要約
-        api = self._get_api("gemini")
+        # 直近の発言より前は、全体のまとめとブロック要約で補う
+        self._apply_summaries()
+        earlier = self._folded_summaries(before=max(0, self.discussion.active_count() - SUMMARIZE_RECENT_MESSAGES))
+        if earlier:
+            context = "\n\n".join(earlier) + "\n\n" + context
         
+        # Geminiで要約
         summary_prompt = f"""以下の討論を簡潔に要約してください。
 各参加者の主要な主張と、議論の流れをまとめてください。
 
@@ -158,16 +515,7 @@ class AgoraTheon:
 【要約】"""
         
         try:
-            from google import genai
-            from google.genai import types
-            import os
-            client = genai.Client(api_key=os.environ.get('GEMINI_API_KEY'))
-            response = client.models.generate_content(
-                model="gemini-2.5-flash",
-                contents=summary_prompt,
-                config=types.GenerateContentConfig(max_output_tokens=2048)
-            )
-            summary = response.text.strip()
+            summary = self._summarize_text(summary_prompt)
         except Exception as e:
             return f"要約エラー: {e}"
         
@@ -177,16 +525,112 @@ class AgoraTheon:
         self._auto_save()
         return f"{ICONS['sumire']}sumire: 【これまでの議論要約】\n{summary}"
     
+    def _summarize_text(self, summary_prompt: str, max_tokens: int = None) -> str:
+        """Geminiで要約（AGORATHEON_SUMMARIZE_API / _MODEL で変更可。失敗時は例外）"""
+        return self._complete_as("summarize", summary_prompt, max_tokens=max_tokens)
+    
+    def _complete_as(self, role: str, prompt: str, max_tokens: int = None) -> str:
+        """
+        補助用途（フィルタ・要約）の単発生成
+        
+        参加者と同じAPIインスタンス（= 同じクライアント・接続）を使い、モデルや生成パラメータだけロールの設定にする
+        """
+        options = role_options(role)
+        api = self._get_api(options["api"])
+        return api.complete(
+            prompt,
+            temperature=options["temperature"],
+            max_tokens=max_tokens or options["max_tokens"],
+            model=options["model"]
+        )
+    
+    def _summarize_evicted(self):
+        """
+        履歴から外れたブロックの要約と、全体のまとめへの畳み込みをバックグラウンドで依頼する
+        
+        出来上がった要約は次にコンテキストを組み立てるときに反映する（ターンは要約を待たない）。
+        一度作った要約は作り直さない。
+        """
+        if not self.summarize_evicted or not self.window_block or self._window_start is None:
+            return
+        if self._summarizer is None:
+            self._summarizer = BackgroundSummarizer(
+                lambda prompt, max_tokens: self._summarize_text(prompt, max_tokens=max_tokens))
+        
+        for start, end in self.discussion.evicted_blocks(self._window_start, self.window_block):
+            lines = self.discussion.get_block_lines(start, end)
+            summary_prompt = f"""以下は討論の一部です。各参加者の主張を3〜5行で簡潔に要約してください。
+
+【討論内容】
+{chr(10).join(lines)}
+
+【要約】"""
+            self._summarizer.submit(("block", start, end), summary_prompt, BLOCK_SUMMARY_MAX_TOKENS)
+        
+        # まとめに入っていない要約がたまったら、前のまとめと合わせて1つにまとめ直す
+        blocks = self.discussion.unfolded_blocks(self.window_block)
+        if len(blocks) < DIGEST_FOLD_BLOCKS or any(key[0] == "digest" for key in self._summarizer.pending):
+            return
+        through = blocks[-1][1]
+        previous = self.discussion.digest["text"] if self.discussion.digest else "（まだありません）"
+        summaries = "\n\n".join(self.discussion.get_block_summary(start, end) for start, end in blocks)
+        digest_prompt = f"""以下は長い討論のこれまでのまとめと、その続きの要約です。
+両方を合わせて、討論全体のまとめを作り直してください。
+各参加者の立場、主要な論点、合意点と対立点、議論の流れが分かるように、20行以内で簡潔にまとめてください。
+
+【これまでのまとめ】
+{previous}
+
+【続きの要約】
+{summaries}
+
+【討論全体のまとめ】"""
+        self._summarizer.submit(("digest", through), digest_prompt, DIGEST_MAX_TOKENS)
+    
+    def _apply_summaries(self):
+        """バックグラウンドで出来上がった要約を討論に反映（メインスレッドで呼ぶ）"""
+        if self._summarizer is None:
+            return
+        results = self._summarizer.take_results()
+        if not results:
+            return
+        
+        for key, summary, error in results:
+            if key[0] == "block":
+                _, start, end = key
+                if error is not None:
+                    print(f"⚠️ ブロック要約に失敗（発言{start + 1}〜{end}）: {error}")
+                elif self.discussion.get_block_summary(start, end) is None:
+                    self.discussion.set_block_summary(start, end, summary)
+            else:
+                _, through = key
+                if error is not None:
+                    print(f"⚠️ 全体のまとめに失敗（発言1〜{through}）: {error}")
+                elif not self.discussion.digest or self.discussion.digest["through"] < through:
+                    self.discussion.set_digest(summary, through)
+        
+        self._auto_save()
+    
+    def _folded_summaries(self, before: int) -> list:
+        """発言 before 件目までの要約（全体のまとめ + まだまとめに入っていないブロック要約、古い順）"""
+        digest = self.discussion.digest
+        texts = [digest["text"]] if digest and digest["through"] <= before else []
+        if self.window_block:
+            texts += [self.discussion.get_block_summary(start, end)
+                      for start, end in self.discussion.unfolded_blocks(self.window_block) if end <= before]
+        return texts
+    
     def cmd_save(self) -> str:
         """討論を保存"""
-        # JSON形式で内部保存
-        json_file = self.discussion_file.replace('.md', '.json')
-        with open(json_file, 'w', encoding='utf-8') as f:
-            f.write(self.discussion.to_json())
+        self._apply_summaries()
+        
+        # JSON形式で内部保存（保存待ちを書き出し、ジャーナルをスナップショットへまとめる）
+        self._saver.submit(self.discussion.pop_events())
+        self._saver.flush(compact=True)
+        json_file = self._store.json_file
         
         # Markdown形式でも保存
-        with open(self.discussion_file, 'w', encoding='utf-8') as f:
-            f.write(self.discussion.to_markdown())
+        atomic_write(self.discussion_file, self.discussion.to_markdown())
         
         return f"保存しました: {self.discussion_file}, {json_file}"
     
@@ -194,23 +638,129 @@ class AgoraTheon:
         """現在の状態を表示"""
         lines = [
             f"📋 タイトル: {self.discussion.title}",
-            f"💬 発言数: {len([m for m in self.discussion.messages if not m.deleted])}",
-            f"📁 参考資料: {len(self.discussion.data_files)}件",
+            f"💬 発言数: {self.discussion.active_count()}",
+            f"📁 参考資料: {len(self.discussion.data_files)}件（キャッシュ {self._data_cache.stats()}）",
         ]
+        for name, api in self._apis.items():
+            totals = api.usage_totals
+            if totals["requests"]:
+                lines.append(f"💾 {api.ICON}{name} キャッシュ読込: {totals['cached_tokens']:,}/"
+                             f"{totals['input_tokens']:,}トークン（{api.cache_hit_rate():.0%}）")
+        for name, retry_in in open_breakers().items():
+            lines.append(f"🚫 {ICONS.get(name, '')}{name}: 停止中（あと{retry_in:.0f}秒）")
+        for name, api in self._apis.items():
+            if api.retry_count or api.breaker.trips:
+                lines.append(f"🔁 {api.ICON}{name}: 再試行 {api.retry_count}回 / 停止 {api.breaker.trips}回")
+        for name, limiter in sorted(all_limiters().items()):
+            if limiter.waited or limiter.depth:
+                lines.append(f"🚦 {ICONS.get(name, '')}{name}: {limiter.format_stats()}")
+        for name in sorted(self.hedge_providers):
+            if self._hedger.stats.get(name):
+                lines.append(f"🪁 {ICONS[name]}{name}: {self._hedger.format_stats(name)}")
+        if self._sumire:
+            lines.append(f"{ICONS['sumire']}振り分け: {self._sumire.format_route_stats()}")
+        if self.discussion.digest or self.discussion.block_summaries:
+            lines.append(f"📚 {self._format_summary_status()}")
+        if self.speculate:
+            lines.append(f"🎯 先行呼び出し: {self.speculation_stats.format()}")
+        if self.last_turn_stats:
+            lines.append(f"⏱️ 直近ターン（{self.last_turn_stats['api']}）: "
+                         f"{self._format_turn_stats(self.last_turn_stats)}")
         return "\n".join(lines)
     
-    def cmd_health(self) -> str:
-        """APIヘルスチェック"""
-        results = []
-        for name in API_MAP.keys():
-            try:
-                api = self._get_api(name)
-                status = api.health_check()
-                icon = "✅" if status["status"] == "healthy" else "❌"
-                results.append(f"{icon} {ICONS[name]}{name}: {status['status']}")
-            except Exception as e:
-                results.append(f"❌ {ICONS[name]}{name}: {e}")
-        return "\n".join(results)
+    def _format_summary_status(self) -> str:
+        """要約の状態の表示用文字列"""
+        digest = self.discussion.digest
+        text = f"全体のまとめ: 発言1〜{digest['through']}（約{digest['tokens']:,}トークン）" if digest \
+            else "全体のまとめ: なし"
+        text += f" / ブロック要約 {len(self.discussion.block_summaries)}件"
+        if self._summarizer and self._summarizer.pending:
+            text += f"（作成中 {len(self._summarizer.pending)}件）"
+        return text
+    
+    def cmd_stats(self, arg: str = "") -> str:
+        """
+        AIごとの計測値の集計を表示（討論ファイルに記録された全発言が対象）
+        
+        /stats export <ファイル> で JSON（.prom / .txt なら Prometheus テキスト形式）に書き出す
+        """
+        summary = self._telemetry_summary()
+        parts = arg.split(maxsplit=1)
+        if parts and parts[0] == "export":
+            if len(parts) < 2:
+                return "書き出し先を指定してください（例: /stats export metrics.prom）"
+            atomic_write(parts[1], telemetry.render(summary, parts[1]))
+            return f"📤 計測値を書き出しました: {parts[1]}"
+        return "📈 計測値（AIごと）\n" + telemetry.format_stats(summary, ICONS)
+    
+    def _telemetry_summary(self) -> dict:
+        """計測値の集計（削除・フィルタした発言もAPIは使っているので含める）"""
+        messages = self.discussion.messages
+        for message in messages[self._telemetry_count:]:
+            if message.telemetry:
+                self._telemetry.add(message.telemetry)
+        self._telemetry_count = len(messages)
+        return self._telemetry.summary()
+    
+    def _write_metrics(self):
+        """--metrics-file が指定されていれば集計を書き出す（書き込みは自動保存のスレッドで行う）"""
+        if not self.metrics_file:
+            return
+        self._saver.submit_file(self.metrics_file, telemetry.render(self._telemetry_summary(), self.metrics_file))
+    
+    def cmd_health(self, refresh: bool = False) -> str:
+        """APIヘルスチェック（並列実行・TTLキャッシュ付き）"""
+        if self._health_cache is None:
+            self._health_cache = HealthCache()
+        
+        from personas import SumireHost
+        
+        names = list(API_MAP.keys()) + ["sumire"]
+        results = {}
+        checks = {}
+        deadlines = {}
+        for name in names:
+            cached = None if refresh else self._health_cache.get(name)
+            if cached:
+                results[name] = cached
+            else:
+                checks[name] = lambda name=name: self._health_probe(name)
+                if name == "sumire":
+                    deadlines[name] = SumireHost.HEALTH_TIMEOUT
+                else:
+                    try:
+                        deadlines[name] = API_MAP[name].HEALTH_TIMEOUT
+                    except ImportError:
+                        # SDKを読み込めない（チェック自体が失敗として返る）
+                        deadlines[name] = BaseAPI.HEALTH_TIMEOUT
+        
+        fresh = run_checks(checks, deadlines)
+        self._health_cache.put(fresh)
+        results.update(fresh)
+        
+        lines = []
+        for name in names:
+            status = results[name]
+            icon = "✅" if status["status"] in HEALTHY_STATUSES else "❌"
+            line = f"{icon} {ICONS[name]}{name}: {status['status']}"
+            if status.get("model"):
+                line += f" ({status['model']})"
+            if status.get("error"):
+                line += f" - {status['error']}"
+            if "age" in status:
+                line += f"  [キャッシュ {status['age']:.0f}秒前]"
+            elif "latency" in status:
+                line += f"  [{status['latency']:.2f}秒]"
+            lines.append(line)
+        return "\n".join(lines)
+    
+    def _health_probe(self, name: str) -> dict:
+        """1つのAPI（または司会バックエンド）をチェック"""
+        if name == "sumire":
+            from personas import SumireHost
+            sumire = self._sumire or SumireHost()
+            return sumire.health_check()
+        return self._get_api(name).health_check()
     
     def process_command(self, line: str) -> tuple[str, bool]:
         """
@@ -232,7 +782,9 @@ class AgoraTheon:
                 return self.call_api(cmd, arg), False
             
             # 特殊コマンド
-            if cmd == "filter":
+            if cmd == "panel":
+                return self.cmd_panel(arg), False
+            elif cmd == "filter":
                 return self.cmd_filter(), False
             elif cmd == "delete":
                 return self.cmd_delete(), False
@@ -242,8 +794,10 @@ class AgoraTheon:
                 return self.cmd_save(), False
             elif cmd == "status":
                 return self.cmd_status(), False
+            elif cmd == "stats":
+                return self.cmd_stats(arg), False
             elif cmd == "health":
-                return self.cmd_health(), False
+                return self.cmd_health(refresh=(arg.strip() == "refresh")), False
             elif cmd == "bye":
                 self.cmd_save()
                 return "討論を終了します。お疲れ様でした！", True
@@ -251,6 +805,8 @@ class AgoraTheon:
                 return self._help(), False
             elif cmd == "auto":
                 return self.cmd_toggle_auto(), False
+            elif cmd == "autorun":
+                return self.cmd_autorun(arg), False
             else:
                 return f"不明なコマンド: /{cmd}\n/help でヘルプを表示", False
         
@@ -272,32 +828,235 @@ class AgoraTheon:
         # コンテキスト取得（直近のみ）
         context = self.discussion.get_context(max_messages=10)
         
-        # スミレんに振り分けてもらう
-        target_api, sumire_intro = self._sumire.route(user_input, context, last_speaker)
+        # 停止中（失敗が続いている）のAIには振らない
+        excluded = unavailable(API_MAP.keys())
+        if len(excluded) == len(API_MAP):
+            return "❌ 全員が一時停止中です。しばらくしてから再度お試しください（/status で確認）"
+        
+        # スミレんに振り分けてもらう（投機モードなら見込みの相手を並行して呼び出しておく）
+        prompt = self._build_prompt(user_input, context)
+        start = time.perf_counter()
+        if self.speculate:
+            target_api, sumire_intro, speculation = self._route_speculatively(
+                user_input, context, last_speaker, excluded, prompt)
+        else:
+            target_api, sumire_intro = self._sumire.route(user_input, context, last_speaker, exclude=excluded)
+            speculation = None
+        routing_latency = time.perf_counter() - start
+        
+        while True:
+            # スミレんのセリフを先に表示
+            print(f"{ICONS['sumire']}スミレん「{sumire_intro}」")
+            print()
+            
+            # 指定されたAPIを呼び出し（失敗したら別のAIに振り直す）
+            try:
+                return self._call_api(target_api, prompt, routing_latency=routing_latency, speculation=speculation)
+            except ProviderError as e:
+                speculation = None
+                print(self._failure_text(target_api, e))
+                print()
+                excluded.append(target_api)
+                if len(excluded) >= len(API_MAP):
+                    return "❌ 応答できるAIがいませんでした"
+                start = time.perf_counter()
+                target_api, sumire_intro = self._sumire.route(user_input, context, last_speaker, exclude=excluded)
+                routing_latency += time.perf_counter() - start
+    
+    def cmd_autorun(self, arg: str = "") -> str:
+        """
+        スミレん司会が N ターン続けて進める（/autorun N [time=秒] [tokens=トークン数]）
+        
+        次の振り分けは、発言を受信している途中から（途中までの内容で）始めておき、
+        ターンの間に振り分けを待たないようにする。時間・トークン数の上限に達したら途中で止める
+        """
+        if self._sumire is None:
+            return "スミレん司会が使えません（/auto で有効にしてください）"
+        try:
+            turns, time_budget, token_budget = self._autorun_options(arg)
+        except ValueError:
+            return "使い方: /autorun N [time=秒] [tokens=トークン数]"
+        
+        start = time.perf_counter()
+        done = 0
+        used_tokens = 0
+        route_wait = 0.0  # ターンの間に振り分けを待った時間
+        between = 0  # ターンの間の振り分けの回数
+        pipelined = 0  # そのうち受信中に振り分けが済んでいた回数
+        stop_reason = f"{turns}ターン完了"
+        
+        last_msg = self.discussion.get_last_message()
+        last_speaker = last_msg.speaker if last_msg else ""
+        excluded = unavailable(API_MAP.keys())
+        wait_start = time.perf_counter()
+        target, intro = self._sumire.route(
+            self._autorun_input(last_msg.speaker if last_msg else "", last_msg.content if last_msg else ""),
+            self.discussion.get_context(max_messages=10), last_speaker, exclude=excluded)
+        routing_latency = time.perf_counter() - wait_start
+        route_wait += routing_latency
+        
+        try:
+            while done < turns:
+                elapsed = time.perf_counter() - start
+                if time_budget and elapsed >= time_budget:
+                    stop_reason = f"時間の上限（{time_budget:.0f}秒）"
+                    break
+                if token_budget and used_tokens >= token_budget:
+                    stop_reason = f"トークンの上限（{token_budget:,}）"
+                    break
+                
+                print(f"{ICONS['sumire']}スミレん「{intro}」")
+                print()
+                context = self.discussion.get_context(max_messages=10)
+                prompt = self._build_prompt("", context)
+                
+                # 発言の受信中に、途中までの内容で次の振り分けを始める（最後のターンは不要）
+                next_route = []
+                
+                def prefetch(partial: str, speaker=target, context=context):
+                    next_route.append(self._sumire.route_in_background(
+                        self._autorun_input(speaker, partial), context, speaker,
+                        exclude=unavailable(API_MAP.keys())))
+                
+                try:
+                    output = self._call_api(target, prompt, routing_latency=routing_latency,
+                                            on_partial=prefetch if done + 1 < turns else None)
+                except ProviderError as e:
+                    print(self._failure_text(target, e))
+                    print()
+                    excluded = list(set(unavailable(API_MAP.keys())) | set(excluded) | {target})
+                    if len(excluded) >= len(API_MAP):
+                        stop_reason = "応答できるAIがいません"
+                        break
+                    # 失敗した発言は保存されないので、直前の発言は呼び出し前と同じ
+                    last_msg = self.discussion.get_last_message()
+                    wait_start = time.perf_counter()
+                    target, intro = self._sumire.route(
+                        self._autorun_input(last_msg.speaker if last_msg else "", last_msg.content if last_msg else ""),
+                        context, last_speaker, exclude=excluded)
+                    routing_latency = time.perf_counter() - wait_start
+                    route_wait += routing_latency
+                    continue
+                
+                print(output)
+                print()
+                done += 1
+                excluded = []
+                last_speaker = target
+                usage = self.last_turn_stats["usage"]
+                used_tokens += usage.get("input_tokens", 0) + usage.get("output_tokens", 0)
+                if done >= turns:
+                    break
+                
+                # 次の振り分け（受信中に始めていれば結果を受け取るだけ）
+                wait_start = time.perf_counter()
+                between += 1
+                if next_route:
+                    if next_route[0].done():
+                        pipelined += 1
+                    target, intro = next_route[0].result()
+                else:
+                    last_msg = self.discussion.get_last_message()
+                    target, intro = self._sumire.route(
+                        self._autorun_input(last_msg.speaker, last_msg.content),
+                        self.discussion.get_context(max_messages=10), last_speaker,
+                        exclude=unavailable(API_MAP.keys()))
+                routing_latency = time.perf_counter() - wait_start
+                route_wait += routing_latency
+        except KeyboardInterrupt:
+            stop_reason = "中断"
+        
+        wall = time.perf_counter() - start
+        return (f"🔁 自動進行: {done}ターン（{stop_reason}）{wall:.1f}秒 / 約{used_tokens:,}トークン"
+                f" / 振り分け待ち 合計{route_wait:.2f}秒（受信中に完了 {pipelined}/{between}回）")
+    
+    def _autorun_options(self, arg: str) -> tuple:
+        """
+        /autorun の引数を解釈
+        
+        Returns:
+            (ターン数, 時間の上限（秒、0で無制限）, トークン数の上限（0で無制限）)
+        
+        Raises:
+            ValueError: 解釈できない
+        """
+        turns = 4
+        time_budget = float(os.environ.get('AGORATHEON_AUTORUN_TIME', '0'))
+        token_budget = int(os.environ.get('AGORATHEON_AUTORUN_TOKENS', '0'))
+        for part in arg.split():
+            key, _, value = part.partition("=")
+            if not value:
+                turns = int(key)
+            elif key == "time":
+                time_budget = float(value)
+            elif key == "tokens":
+                token_budget = int(value)
+            else:
+                raise ValueError(part)
+        if turns <= 0:
+            raise ValueError(arg)
+        return turns, time_budget, token_budget
+    
+    def _autorun_input(self, speaker: str, text: str) -> str:
+        """/autorun・バッチ実行の振り分け入力（直前の発言の末尾を添える）"""
+        if not text:
+            return AUTORUN_INPUT
+        return f"{AUTORUN_INPUT}\n\n【{speaker}の発言】{text[-AUTORUN_EXCERPT_CHARS:]}"
+    
+    def _route_speculatively(self, user_input: str, context: str, last_speaker: str,
+                             excluded: list, prompt: str) -> tuple:
+        """
+        振り分けと並行して、見込みの相手（キーワードのスコア、無ければ順番）への呼び出しを始める
+        
+        即決・キャッシュで振り分けがすぐ決まった場合は投機しない
+        
+        Returns:
+            (振り分け先, 紹介文, 採用した投機呼び出し（外れ・投機なしなら None）)
+        """
+        from concurrent.futures import TimeoutError as FutureTimeout
+        
+        future = self._sumire.route_in_background(user_input, context, last_speaker, exclude=excluded)
+        try:
+            target, intro = future.result(timeout=SPECULATE_AFTER)
+            return target, intro, None
+        except FutureTimeout:
+            pass
         
-        # スミレんのセリフを先に表示
-        print(f"{ICONS['sumire']}スミレん「{sumire_intro}」")
-        print()
+        guess = self._sumire.guess(user_input, last_speaker, excluded)
+        try:
+            api = self._get_api(guess)
+        except (ValueError, ProviderError):
+            target, intro = future.result()
+            return target, intro, None
+        history, data, context_info = self._get_context([api], prompt)
+        usage = {}
+        speculation = Speculation(guess, lambda: self._response_deltas(api, history, prompt, data, usage),
+                                  history, data, context_info, usage)
         
-        # プロンプト構築（コンテキストが空の場合は討論開始として扱う）
+        target, intro = future.result()
+        if target == guess:
+            self.speculation_stats.record_hit(speculation)
+            return target, intro, speculation
+        self.speculation_stats.record_miss(speculation.cancel())
+        return target, intro, None
+    
+    def _build_prompt(self, user_input: str, context: str) -> str:
+        """プロンプト構築（コンテキストが空の場合は討論開始として扱う）"""
         if not context.strip():
             # 最初の発言：討論テーマを伝えて開始
             prompt = f"討論テーマ「{self.discussion.title}」について、あなたの見解を述べてください。"
             if user_input.strip():
                 prompt += f"\n\nユーザーからの補足: {user_input}"
-        else:
-            prompt = user_input if user_input.strip() else ""
-        
-        # 指定されたAPIを呼び出し
-        api_response = self.call_api(target_api, prompt)
-        
-        return api_response
+            return prompt
+        return user_input if user_input.strip() else ""
     
     def cmd_toggle_auto(self) -> str:
         """司会モードの切り替え"""
         if self._sumire is None:
             try:
+                from personas import SumireHost
                 self._sumire = SumireHost()
+                self._sumire.start_warmup()
             except Exception as e:
                 return f"スミレん司会の初期化に失敗: {e}"
         
@@ -318,6 +1077,7 @@ class AgoraTheon:
   /gemini [指示]   - ❇️ Gemini（実用・高速）
   /chatgpt [指示]  - ♻️ ChatGPT（汎用・バランス）
   /grok [指示]     - ♨️ Grok（イーロン引用・ちゃぶ台返し）
+  /panel [指示]    - 🏛️ 全員に同時に聞く（4人分を並行実行）
 
 🛠️ 編集:
   /filter     - 直前の発言をフィルタリング
@@ -326,8 +1086,10 @@ class AgoraTheon:
 
 📊 その他:
   /auto       - 司会モード切替
+  /autorun N  - スミレん司会で N ターン自動進行（time=秒 / tokens=数 で上限）
   /status     - 現在の状態を表示
-  /health     - APIヘルスチェック
+  /stats      - AIごとの速度・トークン数・費用（export <ファイル> で書き出し）
+  /health     - APIヘルスチェック（refresh でキャッシュ無視）
   /save       - 討論を保存
   /bye        - 保存して終了
   /help       - このヘルプを表示"""
@@ -340,6 +1102,8 @@ class AgoraTheon:
         print(f"💠 司会モード: {auto_status}")
         print(f"💡 /help でコマンド一覧を表示\n")
         
+        import readline  # 入力履歴用（REPLを使うときだけ読み込む）
+        
         while True:
             try:
                 line = input("〉")
@@ -353,6 +1117,9 @@ class AgoraTheon:
                 print("\n中断しました。/save で保存、/bye で終了")
             except EOFError:
                 break
+        
+        # 保存待ちの変更を書き出す
+        self.close()
 
 
 def main():
@@ -365,10 +1132,28 @@ def main():
                         help='APIヘルスチェックのみ実行')
     parser.add_argument('--no-auto', action='store_true',
                         help='司会モードを無効化（v1.0互換）')
+    parser.add_argument('--no-stream', action='store_true',
+                        help='ストリーミング表示を無効化（完了後にまとめて表示）')
+    parser.add_argument('--window-block', type=int, default=8, metavar='K',
+                        help='履歴の開始位置をK件単位でずらす（プロンプトキャッシュ用、0でスライディング）')
+    parser.add_argument('--summarize-evicted', action='store_true',
+                        help='履歴から外れたブロックを要約し、全体のまとめに畳み込んで残す（バックグラウンド）')
+    parser.add_argument('--hedge', default=os.environ.get('AGORATHEON_HEDGE', ''), metavar='AIS',
+                        help='初回トークンが遅いとき予備リクエストを出すAI（カンマ区切り、all で全員）')
+    parser.add_argument('--speculate', action='store_true',
+                        default=os.environ.get('AGORATHEON_SPECULATE', '0') == '1',
+                        help='司会モードで振り分けを待たずに見込みのAIを先に呼び出す（外れたら打ち切り）')
+    parser.add_argument('--metrics-file', default=os.environ.get('AGORATHEON_METRICS_FILE'), metavar='PATH',
+                        help='発言ごとに計測値の集計を書き出すファイル（.prom なら Prometheus 形式、それ以外は JSON）')
     
     args = parser.parse_args()
     
-    agora = AgoraTheon(args.discussion_file, args.data, auto_mode=not args.no_auto)
+    # --health のみなら司会の起動（モデルのウォームアップ）は行わない
+    agora = AgoraTheon(args.discussion_file, args.data, auto_mode=not (args.no_auto or args.health),
+                       streaming=not args.no_stream, window_block=args.window_block,
+                       summarize_evicted=args.summarize_evicted,
+                       hedge=[name.strip() for name in args.hedge.split(',') if name.strip()],
+                       metrics_file=args.metrics_file, speculate=args.speculate)
     
     if args.health:
         print(agora.cmd_health())
@@ -1,20 +1,71 @@
 """
 AgoraTheon API Wrappers
+
+各社SDKの読み込みは重いので、APIクラスは API_MAP から最初に取り出したときに読み込む
+（--health や手動モードでの再開など、使わないSDKの読み込みで起動を待たせない）
 """
 
-from .claude import ClaudeAPI
-from .gemini import GeminiAPI
-from .chatgpt import ChatGPTAPI
-from .grok import GrokAPI
+import importlib
+from collections.abc import Mapping
+
+from .base import BaseAPI
+from .resilience import CircuitOpenError, ProviderError
+
+
+class LazyAPIMap(Mapping):
+    """API名 → APIクラス の対応表（クラスのモジュールは初回アクセス時に import する）"""
+
+    def __init__(self, entries: dict):
+        """
+        Args:
+            entries: API名 → (モジュール名, クラス名)
+        """
+        self._entries = dict(entries)
+        self._loaded = {}
+
+    def __getitem__(self, name: str):
+        if name not in self._loaded:
+            module_name, class_name = self._entries[name]
+            module = importlib.import_module(module_name, __name__)
+            self._loaded[name] = getattr(module, class_name)
+        return self._loaded[name]
+
+    def __iter__(self):
+        return iter(self._entries)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, name) -> bool:
+        # 名前の確認だけならモジュールは読み込まない
+        return name in self._entries
+
 
 # 全APIクラスのマッピング
-API_MAP = {
-    "claude": ClaudeAPI,
-    "gemini": GeminiAPI,
-    "chatgpt": ChatGPTAPI,
-    "grok": GrokAPI,
+API_MAP = LazyAPIMap({
+    "claude": (".claude", "ClaudeAPI"),
+    "gemini": (".gemini", "GeminiAPI"),
+    "chatgpt": (".chatgpt", "ChatGPTAPI"),
+    "grok": (".grok", "GrokAPI"),
+})
+
+# クラス名 → (モジュール名, クラス名)（from api import ClaudeAPI なども遅延で解決する）
+_LAZY_CLASSES = {
+    "OpenAICompatAPI": (".openai_compat", "OpenAICompatAPI"),
+    "ClaudeAPI": (".claude", "ClaudeAPI"),
+    "GeminiAPI": (".gemini", "GeminiAPI"),
+    "ChatGPTAPI": (".chatgpt", "ChatGPTAPI"),
+    "GrokAPI": (".grok", "GrokAPI"),
 }
 
+
+def __getattr__(name: str):
+    if name in _LAZY_CLASSES:
+        module_name, class_name = _LAZY_CLASSES[name]
+        return getattr(importlib.import_module(module_name, __name__), class_name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 # アイコンマッピング
 ICONS = {
     "claude": "✴️",
@@ -25,6 +76,10 @@ ICONS = {
 }
 
 __all__ = [
+    "BaseAPI",
+    "ProviderError",
+    "CircuitOpenError",
+    "OpenAICompatAPI",
     "ClaudeAPI",
     "GeminiAPI", 
     "ChatGPTAPI",
@@ -0,0 +1,396 @@
+"""
+Base API Wrapper for AgoraTheon
+全APIラッパー共通の処理
+
+失敗は応答テキストにせず ProviderError を送出する。一時的な失敗はジッター付きバックオフで再試行し、
+続けて失敗したAIはサーキットブレーカーで停止中にする（resilience.py）。
+
+プロンプトは「ブロック」の列として組み立てる。各ブロックは (種類, テキスト) で、
+種類は data（参考資料）/ history（討論の発言 history_block 件）/ recent（末尾の history_block 件に満たない発言）/
+instruction（指示）のいずれか。
+変わりにくい順（システムプロンプト → 参考資料 → 古い履歴 → 新しい履歴 → 指示）に並べるので、
+ターンをまたいで先頭部分がバイト単位で一致し、各社のプロンプトキャッシュが効く。
+"""
+
+import os
+import time
+from typing import AsyncIterator, Callable, Iterator, List, Tuple, Union
+
+from utils.tokens import estimate_tokens
+
+from .ratelimit import get_limiter
+from .resilience import ProviderError, backoff_delay, get_breaker, is_retryable
+
+
+async def _async_sleep(seconds: float):
+    """asyncio.sleep（asyncio は起動時に読み込まないよう、使うときに import する）"""
+    import asyncio
+    await asyncio.sleep(seconds)
+
+
+# プロンプトブロック（種類, テキスト）
+Block = Tuple[str, str]
+
+
+class BaseAPI:
+    """APIラッパーの基底クラス（各SDK固有の呼び出しはサブクラスで実装）"""
+
+    ICON = ""
+    NAME = ""
+    DISPLAY_NAME = ""
+    SYSTEM_PROMPT = ""
+
+    # 指示が無い場合のデフォルト指示
+    DEFAULT_INSTRUCTION = "上記の討論を踏まえて、あなたの見解を述べてください。"
+
+    # デフォルトの生成パラメータ
+    TEMPERATURE = 0.7
+    MAX_TOKENS = 2048
+
+    # 1回の送信に使う入力トークンの上限（システムプロンプト・参考資料・履歴・指示の合計）
+    CONTEXT_BUDGET = 24_000
+
+    # ヘルスチェックの制限時間（秒）
+    HEALTH_TIMEOUT = 5.0
+
+    # 1回のリクエストの制限時間（秒）。AGORATHEON_TIMEOUT_<NAME> で上書き
+    REQUEST_TIMEOUT = 60.0
+
+    # 一時的な失敗の再試行回数
+    MAX_RETRIES = 2
+
+    def __init__(self):
+        # 累計の使用量（キャッシュのヒット率確認用）
+        self.usage_totals = {"requests": 0, "input_tokens": 0, "cached_tokens": 0, "output_tokens": 0}
+        self.request_timeout = float(os.environ.get(f'AGORATHEON_TIMEOUT_{self.NAME.upper()}', self.REQUEST_TIMEOUT))
+        # 同じAIのインスタンス・用途（フィルタ・要約など）で共有
+        self.breaker = get_breaker(self.NAME)
+        self.limiter = get_limiter(self.NAME)
+        self.retry_count = 0  # 再試行した回数
+        # 履歴を1ブロックにまとめる発言数（履歴ウィンドウの区切り単位に合わせる）
+        self.history_block = 1
+
+    def generate(self, context: Union[str, List[str]], prompt: str = "", temperature: float = None,
+                 max_tokens: int = None, data: str = "", usage: dict = None) -> str:
+        """
+        応答を生成（完了まで待つ）
+
+        Args:
+            context: これまでの討論内容（文字列、または発言ごとのリスト）
+            prompt: 追加のユーザープロンプト
+            temperature: 生成温度（省略時はクラスのデフォルト）
+            max_tokens: 最大トークン数（省略時はクラスのデフォルト）
+            data: 参考資料ブロック
+            usage: 渡すとトークン使用量（input/output/cached_tokens）を書き込む
+
+        Returns:
+            生成された応答
+
+        Raises:
+            ProviderError: 再試行しても失敗した、または停止中
+        """
+        blocks = self._build_blocks(context, prompt, data)
+        temperature, max_tokens = self._params(temperature, max_tokens)
+        usage = {} if usage is None else usage
+
+        cost = self._estimate_cost(blocks, max_tokens)
+        return self._call(lambda: self._generate(blocks, temperature, max_tokens, usage), cost, usage).strip()
+
+    def stream(self, context: Union[str, List[str]], prompt: str = "", temperature: float = None,
+               max_tokens: int = None, data: str = "", usage: dict = None) -> Iterator[str]:
+        """
+        応答をストリーミング生成
+
+        引数は generate() と同じ（usage は最後まで読み終えた時点で書き込まれる）
+        再試行するのは最初の差分を受け取る前の失敗だけ（途中で切れた場合はそのまま ProviderError）
+
+        Yields:
+            生成されたテキストの差分
+
+        Raises:
+            ProviderError: 再試行しても失敗した、途中で切れた、または停止中
+        """
+        blocks = self._build_blocks(context, prompt, data)
+        temperature, max_tokens = self._params(temperature, max_tokens)
+        usage = {} if usage is None else usage
+
+        cost = self._estimate_cost(blocks, max_tokens)
+        attempt = 0
+        while True:
+            self.limiter.acquire(cost)
+            trial = self.breaker.before_call()
+            started = False
+            try:
+                for delta in self._stream(blocks, temperature, max_tokens, usage):
+                    if delta:
+                        started = True
+                        yield delta
+            except Exception as e:
+                trial = False
+                error = self._on_failure(e)
+                if started or not self._should_retry(error, attempt):
+                    raise error from e
+                time.sleep(backoff_delay(attempt))
+                attempt += 1
+                continue
+            else:
+                trial = False
+                self.breaker.record_success()
+                self._settle(cost, usage)
+                return
+            finally:
+                # 打ち切り（GeneratorExit）・Ctrl-C で結果が出なかった試し呼び出しを解放する
+                if trial:
+                    self.breaker.release_trial()
+
+    async def agenerate(self, context: Union[str, List[str]], prompt: str = "", temperature: float = None,
+                        max_tokens: int = None, data: str = "", usage: dict = None) -> str:
+        """
+        応答を生成（asyncio版）
+
+        引数・戻り値・例外は generate() と同じ
+        """
+        blocks = self._build_blocks(context, prompt, data)
+        temperature, max_tokens = self._params(temperature, max_tokens)
+        usage = {} if usage is None else usage
+
+        cost = self._estimate_cost(blocks, max_tokens)
+        attempt = 0
+        while True:
+            await self._async_acquire(cost)
+            trial = self.breaker.before_call()
+            try:
+                response = await self._agenerate(blocks, temperature, max_tokens, usage)
+            except Exception as e:
+                trial = False
+                error = self._on_failure(e)
+                if not self._should_retry(error, attempt):
+                    raise error from e
+                await _async_sleep(backoff_delay(attempt))
+                attempt += 1
+                continue
+            else:
+                trial = False
+                self.breaker.record_success()
+                self._settle(cost, usage)
+                return response.strip()
+            finally:
+                # キャンセル（CancelledError）・Ctrl-C で結果が出なかった試し呼び出しを解放する
+                if trial:
+                    self.breaker.release_trial()
+
+    async def astream(self, context: Union[str, List[str]], prompt: str = "", temperature: float = None,
+                      max_tokens: int = None, data: str = "", usage: dict = None) -> AsyncIterator[str]:
+        """
+        応答をストリーミング生成（asyncio版）
+
+        引数・例外は stream() と同じ。テキストの差分を async for で返す
+        """
+        blocks = self._build_blocks(context, prompt, data)
+        temperature, max_tokens = self._params(temperature, max_tokens)
+        usage = {} if usage is None else usage
+
+        cost = self._estimate_cost(blocks, max_tokens)
+        attempt = 0
+        while True:
+            await self._async_acquire(cost)
+            trial = self.breaker.before_call()
+            started = False
+            try:
+                async for delta in self._astream(blocks, temperature, max_tokens, usage):
+                    if delta:
+                        started = True
+                        yield delta
+            except Exception as e:
+                trial = False
+                error = self._on_failure(e)
+                if started or not self._should_retry(error, attempt):
+                    raise error from e
+                await _async_sleep(backoff_delay(attempt))
+                attempt += 1
+                continue
+            else:
+                trial = False
+                self.breaker.record_success()
+                self._settle(cost, usage)
+                return
+            finally:
+                # 打ち切り（GeneratorExit）・キャンセル・Ctrl-C で結果が出なかった試し呼び出しを解放する
+                if trial:
+                    self.breaker.release_trial()
+
+    def complete(self, prompt: str, system: str = "", temperature: float = None,
+                 max_tokens: int = None, model: str = None) -> str:
+        """
+        キャラクター設定を使わない単発の生成（フィルタ・要約などの補助用。失敗時は例外）
+        
+        Args:
+            prompt: ユーザープロンプト
+            system: システムプロンプト（省略時なし）
+            temperature: 生成温度（省略時はクラスのデフォルト）
+            max_tokens: 最大トークン数（省略時はクラスのデフォルト）
+            model: モデル名（省略時はこのAIのモデル）
+        
+        Returns:
+            生成された応答
+
+        Raises:
+            ProviderError: 再試行しても失敗した、または停止中
+        """
+        temperature, max_tokens = self._params(temperature, max_tokens)
+        cost = estimate_tokens(system) + estimate_tokens(prompt) + max_tokens
+        return self._call(lambda: self._complete(prompt, system, temperature, max_tokens, model), cost).strip()
+    
+    def health_check(self) -> dict:
+        """ヘルスチェック（生成は行わず、モデル情報の取得のみ）"""
+        try:
+            return {"status": "healthy", "model": self._probe()}
+        except Exception as e:
+            return {"status": "unhealthy", "error": str(e)}
+
+    @property
+    def model_id(self) -> str:
+        """使用中のモデル名（計測値の記録用）"""
+        return getattr(self, "model", None) or getattr(self, "model_name", "")
+
+    def cache_hit_rate(self) -> float:
+        """入力トークンのうちキャッシュから読まれた割合"""
+        if not self.usage_totals["input_tokens"]:
+            return 0.0
+        return self.usage_totals["cached_tokens"] / self.usage_totals["input_tokens"]
+
+    def _generate(self, blocks: List[Block], temperature: float, max_tokens: int, usage: dict) -> str:
+        """SDKを呼び出して応答全文を返す（サブクラスで実装）"""
+        raise NotImplementedError
+
+    def _stream(self, blocks: List[Block], temperature: float, max_tokens: int, usage: dict) -> Iterator[str]:
+        """SDKを呼び出してテキスト差分を返す（サブクラスで実装）"""
+        raise NotImplementedError
+
+    async def _agenerate(self, blocks: List[Block], temperature: float, max_tokens: int, usage: dict) -> str:
+        """非同期SDKを呼び出して応答全文を返す（サブクラスで実装）"""
+        raise NotImplementedError
+
+    async def _astream(self, blocks: List[Block], temperature: float, max_tokens: int, usage: dict) -> AsyncIterator[str]:
+        """非同期SDKを呼び出してテキスト差分を返す（サブクラスで実装）"""
+        raise NotImplementedError
+        yield
+
+    def _complete(self, prompt: str, system: str, temperature: float, max_tokens: int, model: str) -> str:
+        """SDKを呼び出して単発の応答を返す（サブクラスで実装）"""
+        raise NotImplementedError
+    
+    def _probe(self) -> str:
+        """最も軽いAPI呼び出しでモデルの存在を確認し、モデル名を返す（サブクラスで実装）"""
+        raise NotImplementedError
+
+    def _params(self, temperature: float, max_tokens: int) -> tuple:
+        """生成パラメータのデフォルトを補完"""
+        if temperature is None:
+            temperature = self.TEMPERATURE
+        if max_tokens is None:
+            max_tokens = self.MAX_TOKENS
+        return temperature, max_tokens
+
+    def _record_usage(self, usage: dict, input_tokens: int, output_tokens: int, cached_tokens: int = 0):
+        """
+        使用量を記録
+
+        Args:
+            usage: 呼び出しごとの使用量（書き込み先）
+            input_tokens: 入力トークン数（キャッシュ分を含む）
+            output_tokens: 出力トークン数
+            cached_tokens: キャッシュから読まれた入力トークン数
+        """
+        usage.update(input_tokens=input_tokens, output_tokens=output_tokens, cached_tokens=cached_tokens)
+        self.usage_totals["requests"] += 1
+        self.usage_totals["input_tokens"] += input_tokens
+        self.usage_totals["output_tokens"] += output_tokens
+        self.usage_totals["cached_tokens"] += cached_tokens
+
+    def _call(self, request: Callable[[], str], cost: int = 0, usage: dict = None) -> str:
+        """同期呼び出しをレート制限・再試行・ブレーカー付きで実行"""
+        attempt = 0
+        while True:
+            self.limiter.acquire(cost)
+            trial = self.breaker.before_call()
+            try:
+                response = request()
+            except Exception as e:
+                trial = False
+                error = self._on_failure(e)
+                if not self._should_retry(error, attempt):
+                    raise error from e
+                time.sleep(backoff_delay(attempt))
+                attempt += 1
+                continue
+            else:
+                trial = False
+                self.breaker.record_success()
+                self._settle(cost, usage)
+                return response
+            finally:
+                # Ctrl-C で結果が出なかった試し呼び出しを解放する
+                if trial:
+                    self.breaker.release_trial()
+
+    def _estimate_cost(self, blocks: List[Block], max_tokens: int) -> int:
+        """レート制限用の見込みトークン数（入力の概算 + 最大出力）"""
+        return estimate_tokens(self.SYSTEM_PROMPT) + estimate_tokens(self._build_message(blocks)) + max_tokens
+
+    def _settle(self, cost: int, usage: dict):
+        """見込みと実際の使用量の差をリミッターに返す"""
+        if usage and usage.get("input_tokens"):
+            self.limiter.settle(cost, usage["input_tokens"] + usage.get("output_tokens", 0))
+
+    async def _async_acquire(self, cost: int):
+        """レート制限の枠を確保（待つ場合はイベントループを止めないよう別スレッドで待つ）"""
+        if not self.limiter.rpm and not self.limiter.tpm:
+            self.limiter.acquire(cost)
+            return
+        import asyncio
+        await asyncio.to_thread(self.limiter.acquire, cost)
+
+    def _on_failure(self, e: Exception) -> ProviderError:
+        """失敗をブレーカーに記録し、ProviderError にする"""
+        self.breaker.record_failure()
+        if isinstance(e, ProviderError):
+            return e
+        return ProviderError(self.NAME, f"[{self.DISPLAY_NAME}] {e}", retryable=is_retryable(e), cause=e)
+
+    def _should_retry(self, error: ProviderError, attempt: int) -> bool:
+        """再試行するか（回数が残っていて、一時的な失敗で、ブレーカーが開いていない）"""
+        if not error.retryable or attempt >= self.MAX_RETRIES or self.breaker.is_open():
+            return False
+        self.retry_count += 1
+        return True
+
+    def _build_blocks(self, context: Union[str, List[str]], prompt: str, data: str = "") -> List[Block]:
+        """
+        プロンプトブロックを構築（変わりにくいものから順に並べる）
+
+        各ブロックの末尾に区切りを含めるので、テキストを連結すればそのままユーザーメッセージになる。
+        履歴は先頭から history_block 件ずつまとめる（履歴の開始位置は区切り単位にそろうので、
+        まとめたブロックは次のターンでも同じ内容になる）
+        """
+        blocks = []
+
+        if data:
+            blocks.append(("data", f"{data}\n\n"))
+
+        lines = context if isinstance(context, list) else ([context] if context else [])
+        size = max(1, self.history_block)
+        for i in range(0, len(lines), size):
+            group = lines[i:i + size]
+            header = "【これまでの討論】\n" if i == 0 else ""
+            kind = "history" if len(group) == size else "recent"
+            blocks.append((kind, header + "".join(f"{line}\n\n" for line in group)))
+
+        instruction = prompt if prompt else self.DEFAULT_INSTRUCTION
+        blocks.append(("instruction", f"【指示】\n{instruction}"))
+
+        return blocks
+
+    def _build_message(self, blocks: List[Block]) -> str:
+        """ブロックを連結してユーザーメッセージにする"""
+        return "".join(text for _, text in blocks)
@@ -3,16 +3,21 @@ Claude API Wrapper for AgoraTheon
 ✴️ 理性・深い推論担当
 """
 
-import os
-from anthropic import Anthropic
+from typing import AsyncIterator, Iterator, List
 
+from anthropic import Anthropic, AsyncAnthropic
 
-class ClaudeAPI:
+from .base import BaseAPI, Block
+from .clients import base_url_for, get_client
+
+
+class ClaudeAPI(BaseAPI):
     """Claude API (Anthropic)"""
     
     ICON = "✴️"
     NAME = "claude"
     DISPLAY_NAME = "Claude"
+    CONTEXT_BUDGET = 48_000
     
     # キャラクター設定
     SYSTEM_PROMPT = """あなたはAI討論会の参加者「Claude」です。
@@ -32,64 +37,98 @@ class ClaudeAPI:
 - 箇条書きより自然な文章を好む
 - 敬語は使わない（討論参加者として対等）"""
     
-    def __init__(self):
-        api_key = os.environ.get('ANTHROPIC_API_KEY')
-        if not api_key:
-            raise ValueError("ANTHROPIC_API_KEY not set")
-        self.client = Anthropic(api_key=api_key)
+    def __init__(self, client: Anthropic = None):
+        """
+        Args:
+            client: 既存のクライアント（テスト用のスタブなど。省略時は共有クライアント）
+        """
+        super().__init__()
+        if client is None:
+            client = get_client("anthropic", "ANTHROPIC_API_KEY", base_url_for(self.NAME))
+        self.client = client
         self.model = "claude-sonnet-4-20250514"
     
-    def generate(self, context: str, prompt: str = "", temperature: float = 0.7, max_tokens: int = 2048) -> str:
+    @property
+    def async_client(self) -> AsyncAnthropic:
+        """asyncio用クライアント（実行中のイベントループごとの共有クライアント）"""
+        return get_client("anthropic", "ANTHROPIC_API_KEY", base_url_for(self.NAME), use_async=True)
+    
+    def _request(self, blocks: List[Block], temperature: float, max_tokens: int) -> dict:
         """
-        応答を生成
-        
-        Args:
-            context: これまでの討論内容
-            prompt: 追加のユーザープロンプト
-            temperature: 生成温度
-            max_tokens: 最大トークン数
+        リクエストを構築
         
-        Returns:
-            生成された応答
+        キャッシュの区切り（cache_control）はシステムプロンプト・参考資料・最後の埋まった履歴ブロックの3か所。
+        履歴は区切り単位（K件）ずつのブロックなので、埋まったブロックまでは次のターンでも同じ内容になり、
+        書いたキャッシュを先頭一致で読める（末尾の埋まっていないブロックは毎ターン変わるので区切りを置かない）。
+        発言ごとのブロックにしないのは、ブロック数が多いと SDK のリクエスト変換が遅くなるため
         """
-        user_message = self._build_message(context, prompt)
+        content = []
+        last_history = max((i for i, (kind, _) in enumerate(blocks) if kind == "history"), default=-1)
+        for i, (kind, text) in enumerate(blocks):
+            block = {"type": "text", "text": text}
+            if kind == "data" or i == last_history:
+                block["cache_control"] = {"type": "ephemeral"}
+            content.append(block)
         
-        try:
-            response = self.client.messages.create(
-                model=self.model,
-                max_tokens=max_tokens,
-                system=self.SYSTEM_PROMPT,
-                messages=[
-                    {"role": "user", "content": user_message}
-                ],
-                temperature=temperature
-            )
-            return response.content[0].text.strip()
-        except Exception as e:
-            return f"[Claude エラー] {str(e)}"
+        return {
+            "model": self.model,
+            "max_tokens": max_tokens,
+            "system": [
+                {"type": "text", "text": self.SYSTEM_PROMPT, "cache_control": {"type": "ephemeral"}}
+            ],
+            "messages": [
+                {"role": "user", "content": content}
+            ],
+            "temperature": temperature,
+            "timeout": self.request_timeout
+        }
     
-    def _build_message(self, context: str, prompt: str) -> str:
-        """ユーザーメッセージを構築"""
-        parts = []
-        
-        if context:
-            parts.append(f"【これまでの討論】\n{context}")
-        
-        if prompt:
-            parts.append(f"【指示】\n{prompt}")
-        else:
-            parts.append("【指示】\n上記の討論を踏まえて、あなたの見解を述べてください。")
-        
-        return "\n\n".join(parts)
+    def _record_response_usage(self, response_usage, usage: dict):
+        """レスポンスの使用量を記録（input_tokens はキャッシュ分を含まないので足し合わせる）"""
+        cached = getattr(response_usage, "cache_read_input_tokens", 0) or 0
+        created = getattr(response_usage, "cache_creation_input_tokens", 0) or 0
+        self._record_usage(
+            usage,
+            input_tokens=response_usage.input_tokens + cached + created,
+            output_tokens=response_usage.output_tokens,
+            cached_tokens=cached
+        )
+    
+    def _generate(self, blocks: List[Block], temperature: float, max_tokens: int, usage: dict) -> str:
+        response = self.client.messages.create(**self._request(blocks, temperature, max_tokens))
+        self._record_response_usage(response.usage, usage)
+        return response.content[0].text
+    
+    def _stream(self, blocks: List[Block], temperature: float, max_tokens: int, usage: dict) -> Iterator[str]:
+        with self.client.messages.stream(**self._request(blocks, temperature, max_tokens)) as stream:
+            yield from stream.text_stream
+            self._record_response_usage(stream.get_final_message().usage, usage)
+    
+    async def _agenerate(self, blocks: List[Block], temperature: float, max_tokens: int, usage: dict) -> str:
+        response = await self.async_client.messages.create(**self._request(blocks, temperature, max_tokens))
+        self._record_response_usage(response.usage, usage)
+        return response.content[0].text
+    
+    async def _astream(self, blocks: List[Block], temperature: float, max_tokens: int, usage: dict) -> AsyncIterator[str]:
+        async with self.async_client.messages.stream(**self._request(blocks, temperature, max_tokens)) as stream:
+            async for text in stream.text_stream:
+                yield text
+            self._record_response_usage((await stream.get_final_message()).usage, usage)
+    
+    def _complete(self, prompt: str, system: str, temperature: float, max_tokens: int, model: str) -> str:
+        request = {
+            "model": model or self.model,
+            "max_tokens": max_tokens,
+            "messages": [{"role": "user", "content": prompt}],
+            "temperature": temperature,
+            "timeout": self.request_timeout
+        }
+        if system:
+            request["system"] = system
+        response = self.client.messages.create(**request)
+        return response.content[0].text
     
-    def health_check(self) -> dict:
-        """ヘルスチェック"""
-        try:
-            response = self.client.messages.create(
-                model=self.model,
-                max_tokens=10,
-                messages=[{"role": "user", "content": "Reply with just 'OK'"}]
-            )
-            return {"status": "healthy", "model": self.model}
-        except Exception as e:
-            return {"status": "unhealthy", "error": str(e)}
+    def _probe(self) -> str:
+        # モデル情報の取得のみ（生成は行わない）
+        model = self.client.models.retrieve(self.model, timeout=self.HEALTH_TIMEOUT)
+        return model.id
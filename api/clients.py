@@ -0,0 +1,120 @@
+"""
+Shared Clients for AgoraTheon
+各社SDKクライアントの共有プール
+
+討論の参加者・フィルタ・要約・司会の振り分けが、プロバイダごとに同じクライアント
+（= 同じ接続プール）を使う。クライアントの作成と TLS ハンドシェイクは最初の1回だけになる。
+
+asyncio用クライアントの接続プールはイベントループに結び付くので、プロセス全体ではなく
+イベントループごとに作る（別スレッドの別ループから同じプールを使うと固まる）。
+ループを閉じる前に aclose_clients() で閉じる。
+"""
+
+import os
+import threading
+import weakref
+from typing import Optional
+
+
+# 用途（ロール）ごとの設定。api は使うAI、model/temperature/max_tokens は省略時そのAIのデフォルト
+# 環境変数 AGORATHEON_<ROLE>_API / AGORATHEON_<ROLE>_MODEL で上書きできる
+# （router はスミレん司会の Gemini バックエンド専用なので api を持たず、モデルだけ変えられる）
+ROLES = {
+    "filter": {"api": "grok", "temperature": 0.3, "max_tokens": 2048},
+    "summarize": {"api": "gemini", "max_tokens": 2048},
+    "router": {"model": "gemini-2.5-flash"},
+}
+
+_clients = {}  # 同期クライアント（プロセス全体で共有）
+_async_clients = weakref.WeakKeyDictionary()  # イベントループ → asyncio用クライアント
+_lock = threading.Lock()
+
+
+def get_client(kind: str, api_key_env: str, base_url: Optional[str] = None, use_async: bool = False):
+    """
+    共有クライアントを取得（無ければ作成）
+
+    Args:
+        kind: SDKの種類（"anthropic" / "openai" / "gemini"）
+        api_key_env: APIキーの環境変数名
+        base_url: 接続先（None なら各社の本家。base_url_for() で環境変数の上書きを反映して渡す）
+        use_async: asyncio用クライアントを返すか（実行中のイベントループごとに作る。
+            Gemini は別に作ったクライアントの .aio を使う）
+
+    Raises:
+        ValueError: APIキーが設定されていない
+    """
+    key = (kind, api_key_env, base_url)
+
+    with _lock:
+        if use_async:
+            import asyncio  # asyncio用クライアントを使うときは読み込み済み
+            pool = _async_clients.setdefault(asyncio.get_running_loop(), {})
+        else:
+            pool = _clients
+        client = pool.get(key)
+        if client is None:
+            api_key = os.environ.get(api_key_env)
+            if not api_key:
+                raise ValueError(f"{api_key_env} not set")
+            client = _create(kind, api_key, base_url, use_async)
+            pool[key] = client
+        return client
+
+
+async def aclose_clients():
+    """実行中のイベントループで作った asyncio用クライアントを閉じる（ループを閉じる前に呼ぶ）"""
+    import asyncio
+    with _lock:
+        clients = _async_clients.pop(asyncio.get_running_loop(), {})
+    for (kind, _, _), client in clients.items():
+        if kind == "gemini":
+            close = getattr(client.aio, "aclose", None)  # 古い google-genai には無い
+        else:
+            close = client.close
+        if close is not None:
+            await close()
+
+
+def base_url_for(name: str, default: Optional[str] = None) -> Optional[str]:
+    """
+    AIごとの接続先（AGORATHEON_BASE_URL_<NAME> で上書きできる。プロキシやベンチマーク用の偽サーバーなど）
+    """
+    return os.environ.get(f'AGORATHEON_BASE_URL_{name.upper()}') or default
+
+
+def role_options(role: str) -> dict:
+    """
+    ロールの設定を取得
+
+    Returns:
+        {"api": AI名, "model": ..., "temperature": ..., "max_tokens": ...}（未指定の項目は None。
+        api を持たないロールでは AGORATHEON_<ROLE>_API を読まず、api は常に None）
+    """
+    options = {"api": None, "model": None, "temperature": None, "max_tokens": None}
+    options.update(ROLES[role])
+    prefix = f"AGORATHEON_{role.upper()}_"
+    for name in ("api", "model"):
+        if name == "api" and "api" not in ROLES[role]:
+            continue
+        value = os.environ.get(prefix + name.upper())
+        if value:
+            options[name] = value
+    return options
+
+
+def _create(kind: str, api_key: str, base_url: Optional[str], use_async: bool):
+    """SDKクライアントを作成（SDKはここで初めて読み込む）"""
+    if kind == "anthropic":
+        from anthropic import Anthropic, AsyncAnthropic
+        # 再試行は BaseAPI 側で行う（SDK の再試行と重ならないようにする）
+        return (AsyncAnthropic if use_async else Anthropic)(api_key=api_key, base_url=base_url, max_retries=0)
+    if kind == "openai":
+        from openai import AsyncOpenAI, OpenAI
+        return (AsyncOpenAI if use_async else OpenAI)(api_key=api_key, base_url=base_url, max_retries=0)
+    if kind == "gemini":
+        from google import genai
+        if base_url:
+            return genai.Client(api_key=api_key, http_options={"base_url": base_url})
+        return genai.Client(api_key=api_key)
+    raise ValueError(f"Unknown client kind: {kind}")
@@ -6,16 +6,31 @@ Gemini API Wrapper for AgoraTheon
 """
 
 import os
+import time
+import asyncio
+import hashlib
+from typing import AsyncIterator, Iterator, List, Optional
+
 from google import genai
 from google.genai import types
 
+from utils.tokens import estimate_tokens
+
+from .base import BaseAPI, Block
+from .clients import base_url_for, get_client
+
 
-class GeminiAPI:
+class GeminiAPI(BaseAPI):
     """Gemini API (Google) - 新SDK版"""
     
     ICON = "❇️"
     NAME = "gemini"
     DISPLAY_NAME = "Gemini"
+    MAX_TOKENS = 4096
+    CONTEXT_BUDGET = 120_000
+    
+    # これより小さいプロンプト先頭部分はキャッシュできない（gemini-2.5-flash の最小値）
+    CACHE_MIN_TOKENS = 1024
     
     # キャラクター設定
     SYSTEM_PROMPT = """あなたはAI討論会の参加者「Gemini」です。
@@ -35,64 +50,178 @@ class GeminiAPI:
 - 必要に応じて箇条書きも使う
 - 敬語は使わない（討論参加者として対等）"""
     
-    def __init__(self):
-        api_key = os.environ.get('GEMINI_API_KEY')
-        if not api_key:
-            raise ValueError("GEMINI_API_KEY not set")
-        self.client = genai.Client(api_key=api_key)
+    def __init__(self, client: genai.Client = None):
+        """
+        Args:
+            client: 既存のクライアント（テスト用のスタブなど。省略時は共有クライアント）
+        """
+        super().__init__()
+        if client is None:
+            client = get_client("gemini", "GEMINI_API_KEY", base_url_for(self.NAME))
+        self.client = client
         self.model_name = "gemini-2.5-flash"
+        
+        # 参考資料のキャッシュ（cached contents）: (内容のハッシュ, キャッシュ名, 有効期限)
+        self._cached = None
+        self.cache_ttl = int(os.environ.get('GEMINI_CACHE_TTL', '600'))
+    
+    @property
+    def async_client(self):
+        """asyncio用クライアント（実行中のイベントループごとの共有クライアントの .aio）"""
+        return get_client("gemini", "GEMINI_API_KEY", base_url_for(self.NAME), use_async=True).aio
     
-    def generate(self, context: str, prompt: str = "", temperature: float = 0.7, max_tokens: int = 4096) -> str:
+    def _request(self, blocks: List[Block], temperature: float, max_tokens: int, cache_name: str = None) -> tuple:
         """
-        応答を生成
+        リクエスト（contents, config）を構築
         
-        Args:
-            context: これまでの討論内容
-            prompt: 追加のユーザープロンプト
-            temperature: 生成温度
-            max_tokens: 最大トークン数
+        参考資料がキャッシュ済みなら、システムプロンプトと参考資料はキャッシュ側に入っているので送らない
+        """
+        if cache_name:
+            contents = self._build_message([b for b in blocks if b[0] != "data"])
+            config = types.GenerateContentConfig(
+                cached_content=cache_name,
+                temperature=temperature,
+                max_output_tokens=max_tokens,
+                http_options=self._http_options()
+            )
+        else:
+            contents = self._build_message(blocks)
+            config = types.GenerateContentConfig(
+                system_instruction=self.SYSTEM_PROMPT,
+                temperature=temperature,
+                max_output_tokens=max_tokens,
+                http_options=self._http_options()
+            )
+        return contents, config
+    
+    def _http_options(self) -> types.HttpOptions:
+        """リクエストの制限時間（ミリ秒で指定）"""
+        return types.HttpOptions(timeout=int(self.request_timeout * 1000))
+    
+    def _cached_content(self, blocks: List[Block]) -> Optional[str]:
+        """
+        システムプロンプト + 参考資料のキャッシュ名を返す（必要なら作成）
         
-        Returns:
-            生成された応答
+        小さすぎる資料はキャッシュできないので None（通常の送信）
         """
-        user_message = self._build_message(context, prompt)
+        data = "".join(text for kind, text in blocks if kind == "data")
+        if estimate_tokens(self.SYSTEM_PROMPT + data) < self.CACHE_MIN_TOKENS:
+            return None
+        
+        key = hashlib.sha256(data.encode('utf-8')).hexdigest()
+        now = time.time()
+        if self._cached and self._cached[0] == key and self._cached[2] > now:
+            return self._cached[1]
         
         try:
-            response = self.client.models.generate_content(
+            cache = self.client.caches.create(
                 model=self.model_name,
-                contents=user_message,
-                config=types.GenerateContentConfig(
+                config=types.CreateCachedContentConfig(
+                    display_name=f"agoratheon-{key[:12]}",
                     system_instruction=self.SYSTEM_PROMPT,
-                    temperature=temperature,
-                    max_output_tokens=max_tokens
+                    contents=[data],
+                    ttl=f"{self.cache_ttl}s"
                 )
             )
-            return response.text.strip()
         except Exception as e:
-            return f"[Gemini エラー] {str(e)}"
-    
-    def _build_message(self, context: str, prompt: str) -> str:
-        """ユーザーメッセージを構築"""
-        parts = []
-        
-        if context:
-            parts.append(f"【これまでの討論】\n{context}")
-        
-        if prompt:
-            parts.append(f"【指示】\n{prompt}")
-        else:
-            parts.append("【指示】\n上記の討論を踏まえて、あなたの見解を述べてください。")
+            # キャッシュが使えなくても生成は通常どおり行う
+            print(f"[Gemini キャッシュ作成失敗] {e}")
+            return None
         
-        return "\n\n".join(parts)
+        self._delete_cache()
+        # 期限ぎりぎりで使わないよう少し早めに切り替える
+        self._cached = (key, cache.name, now + self.cache_ttl - 30)
+        return cache.name
     
-    def health_check(self) -> dict:
-        """ヘルスチェック"""
-        try:
-            response = self.client.models.generate_content(
-                model=self.model_name,
-                contents="Reply with just 'OK'",
-                config=types.GenerateContentConfig(max_output_tokens=10)
+    def _delete_cache(self):
+        """古いキャッシュを削除（失敗しても期限切れで消える）"""
+        if self._cached:
+            try:
+                self.client.caches.delete(name=self._cached[1])
+            except Exception:
+                pass
+            self._cached = None
+    
+    def _record_response_usage(self, metadata, usage: dict):
+        """レスポンスの使用量を記録"""
+        if metadata is None:
+            return
+        self._record_usage(
+            usage,
+            input_tokens=metadata.prompt_token_count or 0,
+            output_tokens=metadata.candidates_token_count or 0,
+            cached_tokens=metadata.cached_content_token_count or 0
+        )
+    
+    def _generate(self, blocks: List[Block], temperature: float, max_tokens: int, usage: dict) -> str:
+        contents, config = self._request(blocks, temperature, max_tokens, self._cached_content(blocks))
+        response = self.client.models.generate_content(
+            model=self.model_name,
+            contents=contents,
+            config=config
+        )
+        self._record_response_usage(response.usage_metadata, usage)
+        return response.text
+    
+    def _stream(self, blocks: List[Block], temperature: float, max_tokens: int, usage: dict) -> Iterator[str]:
+        contents, config = self._request(blocks, temperature, max_tokens, self._cached_content(blocks))
+        metadata = None
+        for chunk in self.client.models.generate_content_stream(
+            model=self.model_name,
+            contents=contents,
+            config=config
+        ):
+            if chunk.usage_metadata:
+                metadata = chunk.usage_metadata
+            if chunk.text:
+                yield chunk.text
+        self._record_response_usage(metadata, usage)
+    
+    async def _agenerate(self, blocks: List[Block], temperature: float, max_tokens: int, usage: dict) -> str:
+        cache_name = await asyncio.to_thread(self._cached_content, blocks)
+        contents, config = self._request(blocks, temperature, max_tokens, cache_name)
+        response = await self.async_client.models.generate_content(
+            model=self.model_name,
+            contents=contents,
+            config=config
+        )
+        self._record_response_usage(response.usage_metadata, usage)
+        return response.text
+    
+    async def _astream(self, blocks: List[Block], temperature: float, max_tokens: int, usage: dict) -> AsyncIterator[str]:
+        cache_name = await asyncio.to_thread(self._cached_content, blocks)
+        contents, config = self._request(blocks, temperature, max_tokens, cache_name)
+        metadata = None
+        async for chunk in await self.async_client.models.generate_content_stream(
+            model=self.model_name,
+            contents=contents,
+            config=config
+        ):
+            if chunk.usage_metadata:
+                metadata = chunk.usage_metadata
+            if chunk.text:
+                yield chunk.text
+        self._record_response_usage(metadata, usage)
+    
+    def _complete(self, prompt: str, system: str, temperature: float, max_tokens: int, model: str) -> str:
+        response = self.client.models.generate_content(
+            model=model or self.model_name,
+            contents=prompt,
+            config=types.GenerateContentConfig(
+                system_instruction=system or None,
+                temperature=temperature,
+                max_output_tokens=max_tokens,
+                http_options=self._http_options()
             )
-            return {"status": "healthy", "model": self.model_name}
-        except Exception as e:
-            return {"status": "unhealthy", "error": str(e)}
+        )
+        return response.text
+    
+    def _probe(self) -> str:
+        # モデル情報の取得のみ（生成は行わない）
+        model = self.client.models.get(
+            model=self.model_name,
+            config=types.GetModelConfig(
+                http_options=types.HttpOptions(timeout=int(self.HEALTH_TIMEOUT * 1000))
+            )
+        )
+        return model.name
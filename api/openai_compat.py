@@ -0,0 +1,133 @@
+"""
+OpenAI-Compatible API Wrapper for AgoraTheon
+OpenAI互換の Chat Completions API を使うラッパーの共通処理（ChatGPT / Grok）
+
+OpenAI・xAI とも、先頭が一致するプロンプトは自動でキャッシュされるため、
+システムプロンプト → 参考資料 → 履歴 の順で送るだけでキャッシュが効く。
+"""
+
+from typing import AsyncIterator, Iterator, List
+
+from openai import AsyncOpenAI, OpenAI
+
+from .base import BaseAPI, Block
+from .clients import base_url_for, get_client
+
+
+class OpenAICompatAPI(BaseAPI):
+    """OpenAI互換APIの基底クラス"""
+
+    # サブクラスで設定
+    API_KEY_ENV = ""
+    BASE_URL = None  # None なら OpenAI 本家
+    MODEL = ""
+
+    def __init__(self, client: OpenAI = None):
+        """
+        Args:
+            client: 既存のクライアント（テスト用のスタブなど。省略時は共有クライアント）
+        """
+        super().__init__()
+        if client is None:
+            client = get_client("openai", self.API_KEY_ENV, base_url_for(self.NAME, self.BASE_URL))
+        self.client = client
+        self.model = self.MODEL
+
+    @property
+    def async_client(self) -> AsyncOpenAI:
+        """asyncio用クライアント（実行中のイベントループごとの共有クライアント）"""
+        return get_client("openai", self.API_KEY_ENV, base_url_for(self.NAME, self.BASE_URL), use_async=True)
+
+    def _messages(self, blocks: List[Block]) -> list:
+        """チャットメッセージを構築"""
+        return [
+            {"role": "system", "content": self.SYSTEM_PROMPT},
+            {"role": "user", "content": self._build_message(blocks)}
+        ]
+
+    def _record_response_usage(self, response_usage, usage: dict):
+        """レスポンスの使用量を記録"""
+        if response_usage is None:
+            return
+        details = getattr(response_usage, "prompt_tokens_details", None)
+        cached = getattr(details, "cached_tokens", 0) or 0
+        self._record_usage(
+            usage,
+            input_tokens=response_usage.prompt_tokens,
+            output_tokens=response_usage.completion_tokens,
+            cached_tokens=cached
+        )
+
+    def _generate(self, blocks: List[Block], temperature: float, max_tokens: int, usage: dict) -> str:
+        response = self.client.chat.completions.create(
+            model=self.model,
+            messages=self._messages(blocks),
+            temperature=temperature,
+            max_tokens=max_tokens,
+            timeout=self.request_timeout
+        )
+        self._record_response_usage(response.usage, usage)
+        return response.choices[0].message.content
+
+    def _stream(self, blocks: List[Block], temperature: float, max_tokens: int, usage: dict) -> Iterator[str]:
+        with self.client.chat.completions.create(
+            model=self.model,
+            messages=self._messages(blocks),
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=True,
+            stream_options={"include_usage": True},
+            timeout=self.request_timeout
+        ) as stream:
+            for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+                if chunk.usage:
+                    # 使用量は最後のチャンク（choices が空）で届く
+                    self._record_response_usage(chunk.usage, usage)
+
+    async def _agenerate(self, blocks: List[Block], temperature: float, max_tokens: int, usage: dict) -> str:
+        response = await self.async_client.chat.completions.create(
+            model=self.model,
+            messages=self._messages(blocks),
+            temperature=temperature,
+            max_tokens=max_tokens,
+            timeout=self.request_timeout
+        )
+        self._record_response_usage(response.usage, usage)
+        return response.choices[0].message.content
+
+    async def _astream(self, blocks: List[Block], temperature: float, max_tokens: int, usage: dict) -> AsyncIterator[str]:
+        stream = await self.async_client.chat.completions.create(
+            model=self.model,
+            messages=self._messages(blocks),
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=True,
+            stream_options={"include_usage": True},
+            timeout=self.request_timeout
+        )
+        async with stream:
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+                if chunk.usage:
+                    self._record_response_usage(chunk.usage, usage)
+
+    def _complete(self, prompt: str, system: str, temperature: float, max_tokens: int, model: str) -> str:
+        messages = [{"role": "user", "content": prompt}]
+        if system:
+            messages.insert(0, {"role": "system", "content": system})
+        response = self.client.chat.completions.create(
+            model=model or self.model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            timeout=self.request_timeout
+        )
+        return response.choices[0].message.content
+    
+    def _probe(self) -> str:
+        # モデル情報の取得のみ（生成は行わない）
+        model = self.client.models.retrieve(self.model, timeout=self.HEALTH_TIMEOUT)
+        return model.id
@@ -0,0 +1,173 @@
+"""
+Rate Limiter for AgoraTheon
+AIごとのリクエスト数（RPM）・トークン数（TPM）の制限
+
+同じAIを使う全インスタンス・用途（参加者・フィルタ・要約・司会）で1つのリミッターを共有する。
+上限に達したら失敗させずに待たせ、待っている呼び出しは来た順（FIFO）に通す。
+"""
+
+import os
+import time
+import threading
+from collections import deque
+from typing import Dict
+
+
+# AIごとのデフォルト上限 (RPM, TPM)。0 は無制限
+# RPM は各社の最下位ティア相当。TPM はモデルやティアで大きく違うので環境変数で設定する
+DEFAULT_LIMITS = {
+    "claude": (50, 0),
+    "gemini": (1000, 0),
+    "chatgpt": (500, 0),
+    "grok": (480, 0),
+}
+
+
+class TokenBucket:
+    """1分あたり limit 個まで、連続的に補充されるバケツ（limit=0 なら無制限）"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.level = float(limit)
+        self._updated = time.monotonic()
+
+    def refill(self):
+        now = time.monotonic()
+        if self.limit:
+            self.level = min(self.limit, self.level + (now - self._updated) * self.limit / 60)
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """amount を取り出せるまでの秒数（refill 済みであること）"""
+        if not self.limit or self.level >= amount:
+            return 0.0
+        return (amount - self.level) * 60 / self.limit
+
+    def take(self, amount: float):
+        if self.limit:
+            self.level -= amount
+
+
+class RateLimiter:
+    """RPM と TPM の2つのバケツで呼び出しを待たせる"""
+
+    def __init__(self, name: str, rpm: int = 0, tpm: int = 0):
+        self.name = name
+        self._requests = TokenBucket(rpm)
+        self._tokens = TokenBucket(tpm)
+        self._cond = threading.Condition()
+        self._queue = deque()  # 待っている呼び出しの順番札
+
+        # 指標
+        self.acquired = 0
+        self.waited = 0  # 待たされた回数
+        self.wait_time = 0.0  # 待った時間の合計（秒）
+        self.max_wait = 0.0
+        self.max_depth = 0
+
+    @property
+    def rpm(self) -> int:
+        return self._requests.limit
+
+    @property
+    def tpm(self) -> int:
+        return self._tokens.limit
+
+    @property
+    def depth(self) -> int:
+        """いま待っている呼び出しの数"""
+        with self._cond:
+            return len(self._queue)
+
+    def acquire(self, tokens: int = 0) -> float:
+        """
+        1リクエスト分と tokens トークン分の枠を確保（空くまで待つ）
+
+        Args:
+            tokens: 見込みのトークン数（入力 + 最大出力）。上限を超える分は上限に丸める
+
+        Returns:
+            待った秒数
+        """
+        if not self.rpm and not self.tpm:
+            self.acquired += 1
+            return 0.0
+
+        if self.tpm:
+            tokens = min(tokens, self.tpm)
+        ticket = object()
+        start = time.monotonic()
+        with self._cond:
+            self._queue.append(ticket)
+            self.max_depth = max(self.max_depth, len(self._queue))
+            try:
+                while True:
+                    if self._queue[0] is ticket:
+                        self._requests.refill()
+                        self._tokens.refill()
+                        wait = max(self._requests.wait_time(1), self._tokens.wait_time(tokens))
+                        if wait <= 0:
+                            self._requests.take(1)
+                            self._tokens.take(tokens)
+                            break
+                        self._cond.wait(wait)
+                    else:
+                        # 先に並んだ呼び出しが通るまで待つ
+                        self._cond.wait()
+            finally:
+                self._queue.remove(ticket)
+                self._cond.notify_all()
+
+            waited = time.monotonic() - start
+            self.acquired += 1
+            if waited > 0.001:
+                self.waited += 1
+                self.wait_time += waited
+                self.max_wait = max(self.max_wait, waited)
+        return waited
+
+    def settle(self, reserved: int, actual: int):
+        """確保した見込みトークン数と実際の使用量の差を精算"""
+        if not self.tpm or not actual:
+            return
+        with self._cond:
+            self._tokens.refill()
+            self._tokens.level = min(self.tpm, self._tokens.level + min(reserved, self.tpm) - actual)
+            self._cond.notify_all()
+
+    def format_stats(self) -> str:
+        """指標の表示用文字列"""
+        limits = " / ".join(part for part in (
+            f"{self.rpm}RPM" if self.rpm else "",
+            f"{self.tpm:,}TPM" if self.tpm else "",
+        ) if part) or "無制限"
+        text = f"{limits}、{self.acquired}回中 {self.waited}回待ち（合計 {self.wait_time:.1f}秒、最大 {self.max_wait:.1f}秒）"
+        if self.max_depth > 1:
+            text += f"、最大待ち行列 {self.max_depth}"
+        return text
+
+
+_limiters: Dict[str, RateLimiter] = {}
+_lock = threading.Lock()
+
+
+def get_limiter(name: str) -> RateLimiter:
+    """
+    AIごとの共有リミッター
+
+    上限は AGORATHEON_RPM_<NAME> / AGORATHEON_TPM_<NAME> で変更できる（0 で無制限）
+    """
+    with _lock:
+        limiter = _limiters.get(name)
+        if limiter is None:
+            rpm, tpm = DEFAULT_LIMITS.get(name, (0, 0))
+            rpm = int(os.environ.get(f'AGORATHEON_RPM_{name.upper()}', rpm))
+            tpm = int(os.environ.get(f'AGORATHEON_TPM_{name.upper()}', tpm))
+            limiter = _limiters[name] = RateLimiter(name, rpm, tpm)
+        return limiter
+
+
+def all_limiters() -> Dict[str, RateLimiter]:
+    """作成済みのリミッター"""
+    with _lock:
+        return dict(_limiters)
@@ -0,0 +1,178 @@
+"""
+Resilience Utilities for AgoraTheon
+API呼び出しの失敗への備え（エラー型・リトライ判定・サーキットブレーカー）
+
+- 失敗は応答テキストではなく ProviderError として呼び出し元に返す（討論に保存させない）
+- 一時的な失敗（タイムアウト・429・5xx など）はジッター付きの指数バックオフで再試行する
+- 続けて失敗したAIはしばらく「停止中」とし、呼び出さずにすぐ失敗させる（司会が別のAIに振り直す）
+"""
+
+import os
+import time
+import random
+import threading
+from typing import Dict
+
+
+# 再試行する HTTP ステータス
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504, 529}
+
+
+class ProviderError(Exception):
+    """APIの呼び出しに失敗した"""
+
+    def __init__(self, provider: str, message: str, retryable: bool = False, cause: Exception = None):
+        super().__init__(message)
+        self.provider = provider
+        self.retryable = retryable
+        self.cause = cause
+
+
+class CircuitOpenError(ProviderError):
+    """サーキットブレーカーが開いている（停止中なので呼び出さなかった）"""
+
+    def __init__(self, provider: str, retry_in: float):
+        super().__init__(provider, f"停止中（{retry_in:.0f}秒後に再試行）", retryable=False)
+        self.retry_in = retry_in
+
+
+def is_retryable(e: Exception) -> bool:
+    """再試行で回復しうるエラーか（SDKに依存しないよう属性と型名で判定）"""
+    if isinstance(e, (TimeoutError, ConnectionError)):
+        return True
+
+    status = getattr(e, "status_code", None)
+    if status is None:
+        status = getattr(e, "code", None)  # google-genai の APIError
+    if isinstance(status, int):
+        return status in RETRYABLE_STATUS
+
+    # httpx 由来のタイムアウト・接続エラー（APITimeoutError, APIConnectionError, ReadTimeout など）
+    name = type(e).__name__
+    return "Timeout" in name or "Connection" in name
+
+
+def backoff_delay(attempt: int, base: float = 0.5, cap: float = 8.0) -> float:
+    """attempt 回目（0始まり）の再試行までの待ち時間（フルジッター）"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class CircuitBreaker:
+    """
+    AIごとのサーキットブレーカー
+
+    - closed: 通常どおり呼び出す
+    - open: 連続 failure_threshold 回失敗した。cooldown 秒は呼び出さない
+    - half-open: cooldown 経過後、試しに1回だけ呼び出す（成功で closed、失敗で再び open、
+      打ち切り・中断で結果が出なければ release_trial() で次の呼び出しを試しにする）
+    """
+
+    def __init__(self, name: str, failure_threshold: int = None, cooldown: float = None):
+        if failure_threshold is None:
+            failure_threshold = int(os.environ.get('AGORATHEON_BREAKER_FAILURES', '3'))
+        if cooldown is None:
+            cooldown = float(os.environ.get('AGORATHEON_BREAKER_COOLDOWN', '30'))
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial = False  # half-open の試し呼び出し中か
+        self.trips = 0  # open になった回数
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state()
+
+    def is_open(self) -> bool:
+        """呼び出しを受け付けない状態か（half-open で試し呼び出し可能なら False）"""
+        with self._lock:
+            state = self._state()
+            return state == "open" or (state == "half-open" and self._trial)
+
+    def before_call(self) -> bool:
+        """
+        呼び出し前に確認
+
+        Returns:
+            この呼び出しが half-open の試し呼び出しか（True なら結果を記録するか release_trial() を呼ぶ）
+
+        Raises:
+            CircuitOpenError: 停止中
+        """
+        with self._lock:
+            state = self._state()
+            if state == "open" or (state == "half-open" and self._trial):
+                raise CircuitOpenError(self.name, self._retry_in())
+            if state == "half-open":
+                self._trial = True
+                return True
+            return False
+
+    def release_trial(self):
+        """試し呼び出しが成功・失敗のどちらにもならずに終わった（ストリームの打ち切り・Ctrl-C など）"""
+        with self._lock:
+            self._trial = False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial or self._failures >= self.failure_threshold:
+                if self._opened_at is None or self._trial:
+                    self.trips += 1
+                self._opened_at = time.monotonic()
+                self._trial = False
+
+    def _state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at < self.cooldown:
+            return "open"
+        return "half-open"
+
+    def _retry_in(self) -> float:
+        if self._opened_at is None:
+            return 0.0
+        return max(0.0, self.cooldown - (time.monotonic() - self._opened_at))
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    """AIごとの共有ブレーカー（同じAIのインスタンス・用途で共有）"""
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = _breakers[name] = CircuitBreaker(name)
+        return breaker
+
+
+def open_breakers() -> Dict[str, float]:
+    """停止中のAI → 再開までの秒数"""
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    result = {}
+    for breaker in breakers:
+        with breaker._lock:
+            if breaker._state() == "open":
+                result[breaker.name] = breaker._retry_in()
+    return result
+
+
+def unavailable(names) -> list:
+    """names のうち、いま呼び出せない（停止中の）AI"""
+    with _breakers_lock:
+        breakers = {name: _breakers.get(name) for name in names}
+    return [name for name, breaker in breakers.items() if breaker is not None and breaker.is_open()]
+
@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+AgoraTheon Batch Runner
+討論をまとめて無人で進める（夜間バッチ用）
+
+    python batch.py manifest.json                # マニフェストの討論を並行に進める
+    python batch.py manifest.json --jobs 8       # 同時に進める討論の数
+    python batch.py manifest.json --report r.json
+
+マニフェスト（JSON）:
+    {
+      "output_dir": "debates",                   # file 省略時の保存先（マニフェストからの相対パス）
+      "jobs": 4,                                 # 同時に進める討論の数
+      "limits": {"claude": 2, "grok": 1},        # AIごとの同時呼び出し数の上限（省略時は jobs）
+      "defaults": {"rounds": 8, "routing": "rotate"},
+      "debates": [
+        {"title": "AIの意識について", "data": ["資料.md"], "rounds": 12, "routing": "auto"},
+        {"title": "ベーシックインカム", "routing": ["claude", "grok"], "prompt": "反論を中心に"}
+      ]
+    }
+
+routing（誰に発言させるか）:
+- "rotate": claude → gemini → chatgpt → grok の順に回す
+- "auto": スミレん司会が振り分ける
+- "panel": 1ラウンドで全員に同時に聞く
+- AI名のリスト: その順に回す
+
+進み具合は討論のJSONファイル（スナップショット + ジャーナル）そのものなので、
+途中で止めても同じマニフェストで再実行すれば続きから進める（rounds に達した討論は飛ばす）。
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from typing import Dict, Iterable
+
+from agoratheon import AgoraTheon
+from api import API_MAP
+from api.resilience import ProviderError, unavailable
+from utils import telemetry
+
+
+# 振り分けの順番（rotate）
+ROTATION = ["claude", "gemini", "chatgpt", "grok"]
+
+# 続けてこの回数失敗したら、その討論は打ち切る
+MAX_CONSECUTIVE_FAILURES = 4
+
+
+class ProviderCaps:
+    """AIごとの同時呼び出し数の上限（全討論で共有）"""
+
+    def __init__(self, limits: Dict[str, int], default: int):
+        self._semaphores = {name: threading.BoundedSemaphore(max(1, limits.get(name, default)))
+                            for name in API_MAP.keys()}
+        self._lock = threading.Lock()
+        self._in_flight = {name: 0 for name in API_MAP.keys()}
+        self.peak = {name: 0 for name in API_MAP.keys()}  # 同時に呼び出していた最大数
+
+    @contextmanager
+    def hold(self, names: Iterable[str]):
+        """names の枠を確保している間だけ呼び出す（デッドロックしないよう常に同じ順で確保）"""
+        names = sorted(set(names))
+        for name in names:
+            self._semaphores[name].acquire()
+            with self._lock:
+                self._in_flight[name] += 1
+                self.peak[name] = max(self.peak[name], self._in_flight[name])
+        try:
+            yield
+        finally:
+            for name in reversed(names):
+                with self._lock:
+                    self._in_flight[name] -= 1
+                self._semaphores[name].release()
+
+
+class DebateJob:
+    """1つの討論を rounds まで進める"""
+
+    def __init__(self, spec: dict, caps: ProviderCaps, log):
+        self.spec = spec
+        self.title = spec["title"]
+        self.file = spec["file"]
+        self.rounds = int(spec.get("rounds", 8))
+        self.routing = spec.get("routing", "rotate")
+        self.prompt = spec.get("prompt", "")
+        self.caps = caps
+        self._log = log
+
+        self.result = {"title": self.title, "file": self.file, "status": "pending",
+                       "rounds": self.rounds, "done_before": 0, "done": 0, "new_turns": 0,
+                       "failures": 0, "wall_time": 0.0, "telemetry": []}
+        self._new_messages = 0  # このバッチで追加した発言の数
+
+    def run(self) -> dict:
+        start = time.perf_counter()
+        agora = AgoraTheon(self.file, self.spec.get("data"), auto_mode=self.routing == "auto", streaming=False)
+        try:
+            done = self._rounds_done(agora)
+            self.result["done_before"] = done
+            if done >= self.rounds:
+                self.result["status"] = "skipped"
+                return self.result
+
+            failures = 0
+            while done < self.rounds:
+                if self._round(agora):
+                    done += 1
+                    failures = 0
+                else:
+                    self.result["failures"] += 1
+                    failures += 1
+                    if failures >= MAX_CONSECUTIVE_FAILURES:
+                        self.result["status"] = "failed"
+                        break
+            else:
+                self.result["status"] = "done"
+            self.result["done"] = done
+            self.result["new_turns"] = done - self.result["done_before"]
+            self.result["telemetry"] = [m.telemetry for m in agora.discussion.messages[-self._new_messages:]
+                                        if m.telemetry] if self._new_messages else []
+        except Exception as e:
+            self.result["status"] = "failed"
+            self.result["error"] = str(e)
+        finally:
+            agora.close()
+            self.result["wall_time"] = round(time.perf_counter() - start, 3)
+        return self.result
+
+    def _rounds_done(self, agora: AgoraTheon) -> int:
+        """これまでに進んだラウンド数（パネルは1ラウンドで全員が発言する）"""
+        count = sum(1 for m in agora.discussion.messages if not m.deleted and m.speaker in API_MAP)
+        if self.routing == "panel":
+            return count // len(API_MAP)
+        return count
+
+    def _round(self, agora: AgoraTheon) -> bool:
+        """1ラウンド進める（失敗したら False）"""
+        before = len(agora.discussion.messages)
+        if self.routing == "panel":
+            with self.caps.hold(API_MAP.keys()):
+                agora.cmd_panel(self.prompt)
+            added = len(agora.discussion.messages) - before
+            self._new_messages += added
+            return added > 0
+
+        routed = agora.route_next() if self.routing == "auto" else None
+        if routed:
+            target, _, routing_latency = routed
+        else:
+            last = agora.discussion.get_last_message()
+            target, routing_latency = self._next_speaker(last.speaker if last else ""), None
+
+        try:
+            with self.caps.hold([target]):
+                agora.take_turn(target, self.prompt, routing_latency=routing_latency)
+        except ProviderError as e:
+            self._log(f"❌ {self.title}: {target}: {e}")
+            return False
+        self._new_messages += 1
+        return True
+
+    def _next_speaker(self, last_speaker: str) -> str:
+        """rotate / 名前のリストで次に話すAI（停止中のAIは飛ばす）"""
+        order = ROTATION if self.routing in ("rotate", "auto") else list(self.routing)
+        skip = set(unavailable(order))
+        start = order.index(last_speaker) + 1 if last_speaker in order else 0
+        for i in range(len(order)):
+            name = order[(start + i) % len(order)]
+            if name not in skip:
+                return name
+        return order[start % len(order)]
+
+
+def load_manifest(path: str) -> dict:
+    """マニフェストを読み、討論ごとの設定を埋める（相対パスはマニフェストの場所から）"""
+    with open(path, encoding="utf-8") as f:
+        manifest = json.load(f)
+    base = os.path.dirname(os.path.abspath(path))
+    output_dir = os.path.join(base, manifest.get("output_dir", "."))
+    defaults = manifest.get("defaults", {})
+
+    debates = []
+    for entry in manifest.get("debates", []):
+        spec = dict(defaults, **entry)
+        if "title" not in spec:
+            raise ValueError(f"title がありません: {entry}")
+        routing = spec.get("routing", "rotate")
+        if isinstance(routing, list):
+            unknown = [name for name in routing if name not in API_MAP]
+            if unknown or not routing:
+                raise ValueError(f"{spec['title']}: 不明なAI {unknown}")
+        elif routing not in ("rotate", "auto", "panel"):
+            raise ValueError(f"{spec['title']}: 不明な routing {routing}")
+        spec["file"] = os.path.join(base, spec["file"]) if spec.get("file") \
+            else os.path.join(output_dir, f"{spec['title']}.md")
+        spec["data"] = [os.path.join(base, p) for p in spec.get("data", [])]
+        debates.append(spec)
+    manifest["debates"] = debates
+    return manifest
+
+
+def run_batch(manifest: dict, jobs: int = None) -> dict:
+    """
+    マニフェストの討論を並行に進める
+
+    Returns:
+        レポート（討論ごとの結果と全体の所要時間・スループット）
+    """
+    jobs = jobs or manifest.get("jobs", 4)
+    caps = ProviderCaps(manifest.get("limits", {}), default=jobs)
+    print_lock = threading.Lock()
+
+    def log(text: str):
+        with print_lock:
+            print(text, flush=True)
+
+    for spec in manifest["debates"]:
+        os.makedirs(os.path.dirname(spec["file"]) or ".", exist_ok=True)
+
+    start = time.perf_counter()
+    results = []
+    with ThreadPoolExecutor(max_workers=jobs, thread_name_prefix="agoratheon-batch") as pool:
+        futures = [pool.submit(DebateJob(spec, caps, log).run) for spec in manifest["debates"]]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            log(format_result(result))
+    wall = time.perf_counter() - start
+
+    new_turns = sum(r["new_turns"] for r in results)
+    summary = telemetry.summarize(t for r in results for t in r["telemetry"])
+    return {
+        "wall_time": round(wall, 3),
+        "debates": len(results),
+        "status": {status: sum(1 for r in results if r["status"] == status)
+                   for status in ("done", "skipped", "failed")},
+        "new_turns": new_turns,
+        "turns_per_minute": round(new_turns / wall * 60, 2) if wall else 0.0,
+        "output_tokens_per_second": round(sum(e["output_tokens"] for e in summary.values()) / wall, 1) if wall else 0.0,
+        "peak_concurrency": caps.peak,
+        "providers": summary,
+        "results": [{k: v for k, v in r.items() if k != "telemetry"} for r in results],
+    }
+
+
+def format_result(result: dict) -> str:
+    """1つの討論の結果の表示"""
+    icon = {"done": "✅", "skipped": "⏭️", "failed": "❌"}.get(result["status"], "・")
+    text = (f"{icon} {result['title']}: {result['done'] or result['done_before']}/{result['rounds']}ラウンド"
+            f"（新規 {result['new_turns']}、{result['wall_time']:.1f}秒")
+    if result["failures"]:
+        text += f"、失敗 {result['failures']}回"
+    if result.get("error"):
+        text += f"、{result['error']}"
+    return text + "）"
+
+
+def format_report(report: dict) -> str:
+    """全体のまとめの表示"""
+    status = report["status"]
+    lines = [
+        f"🏁 {report['debates']}件（完了 {status['done']} / 済み {status['skipped']} / 打ち切り {status['failed']}）"
+        f" {report['wall_time']:.1f}秒",
+        f"   {report['new_turns']}ターン（{report['turns_per_minute']:.1f}ターン/分、"
+        f"出力 {report['output_tokens_per_second']:.1f}トークン/秒）",
+    ]
+    peaks = ", ".join(f"{name} {peak}" for name, peak in report["peak_concurrency"].items() if peak)
+    if peaks:
+        lines.append(f"   最大同時呼び出し: {peaks}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='AgoraTheon バッチ実行（討論をまとめて無人で進める）')
+    parser.add_argument('manifest', help='マニフェスト（JSON）')
+    parser.add_argument('--jobs', '-j', type=int, help='同時に進める討論の数（マニフェストの jobs より優先）')
+    parser.add_argument('--report', metavar='PATH', help='レポートをJSONで保存')
+    args = parser.parse_args()
+
+    try:
+        manifest = load_manifest(args.manifest)
+    except (OSError, ValueError) as e:
+        print(f"マニフェストを読めません: {e}", file=sys.stderr)
+        sys.exit(2)
+
+    report = run_batch(manifest, args.jobs)
+    print(format_report(report))
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    if report["status"]["failed"]:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,309 @@
+"""
+Fake Provider Servers for AgoraTheon Benchmarks
+ベンチマーク用の偽APIサーバー（実際のAPIを呼ばずに AgoraTheon 自身の処理時間を測る）
+
+各社SDKがそのまま話せる形のレスポンスを返す:
+- OpenAI 互換: POST /v1/chat/completions（ChatGPT / Grok）
+- Anthropic: POST /v1/messages
+- Gemini: POST /v1beta/models/<model>:generateContent / :streamGenerateContent、/v1beta/cachedContents
+- Ollama: POST /api/generate、GET /api/tags（スミレん司会）
+
+応答は「初回トークンまで ttft 秒、以降は tokens_per_sec の速さ」で返す。
+サーバーは処理した各リクエストの開始・終了時刻を記録する（AgoraTheon 側の時間との差を出すため）。
+"""
+
+import re
+import json
+import time
+import threading
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterator, List, Tuple
+from urllib.parse import urlparse
+
+from utils.tokens import estimate_tokens
+
+
+# 応答に使う文（繰り返して reply_tokens 分にする）
+REPLY_TEXT = "これはベンチマーク用の応答です。議論の内容には意味がありません。"
+
+# 振り分け（JSON出力）への応答
+ROUTING_REPLY = {"target": "claude", "intro": "Claudeさん、お願いします"}
+
+
+@dataclass
+class ServerConfig:
+    """偽サーバーの応答速度"""
+    ttft: float = 0.2  # 初回トークンまでの秒数
+    tokens_per_sec: float = 200.0  # 以降の出力速度（0なら待たずに全部返す）
+    reply_tokens: int = 60  # 応答のトークン数（1チャンク = 1トークンとして送る）
+
+
+class FakeServer(ThreadingHTTPServer):
+    """1つの偽サーバー（kind: "openai" / "anthropic" / "gemini" / "ollama"）"""
+
+    daemon_threads = True
+
+    def __init__(self, kind: str, config: ServerConfig = None, port: int = 0):
+        super().__init__(("127.0.0.1", port), _Handler)
+        self.kind = kind
+        self.config = config or ServerConfig()
+        self._lock = threading.Lock()
+        self._spans: List[Tuple[float, float]] = []  # (開始, 終了)（time.perf_counter）
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def start(self) -> "FakeServer":
+        """バックグラウンドで待ち受けを始める"""
+        self._thread = threading.Thread(target=self.serve_forever, name=f"fake-{self.kind}", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def record(self, start: float, end: float):
+        with self._lock:
+            self._spans.append((start, end))
+
+    def spans(self) -> List[Tuple[float, float]]:
+        """処理したリクエストの (開始, 終了)"""
+        with self._lock:
+            return list(self._spans)
+
+    def reply_pieces(self) -> List[str]:
+        """応答を1トークンずつに分けたもの"""
+        text = (REPLY_TEXT * (self.config.reply_tokens // len(REPLY_TEXT) + 1))[:self.config.reply_tokens]
+        return list(text)
+
+    def paced(self, pieces: List[str]) -> Iterator[str]:
+        """初回トークン・出力速度に合わせて待ちながら返す"""
+        time.sleep(self.config.ttft)
+        interval = 1.0 / self.config.tokens_per_sec if self.config.tokens_per_sec else 0.0
+        for i, piece in enumerate(pieces):
+            if i and interval:
+                time.sleep(interval)
+            yield piece
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """リクエストを kind ごとの処理に振り分ける"""
+
+    protocol_version = "HTTP/1.1"  # SDK は接続を使い回す
+
+    server: FakeServer
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def do_DELETE(self):
+        self._handle("DELETE")
+
+    def _handle(self, method: str):
+        start = time.perf_counter()
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length) or b"{}") if length else {}
+        path = urlparse(self.path).path
+        try:
+            handler = getattr(self, f"_{self.server.kind}")
+            handler(method, path, body)
+        finally:
+            self.server.record(start, time.perf_counter())
+
+    # --- 送信 ---
+
+    def _send_json(self, data: dict, status: int = 200):
+        payload = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _start_sse(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+    def _send_event(self, data: dict = None, event: str = None, raw: str = None):
+        text = f"event: {event}\n" if event else ""
+        text += f"data: {raw if raw is not None else json.dumps(data, ensure_ascii=False)}\n\n"
+        payload = text.encode("utf-8")
+        self.wfile.write(f"{len(payload):x}\r\n".encode() + payload + b"\r\n")
+        self.wfile.flush()
+
+    def _end_sse(self):
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def _not_found(self):
+        self._send_json({"error": {"message": f"not found: {self.path}"}}, status=404)
+
+    def _input_tokens(self, body: dict) -> int:
+        return estimate_tokens(json.dumps(body, ensure_ascii=False))
+
+    # --- OpenAI 互換 ---
+
+    def _openai(self, method: str, path: str, body: dict):
+        if method == "GET" and "/models/" in path:
+            self._send_json({"id": path.rsplit("/", 1)[-1], "object": "model", "created": 0, "owned_by": "bench"})
+            return
+        if not path.endswith("/chat/completions"):
+            self._not_found()
+            return
+
+        pieces = self.server.reply_pieces()
+        usage = {"prompt_tokens": self._input_tokens(body), "completion_tokens": len(pieces),
+                 "total_tokens": self._input_tokens(body) + len(pieces),
+                 "prompt_tokens_details": {"cached_tokens": 0}}
+        base = {"id": "chatcmpl-bench", "created": int(time.time()), "model": body.get("model", "")}
+        if not body.get("stream"):
+            text = "".join(self.server.paced(pieces))
+            self._send_json(dict(base, object="chat.completion", usage=usage, choices=[
+                {"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}]))
+            return
+
+        self._start_sse()
+        for piece in self.server.paced(pieces):
+            self._send_event(dict(base, object="chat.completion.chunk", choices=[
+                {"index": 0, "delta": {"content": piece}, "finish_reason": None}]))
+        self._send_event(dict(base, object="chat.completion.chunk", choices=[], usage=usage))
+        self._send_event(raw="[DONE]")
+        self._end_sse()
+
+    # --- Anthropic ---
+
+    def _anthropic(self, method: str, path: str, body: dict):
+        if method == "GET" and "/models/" in path:
+            model = path.rsplit("/", 1)[-1]
+            self._send_json({"type": "model", "id": model, "display_name": model,
+                             "created_at": "2025-01-01T00:00:00Z"})
+            return
+        if not path.endswith("/messages"):
+            self._not_found()
+            return
+
+        pieces = self.server.reply_pieces()
+        message = {"id": "msg_bench", "type": "message", "role": "assistant", "model": body.get("model", ""),
+                   "stop_reason": None, "stop_sequence": None}
+        usage = {"input_tokens": self._input_tokens(body), "output_tokens": len(pieces),
+                 "cache_read_input_tokens": 0, "cache_creation_input_tokens": 0}
+        if not body.get("stream"):
+            text = "".join(self.server.paced(pieces))
+            self._send_json(dict(message, content=[{"type": "text", "text": text}],
+                                 stop_reason="end_turn", usage=usage))
+            return
+
+        self._start_sse()
+        self._send_event({"type": "message_start", "message": dict(message, content=[],
+                                                                   usage=dict(usage, output_tokens=1))},
+                         event="message_start")
+        self._send_event({"type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""}},
+                         event="content_block_start")
+        for piece in self.server.paced(pieces):
+            self._send_event({"type": "content_block_delta", "index": 0,
+                              "delta": {"type": "text_delta", "text": piece}}, event="content_block_delta")
+        self._send_event({"type": "content_block_stop", "index": 0}, event="content_block_stop")
+        self._send_event({"type": "message_delta", "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+                          "usage": {"output_tokens": len(pieces)}}, event="message_delta")
+        self._send_event({"type": "message_stop"}, event="message_stop")
+        self._end_sse()
+
+    # --- Gemini ---
+
+    def _gemini(self, method: str, path: str, body: dict):
+        if "/cachedContents" in path:
+            if method == "POST":
+                self._send_json({"name": "cachedContents/bench", "model": body.get("model", ""),
+                                 "expireTime": "2099-01-01T00:00:00Z"})
+            else:
+                self._send_json({})
+            return
+        match = re.search(r"/models/([^/:]+)(?::(\w+))?$", path)
+        if not match:
+            self._not_found()
+            return
+        model, action = match.groups()
+        if method == "GET":
+            self._send_json({"name": f"models/{model}", "displayName": model})
+            return
+
+        config = body.get("generationConfig", {})
+        if config.get("responseMimeType") == "application/json":
+            # スミレん司会（Gemini バックエンド）の振り分け
+            pieces = [json.dumps(ROUTING_REPLY, ensure_ascii=False)]
+        else:
+            pieces = self.server.reply_pieces()
+        usage = {"promptTokenCount": self._input_tokens(body), "candidatesTokenCount": len(pieces),
+                 "totalTokenCount": self._input_tokens(body) + len(pieces)}
+
+        def chunk(text: str, final: bool = False) -> dict:
+            data = {"candidates": [{"content": {"role": "model", "parts": [{"text": text}]}, "index": 0}],
+                    "modelVersion": model}
+            if final:
+                data["candidates"][0]["finishReason"] = "STOP"
+                data["usageMetadata"] = usage
+            return data
+
+        if action != "streamGenerateContent":
+            self._send_json(chunk("".join(self.server.paced(pieces)), final=True))
+            return
+
+        self._start_sse()
+        pending = None
+        for piece in self.server.paced(pieces):
+            if pending is not None:
+                self._send_event(chunk(pending))
+            pending = piece
+        self._send_event(chunk(pending or "", final=True))
+        self._end_sse()
+
+    # --- Ollama ---
+
+    def _ollama(self, method: str, path: str, body: dict):
+        if path == "/api/tags":
+            self._send_json({"models": [{"name": "gemma3:27b"}]})
+            return
+        if path != "/api/generate":
+            self._not_found()
+            return
+
+        # 振り分けは短いJSONを1つ返すだけなので、初回トークンの待ち時間だけかける
+        time.sleep(self.server.config.ttft)
+        self._send_json({
+            "model": body.get("model", ""),
+            "created_at": "2025-01-01T00:00:00Z",
+            "response": json.dumps(ROUTING_REPLY, ensure_ascii=False),
+            "done": True,
+            "context": [1, 2, 3],
+            "prompt_eval_count": self._input_tokens(body),
+            "eval_count": 16,
+        })
+
+
+def busy_time(spans: List[Tuple[float, float]], start: float, end: float) -> float:
+    """start〜end の間にいずれかのサーバーが処理していた時間（重なりは1回と数える）"""
+    clipped = sorted((max(s, start), min(e, end)) for s, e in spans if e > start and s < end)
+    total = 0.0
+    current_start = current_end = None
+    for s, e in clipped:
+        if current_end is None or s > current_end:
+            if current_end is not None:
+                total += current_end - current_start
+            current_start, current_end = s, e
+        else:
+            current_end = max(current_end, e)
+    if current_end is not None:
+        total += current_end - current_start
+    return total
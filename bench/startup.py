@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Startup Benchmark for AgoraTheon
+起動時の import 時間を計測する（python -X importtime の集計）
+
+    python bench/startup.py                 # 5回計測して中央値と重いモジュールを表示
+    python bench/startup.py --max-ms 80     # 中央値が80msを超えたら終了コード1
+    python bench/startup.py --json          # 結果をJSONで出力
+
+起動時に読み込んではいけないモジュール（各社SDKなど）が読み込まれていた場合も終了コード1
+"""
+
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+from typing import Dict, List
+
+
+# リポジトリのルート
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 起動時には読み込まない（使うときに遅延で読み込む）はずのモジュール
+LAZY_MODULES = ["anthropic", "openai", "google.genai", "requests", "readline", "asyncio"]
+
+
+def measure(target: str = "agoratheon") -> Dict[str, dict]:
+    """
+    1回分の import 時間を計測
+
+    Returns:
+        モジュール名 → {"self": 自身の時間(us), "cumulative": 子を含む時間(us)}
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {target}"],
+        cwd=ROOT, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+
+    modules = {}
+    for line in result.stderr.splitlines():
+        # 形式: "import time:  self [us] | cumulative | imported package"
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # 見出し行
+        name = fields[2].strip()
+        modules[name] = {"self": int(fields[0]), "cumulative": int(fields[1])}
+    return modules
+
+
+def run(runs: int, top: int, target: str = "agoratheon") -> dict:
+    """runs 回計測して集計"""
+    totals = []
+    modules = {}
+    for _ in range(runs):
+        modules = measure(target)
+        totals.append(modules[target]["cumulative"] / 1000)
+
+    heaviest = sorted(modules.items(), key=lambda item: item[1]["self"], reverse=True)[:top]
+    return {
+        "target": target,
+        "runs": runs,
+        "median_ms": statistics.median(totals),
+        "min_ms": min(totals),
+        "max_ms": max(totals),
+        "module_count": len(modules),
+        "heaviest": [{"module": name, "self_ms": t["self"] / 1000, "cumulative_ms": t["cumulative"] / 1000}
+                     for name, t in heaviest],
+        "eager_lazy_modules": [name for name in LAZY_MODULES if name in modules],
+    }
+
+
+def format_report(report: dict) -> List[str]:
+    """表示用の行"""
+    lines = [
+        f"⏱️ import {report['target']}: 中央値 {report['median_ms']:.1f}ms"
+        f"（最小 {report['min_ms']:.1f} / 最大 {report['max_ms']:.1f}、{report['runs']}回、{report['module_count']}モジュール）",
+        "",
+        "重いモジュール（自身の時間）:",
+    ]
+    for entry in report["heaviest"]:
+        lines.append(f"  {entry['self_ms']:7.2f}ms  {entry['module']}（子を含め {entry['cumulative_ms']:.2f}ms）")
+    if report["eager_lazy_modules"]:
+        lines.append("")
+        lines.append(f"❌ 起動時に読み込まれている: {', '.join(report['eager_lazy_modules'])}")
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description='AgoraTheon 起動時間ベンチマーク')
+    parser.add_argument('--runs', type=int, default=5, help='計測回数')
+    parser.add_argument('--top', type=int, default=10, help='表示する重いモジュールの数')
+    parser.add_argument('--max-ms', type=float, default=None, help='中央値の上限（超えたら終了コード1）')
+    parser.add_argument('--json', action='store_true', help='結果をJSONで出力')
+    args = parser.parse_args()
+
+    report = run(args.runs, args.top)
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print("\n".join(format_report(report)))
+
+    failed = bool(report["eager_lazy_modules"])
+    if args.max_ms is not None and report["median_ms"] > args.max_ms:
+        print(f"❌ 中央値 {report['median_ms']:.1f}ms が上限 {args.max_ms:.1f}ms を超えています", file=sys.stderr)
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
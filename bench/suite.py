@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+"""
+Benchmark Suite for AgoraTheon
+偽APIサーバーを相手に、AgoraTheon 自身の処理時間を討論の長さごとに計測する（API料金はかからない）
+
+    python bench/suite.py                                # 100〜100000件で計測して表示
+    python bench/suite.py --sizes 100,1000 --json out.json
+    python bench/suite.py --ttft 0.05 --tokens-per-sec 500
+    python bench/suite.py --compare before.json          # 前回の結果と比較
+
+計測項目（討論の長さごと）:
+- snapshot_ms: JSONスナップショットの書き出し（コンパクション）
+- load_ms: 討論の読み込み（AgoraTheon の起動）
+- context_ms: 1回分のコンテキストの組み立て
+- save_ms: 1発言分の保存（ジャーナルへの追記）
+- turns: 決まった手順のセッションを process_command で実行し、1ターンの所要時間から
+  偽サーバーが応答に使った時間を引いた残り（= AgoraTheon 側のオーバーヘッド）
+
+討論の長さとは別に、複数の討論が別々のスレッドで同時に /panel を実行する場合（batch.py の
+--jobs N と panel の組み合わせ）も計測する。制限時間内に終わらなければ「固まった」として失敗にする。
+
+各社SDK（requirements.txt）が必要。接続先は AGORATHEON_BASE_URL_<NAME> / OLLAMA_HOST で偽サーバーに向ける
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+from contextlib import redirect_stdout
+from datetime import datetime
+from typing import List
+
+# リポジトリのルート
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from fakeservers import FakeServer, ServerConfig, busy_time  # noqa: E402
+from utils.telemetry import percentile  # noqa: E402
+
+
+# 計測に使うセッション（司会モードの入力・直接呼び出し・パネルを混ぜる）
+SESSION = [
+    "/claude",
+    "/gemini 具体的な例を挙げて",
+    "もっと深く掘り下げて",
+    "倫理的な問題はある？",
+    "",
+    "/panel それぞれ一言で",
+    "/chatgpt ここまでをまとめて",
+    "/grok",
+]
+
+# 合成する発言
+SPEAKERS = ["claude", "gemini", "chatgpt", "grok"]
+FILLER = "この論点については、前提となる条件を整理したうえで、具体的な事例と反論を比較検討する必要がある。"
+
+
+def start_servers(config: ServerConfig, route_config: ServerConfig) -> dict:
+    """偽サーバーを起動して、AgoraTheon の接続先をそこに向ける"""
+    servers = {
+        "anthropic": FakeServer("anthropic", config).start(),
+        "openai": FakeServer("openai", config).start(),
+        "gemini": FakeServer("gemini", config).start(),
+        "ollama": FakeServer("ollama", route_config).start(),
+    }
+    env = {
+        "AGORATHEON_BASE_URL_CLAUDE": servers["anthropic"].url,
+        "AGORATHEON_BASE_URL_CHATGPT": servers["openai"].url + "/v1",
+        "AGORATHEON_BASE_URL_GROK": servers["openai"].url + "/v1",
+        "AGORATHEON_BASE_URL_GEMINI": servers["gemini"].url,
+        "OLLAMA_HOST": servers["ollama"].url,
+        "SUMIRE_BACKEND": "ollama",
+    }
+    for key in ("ANTHROPIC_API_KEY", "OPENAI_API_KEY", "GROK_API_KEY", "GEMINI_API_KEY"):
+        env[key] = "bench"
+    for name in SPEAKERS:
+        # レート制限で待つ時間を計測に含めない
+        env[f"AGORATHEON_RPM_{name.upper()}"] = "0"
+        env[f"AGORATHEON_TPM_{name.upper()}"] = "0"
+    os.environ.update(env)
+    return servers
+
+
+def build_discussion(path: str, size: int) -> dict:
+    """size 件の発言がある討論を作ってスナップショットに書き出す"""
+    from models import Discussion
+    from models.journal import DiscussionStore
+
+    discussion = Discussion(title=os.path.splitext(os.path.basename(path))[0])
+    for i in range(size):
+        speaker = SPEAKERS[i % len(SPEAKERS)]
+        discussion.add_message(speaker, "", f"（{i + 1}）{FILLER}")
+    discussion.pop_events()
+
+    store = DiscussionStore(path.replace('.md', '.json'))
+    store.reset(discussion.to_dict())
+    start = time.perf_counter()
+    store.compact()
+    return {"snapshot_ms": _ms(time.perf_counter() - start),
+            "snapshot_bytes": os.path.getsize(store.json_file)}
+
+
+def run_size(size: int, servers: dict, reps: int, passes: int) -> dict:
+    """1つの討論の長さで計測"""
+    from agoratheon import AgoraTheon
+
+    with tempfile.TemporaryDirectory(prefix="agoratheon-bench-") as tmp:
+        os.environ["AGORATHEON_CACHE_DIR"] = tmp
+        path = os.path.join(tmp, "bench.md")
+        result = {"messages": size}
+        result.update(build_discussion(path, size))
+
+        start = time.perf_counter()
+        with redirect_stdout(io.StringIO()):
+            agora = AgoraTheon(path)
+        result["load_ms"] = _ms(time.perf_counter() - start)
+        if agora._sumire and agora._sumire._warmup_thread:
+            agora._sumire._warmup_thread.join()
+
+        # コンテキストの組み立て
+        api = agora._get_api("claude")
+        samples = []
+        for _ in range(reps):
+            start = time.perf_counter()
+            _, _, info = agora._get_context([api])
+            samples.append(time.perf_counter() - start)
+        result["context_ms"] = _distribution(samples)
+        result["context_tokens"] = info["tokens"]
+
+        # 1発言分の保存（バックグラウンド保存スレッドが行う処理を同期で実行）
+        samples = []
+        for i in range(reps):
+            agora.discussion.add_message("master", "", f"保存の計測 {i}")
+            start = time.perf_counter()
+            agora._store.append(agora.discussion.pop_events())
+            samples.append(time.perf_counter() - start)
+        result["save_ms"] = _distribution(samples)
+
+        # セッション
+        spans_before = {kind: len(server.spans()) for kind, server in servers.items()}
+        turns = []
+        for _ in range(passes):
+            for command in SESSION:
+                start = time.perf_counter()
+                with redirect_stdout(io.StringIO()):
+                    output, _ = agora.process_command(command)
+                end = time.perf_counter()
+                spans = [span for kind, server in servers.items()
+                         for span in server.spans()[spans_before[kind]:]]
+                server_time = busy_time(spans, start, end)
+                turns.append({
+                    "command": command or "(enter)",
+                    "wall_ms": _ms(end - start),
+                    "server_ms": _ms(server_time),
+                    "overhead_ms": _ms(end - start - server_time),
+                    "failed": output.startswith("❌"),
+                })
+        result["turns"] = turns
+        result["overhead_ms"] = _distribution([t["overhead_ms"] / 1000 for t in turns])
+
+        agora.close()
+        return result
+
+
+def run_concurrent_panels(jobs: int, timeout: float) -> dict:
+    """jobs 個の討論で、別々のスレッドから同時に /panel を実行する（バッチ実行の panel と同じ形）"""
+    from agoratheon import AgoraTheon
+
+    with tempfile.TemporaryDirectory(prefix="agoratheon-bench-") as tmp:
+        os.environ["AGORATHEON_CACHE_DIR"] = tmp
+        with redirect_stdout(io.StringIO()):
+            agoras = [AgoraTheon(os.path.join(tmp, f"panel{i}.md"), auto_mode=False, streaming=False)
+                      for i in range(jobs)]
+        outputs = [None] * jobs
+
+        def panel(i: int):
+            with redirect_stdout(io.StringIO()):
+                outputs[i] = agoras[i].cmd_panel("それぞれ一言で")
+
+        threads = [threading.Thread(target=panel, args=(i,), daemon=True) for i in range(jobs)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(max(0.0, start + timeout - time.perf_counter()))
+        wall = time.perf_counter() - start
+
+        hung = sum(1 for thread in threads if thread.is_alive())
+        if not hung:
+            for agora in agoras:
+                agora.close()
+        return {
+            "jobs": jobs,
+            "wall_ms": _ms(wall),
+            "hung": hung,
+            "failed": sum(1 for output in outputs if output is None or "❌" in output),
+        }
+
+
+def compare(old: dict, new: dict) -> str:
+    """2回分の結果を比較した表"""
+    metrics = [("snapshot_ms", None), ("load_ms", None), ("context_ms", "p50"),
+               ("save_ms", "p50"), ("overhead_ms", "p50"), ("overhead_ms", "p95")]
+    old_results = {r["messages"]: r for r in old["results"]}
+    lines = []
+    for result in new["results"]:
+        before = old_results.get(result["messages"])
+        if before is None:
+            continue
+        lines.append(f"{result['messages']:,}件:")
+        for name, key in metrics:
+            a = before[name][key] if key else before[name]
+            b = result[name][key] if key else result[name]
+            label = f"{name}.{key}" if key else name
+            ratio = f"×{b / a:.2f}" if a else "-"
+            lines.append(f"  {label:<16} {a:>10.2f} → {b:>10.2f}ms  {ratio}")
+    return "\n".join(lines) or "比較できる件数がありません"
+
+
+def format_result(result: dict) -> str:
+    """1つの討論の長さの結果を表示用に整形"""
+    failed = sum(1 for t in result["turns"] if t["failed"])
+    return (f"{result['messages']:>7,}件  スナップショット {result['snapshot_ms']:8.1f}ms"
+            f"（{result['snapshot_bytes'] / 1024:,.0f}KB）  読込 {result['load_ms']:8.1f}ms"
+            f"  コンテキスト p50 {result['context_ms']['p50']:6.2f}ms"
+            f"  保存 p50 {result['save_ms']['p50']:6.2f}ms"
+            f"  オーバーヘッド p50 {result['overhead_ms']['p50']:6.1f}ms / p95 {result['overhead_ms']['p95']:6.1f}ms"
+            + (f"  失敗 {failed}ターン" if failed else ""))
+
+
+def format_panels(result: dict) -> str:
+    """同時 /panel の結果を表示用に整形"""
+    if result["hung"]:
+        return f"同時パネル {result['jobs']}件  ❌ {result['hung']}件が制限時間内に終わりませんでした（固まっています）"
+    return (f"同時パネル {result['jobs']}件  {result['wall_ms']:8.1f}ms"
+            + (f"  失敗 {result['failed']}件" if result["failed"] else ""))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AgoraTheon ベンチマーク（偽APIサーバー使用）")
+    parser.add_argument("--sizes", default="100,1000,10000,100000", help="討論の発言数（カンマ区切り）")
+    parser.add_argument("--reps", type=int, default=20, help="コンテキスト・保存の計測回数")
+    parser.add_argument("--passes", type=int, default=1, help="セッションを繰り返す回数")
+    parser.add_argument("--ttft", type=float, default=0.05, help="偽サーバーの初回トークンまでの秒数")
+    parser.add_argument("--tokens-per-sec", type=float, default=500.0, help="偽サーバーの出力速度")
+    parser.add_argument("--reply-tokens", type=int, default=60, help="偽サーバーの応答トークン数")
+    parser.add_argument("--route-ttft", type=float, default=0.02, help="偽Ollama（振り分け）の応答秒数")
+    parser.add_argument("--panel-jobs", type=int, default=3, help="同時に /panel を実行する討論の数（0で計測しない）")
+    parser.add_argument("--panel-timeout", type=float, default=30.0, help="同時 /panel の制限時間（秒）")
+    parser.add_argument("--json", metavar="PATH", help="結果をJSONで保存（- で標準出力）")
+    parser.add_argument("--compare", metavar="PATH", help="以前の結果（JSON）と比較")
+    args = parser.parse_args()
+
+    try:
+        import anthropic, openai, requests  # noqa: F401
+        from google import genai  # noqa: F401
+    except ImportError as e:
+        print(f"各社SDKが必要です（pip install -r requirements.txt）: {e}", file=sys.stderr)
+        sys.exit(2)
+
+    config = ServerConfig(ttft=args.ttft, tokens_per_sec=args.tokens_per_sec, reply_tokens=args.reply_tokens)
+    servers = start_servers(config, ServerConfig(ttft=args.route_ttft))
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "git": _git_revision(),
+            "config": {"sizes": sizes, "reps": args.reps, "passes": args.passes, "ttft": args.ttft,
+                       "tokens_per_sec": args.tokens_per_sec, "reply_tokens": args.reply_tokens,
+                       "route_ttft": args.route_ttft, "panel_jobs": args.panel_jobs},
+        },
+        "results": [],
+    }
+    try:
+        for size in sizes:
+            result = run_size(size, servers, args.reps, args.passes)
+            report["results"].append(result)
+            if args.json != "-":
+                print(format_result(result), flush=True)
+        if args.panel_jobs:
+            report["concurrent_panels"] = run_concurrent_panels(args.panel_jobs, args.panel_timeout)
+            if args.json != "-":
+                print(format_panels(report["concurrent_panels"]), flush=True)
+    finally:
+        for server in servers.values():
+            server.stop()
+
+    if args.json == "-":
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    elif args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            print(compare(json.load(f), report), file=sys.stderr if args.json == "-" else sys.stdout)
+
+    panels = report.get("concurrent_panels")
+    if panels and (panels["hung"] or panels["failed"]):
+        sys.exit(1)
+
+
+def _distribution(samples: List[float]) -> dict:
+    """秒の計測値 → ミリ秒の p50/p95/最大"""
+    return {"p50": _ms(percentile(samples, 0.5)), "p95": _ms(percentile(samples, 0.95)),
+            "max": _ms(max(samples)), "count": len(samples)}
+
+
+def _ms(seconds: float) -> float:
+    return round(seconds * 1000, 3)
+
+
+def _git_revision() -> str:
+    try:
+        result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True)
+        return result.stdout.strip()
+    except OSError:
+        return ""
+
+
+if __name__ == "__main__":
+    main()
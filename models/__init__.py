@@ -3,5 +3,6 @@ AgoraTheon Models
 """
 
 from .discussion import Discussion, Message
+from .journal import BackgroundSaver, DiscussionStore
 
-__all__ = ["Discussion", "Message"]
+__all__ = ["Discussion", "Message", "DiscussionStore", "BackgroundSaver"]
@@ -5,9 +5,18 @@ Discussion Model for AgoraTheon
 
 import json
 from datetime import datetime
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 from dataclasses import dataclass, field, asdict
 
+from utils.tokens import estimate_tokens
+
+
+# 発言間の区切り（空行）のトークン数
+SEPARATOR_TOKENS = 1
+
+# ブロック要約に割り当てる履歴予算の割合
+SUMMARY_BUDGET_RATIO = 0.25
+
 
 @dataclass
 class Message:
@@ -20,6 +29,9 @@ class Message:
     filtered: bool = False
     deleted: bool = False
     original_content: Optional[str] = None  # フィルタ前の内容
+    tokens: Optional[int] = None  # 表示用文字列の推定トークン数（一度だけ計算）
+    # AIの発言の計測値（provider, model, input/output/cached_tokens, ttft, latency, routing_latency, speculation_saved）
+    telemetry: Optional[dict] = None
     
     def to_dict(self) -> dict:
         return asdict(self)
@@ -34,6 +46,12 @@ class Message:
             return ""
         prefix = "*" if self.filtered else ""
         return f"{prefix}{self.icon}{self.speaker}: {self.content}"
+    
+    def token_count(self) -> int:
+        """推定トークン数（未計算なら計算して保持）"""
+        if self.tokens is None:
+            self.tokens = estimate_tokens(self.display())
+        return self.tokens
 
 
 @dataclass
@@ -44,35 +62,63 @@ class Discussion:
     updated: str = field(default_factory=lambda: datetime.now().isoformat())
     data_files: List[str] = field(default_factory=list)
     messages: List[Message] = field(default_factory=list)
+    # 履歴から外れたブロックの要約（キー "開始:終了" は削除されていない発言の通し位置、一度作ったら変えない）
+    block_summaries: Dict[str, dict] = field(default_factory=dict)
+    # ブロック要約をさらにまとめた討論全体のまとめ（{"text", "tokens", "through": まとめ済みの発言数}）
+    digest: Optional[dict] = None
     _next_id: int = field(default=1, repr=False)
+    # 保存待ちの変更イベント（ジャーナル用、JSONには含めない）
+    _events: List[dict] = field(default_factory=list, init=False, repr=False, compare=False)
+    
+    # 削除されていない発言と、その表示用文字列（add/delete/filter で差分更新）
+    _live: List[Message] = field(default_factory=list, init=False, repr=False, compare=False)
+    _lines: List[str] = field(default_factory=list, init=False, repr=False, compare=False)
     
-    def add_message(self, speaker: str, icon: str, content: str) -> Message:
-        """発言を追加"""
+    def __post_init__(self):
+        self._live = [m for m in self.messages if not m.deleted]
+        self._lines = [m.display() for m in self._live]
+    
+    def add_message(self, speaker: str, icon: str, content: str, telemetry: dict = None) -> Message:
+        """発言を追加（telemetry はAIの応答の計測値）"""
         msg = Message(
             id=f"{self._next_id:03d}",
             timestamp=datetime.now().isoformat(),
             speaker=speaker,
             icon=icon,
-            content=content
+            content=content,
+            telemetry=telemetry
         )
+        msg.token_count()
         self.messages.append(msg)
+        self._live.append(msg)
+        self._lines.append(msg.display())
         self._next_id += 1
         self.updated = datetime.now().isoformat()
+        self._events.append({
+            "op": "add",
+            "message": msg.to_dict(),
+            "_next_id": self._next_id,
+            "updated": self.updated
+        })
         return msg
     
     def get_last_message(self) -> Optional[Message]:
         """最後の発言を取得（削除済み除く）"""
-        for msg in reversed(self.messages):
-            if not msg.deleted:
-                return msg
-        return None
+        return self._live[-1] if self._live else None
+    
+    def active_count(self) -> int:
+        """削除されていない発言の数"""
+        return len(self._live)
     
     def delete_last(self) -> bool:
         """最後の発言を削除"""
         msg = self.get_last_message()
         if msg:
             msg.deleted = True
+            self._live.pop()
+            self._lines.pop()
             self.updated = datetime.now().isoformat()
+            self._events.append({"op": "delete", "id": msg.id, "updated": self.updated})
             return True
         return False
     
@@ -83,20 +129,169 @@ class Discussion:
             msg.original_content = msg.content
             msg.content = filtered_content
             msg.filtered = True
+            msg.tokens = None
+            msg.token_count()
+            self._lines[-1] = msg.display()
             self.updated = datetime.now().isoformat()
+            self._events.append({
+                "op": "filter",
+                "id": msg.id,
+                "content": msg.content,
+                "original_content": msg.original_content,
+                "tokens": msg.tokens,
+                "updated": self.updated
+            })
             return True
         return False
     
+    def add_data_files(self, data_files: List[str]):
+        """参考資料を追加（登録済みのファイルは追加しない。再開時に同じ資料を指定しても重複しない）"""
+        added = [path for path in dict.fromkeys(data_files) if path not in self.data_files]
+        if not added:
+            return
+        self.data_files.extend(added)
+        self._events.append({"op": "data_files", "data_files": list(self.data_files)})
+    
+    def record_creation(self):
+        """
+        新規作成を記録（ジャーナルの最初のイベントにする）
+        
+        スナップショットが書かれる前に読み直しても、作成日時などが作り直されないようにする
+        """
+        self._events.insert(0, {"op": "create", "discussion": {
+            "title": self.title,
+            "created": self.created,
+            "updated": self.updated,
+        }})
+    
+    def pop_events(self) -> List[dict]:
+        """保存待ちの変更イベントを取り出す"""
+        events, self._events = self._events, []
+        return events
+    
     def get_context(self, max_messages: int = 20) -> str:
-        """討論コンテキストを文字列で取得"""
-        active_messages = [m for m in self.messages if not m.deleted]
-        recent = active_messages[-max_messages:] if len(active_messages) > max_messages else active_messages
+        """討論コンテキストを文字列で取得（直近 max_messages 件のみ連結）"""
+        recent = self._lines[-max_messages:] if len(self._lines) > max_messages else self._lines
+        return "\n\n".join(recent)
+    
+    def get_context_window(self, max_tokens: int, max_messages: int = None,
+                           block_size: int = 0) -> Tuple[List[str], int, int]:
+        """
+        トークン予算に収まるだけ直近の発言を取得
         
-        lines = []
-        for msg in recent:
-            lines.append(msg.display())
+        block_size を指定すると、履歴の開始位置を block_size 件単位に切り上げる。
+        開始位置が変わるのは block_size 件に1回になるので、その間はプロンプトの先頭が変わらない。
+        予算が小さく、収まる範囲の途中にブロック境界が無い場合は切り上げない（1件ずつずらす）。
+        外れたブロックに要約があれば、予算の残りで要約を先頭に入れる。
         
-        return "\n\n".join(lines)
+        Args:
+            max_tokens: 履歴に使えるトークン数
+            max_messages: 発言数の上限（省略時は無制限）
+            block_size: 履歴を区切る単位（0ならスライディング）
+        
+        Returns:
+            (発言ごとの表示用文字列（古い順、要約が先頭）, 推定トークン数, 発言数)
+        """
+        n = len(self._live)
+        limit = n if max_messages is None else min(max_messages, n)
+        
+        # 要約があるときは予算の一部を要約用に取っておく
+        message_budget = max_tokens
+        if block_size > 0 and (self.block_summaries or self.digest):
+            message_budget -= int(max_tokens * SUMMARY_BUDGET_RATIO)
+        
+        costs = []
+        total = 0
+        for msg in reversed(self._live):
+            if len(costs) >= limit:
+                break
+            cost = msg.token_count() + SEPARATOR_TOKENS
+            if total + cost > message_budget:
+                break
+            total += cost
+            costs.append(cost)
+        
+        count = len(costs)
+        if block_size > 0 and count < n:
+            # 開始位置をブロック境界に切り上げ（その分だけ発言が減る）
+            start = -(-(n - count) // block_size) * block_size
+            if start < n:
+                count = n - start
+                total = sum(costs[:count])
+        
+        lines = self._lines[n - count:] if count else []
+        
+        # 全体のまとめ（あれば先頭）と、まだまとめに入っていないブロックの要約を新しい順に、予算に収まるだけ入れる
+        summaries = []
+        if block_size > 0:
+            start = n - count
+            folded = self.digest["through"] if self.digest else 0
+            digest_cost = self.digest["tokens"] + SEPARATOR_TOKENS if self.digest else 0
+            for block_start in range(start - block_size, folded - 1, -block_size):
+                summary = self.block_summaries.get(f"{block_start}:{block_start + block_size}")
+                if not summary:
+                    break
+                cost = summary["tokens"] + SEPARATOR_TOKENS
+                if total + cost + digest_cost > max_tokens:
+                    break
+                total += cost
+                summaries.insert(0, summary["text"])
+            if self.digest and total + digest_cost <= max_tokens:
+                total += digest_cost
+                summaries.insert(0, self.digest["text"])
+        
+        return summaries + lines, total, count
+    
+    def evicted_blocks(self, start: int, block_size: int) -> List[Tuple[int, int]]:
+        """
+        履歴の開始位置より前で、まだ要約が無いブロックを取得
+        
+        Returns:
+            (開始, 終了) のリスト（削除されていない発言の通し位置）
+        """
+        blocks = []
+        # 終わりまでそろっていないブロックは要約しない（一度作った要約は変えないため）
+        start = min(start, len(self._live))
+        for block_start in range(0, start - block_size + 1, block_size):
+            if f"{block_start}:{block_start + block_size}" not in self.block_summaries:
+                blocks.append((block_start, block_start + block_size))
+        return blocks
+    
+    def unfolded_blocks(self, block_size: int) -> List[Tuple[int, int]]:
+        """
+        全体のまとめの続きから連続して要約があるブロック（まだまとめに入っていないもの）
+        
+        Returns:
+            (開始, 終了) のリスト（古い順）
+        """
+        blocks = []
+        block_start = self.digest["through"] if self.digest else 0
+        while f"{block_start}:{block_start + block_size}" in self.block_summaries:
+            blocks.append((block_start, block_start + block_size))
+            block_start += block_size
+        return blocks
+    
+    def get_block_summary(self, start: int, end: int) -> Optional[str]:
+        """ブロックの要約（表示形式）"""
+        summary = self.block_summaries.get(f"{start}:{end}")
+        return summary["text"] if summary else None
+    
+    def get_block_lines(self, start: int, end: int) -> List[str]:
+        """ブロック内の発言の表示用文字列"""
+        return self._lines[start:end]
+    
+    def set_block_summary(self, start: int, end: int, summary: str):
+        """ブロックの要約を保存（履歴にはこの表示形式で入る）"""
+        text = f"💠sumire: 【発言{start + 1}〜{end}の要約】\n{summary}"
+        key = f"{start}:{end}"
+        self.block_summaries[key] = {"text": text, "tokens": estimate_tokens(text)}
+        self._events.append({"op": "block_summary", "key": key, "summary": self.block_summaries[key]})
+    
+    def set_digest(self, summary: str, through: int):
+        """全体のまとめを保存（発言1〜through の内容。前のまとめは置き換える）"""
+        text = f"💠sumire: 【発言1〜{through}のまとめ】\n{summary}"
+        self.digest = {"text": text, "tokens": estimate_tokens(text), "through": through}
+        self._events.append({"op": "digest", "digest": dict(self.digest)})
     
     def to_dict(self) -> dict:
         """辞書に変換"""
@@ -106,6 +301,8 @@ class Discussion:
             "updated": self.updated,
             "data_files": self.data_files,
             "messages": [m.to_dict() for m in self.messages],
+            "block_summaries": self.block_summaries,
+            "digest": self.digest,
             "_next_id": self._next_id
         }
     
@@ -117,8 +314,10 @@ class Discussion:
             title=data["title"],
             created=data.get("created", datetime.now().isoformat()),
             updated=data.get("updated", datetime.now().isoformat()),
-            data_files=data.get("data_files", []),
+            data_files=list(data.get("data_files", [])),
             messages=messages,
+            block_summaries=dict(data.get("block_summaries", {})),
+            digest=dict(data["digest"]) if data.get("digest") else None,
             _next_id=data.get("_next_id", len(messages) + 1)
         )
     
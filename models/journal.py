@@ -0,0 +1,308 @@
+"""
+Journal Store for AgoraTheon
+討論の永続化（スナップショットJSON + 追記型ジャーナル）
+
+- 発言の追加・フィルタ・削除はジャーナル（.journal.jsonl）に1行ずつ追記する
+- 一定件数たまったらスナップショット（.json）へ書き出し、ジャーナルを空にする（コンパクション）
+- 読み込み時はスナップショットにジャーナルを再生して復元する
+- 書き込みは BackgroundSaver がバックグラウンドでまとめて行う
+"""
+
+import os
+import json
+import time
+import threading
+from typing import Dict, List, Optional, Tuple
+
+
+# コンパクションまでのイベント数
+DEFAULT_COMPACT_EVERY = 200
+
+
+def apply_event(data: dict, event: dict, index: Dict[str, dict]):
+    """
+    変更イベントを辞書形式の討論データに適用
+
+    Args:
+        data: Discussion.to_dict() 形式のデータ
+        event: 変更イベント
+        index: 発言ID → 発言データ（data["messages"] の要素）
+    """
+    op = event.get("op")
+    if op == "create":
+        data.update(event["discussion"])
+    elif op == "add":
+        message = dict(event["message"])
+        data["messages"].append(message)
+        index[message["id"]] = message
+        data["_next_id"] = event.get("_next_id", data.get("_next_id", 1))
+    elif op == "filter":
+        message = index.get(event["id"])
+        if message is not None:
+            message["content"] = event["content"]
+            message["original_content"] = event.get("original_content")
+            message["filtered"] = True
+            message["tokens"] = event.get("tokens")
+    elif op == "delete":
+        message = index.get(event["id"])
+        if message is not None:
+            message["deleted"] = True
+    elif op == "data_files":
+        data["data_files"] = list(event["data_files"])
+    elif op == "block_summary":
+        data.setdefault("block_summaries", {})[event["key"]] = dict(event["summary"])
+    elif op == "digest":
+        data["digest"] = dict(event["digest"])
+
+    if "updated" in event:
+        data["updated"] = event["updated"]
+
+
+def atomic_write(path: str, text: str):
+    """一時ファイルに書いて fsync してから置き換える（書き込み途中で壊れない）"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class DiscussionStore:
+    """スナップショット + ジャーナルによる討論の保存"""
+
+    def __init__(self, json_file: str, compact_every: int = None):
+        self.json_file = json_file
+        self.journal_file = os.path.splitext(json_file)[0] + ".journal.jsonl"
+        if compact_every is None:
+            compact_every = int(os.environ.get('AGORATHEON_COMPACT_EVERY', DEFAULT_COMPACT_EVERY))
+        self.compact_every = compact_every
+
+        # 保存済みの状態（スナップショットに書き出す内容）
+        self._data = None
+        self._index = {}
+        self._seq = 0  # 最後に書いたイベントの通し番号
+        self._journal_count = 0  # ジャーナル内のイベント数
+
+    def load(self, default: dict) -> Optional[dict]:
+        """
+        スナップショットとジャーナルから討論データを復元
+
+        Args:
+            default: スナップショットが無い場合の初期データ（新規討論の to_dict()）
+
+        Returns:
+            復元したデータ（どちらのファイルも無ければ None）
+        """
+        data = None
+        if os.path.exists(self.json_file):
+            with open(self.json_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+
+        events, torn = self._read_journal()
+        if data is None and not events and not torn:
+            self.reset(default)
+            return None
+        if data is None:
+            # スナップショットを書く前（ジャーナルだけ）。作成時の情報は create イベントで戻る
+            data = default
+
+        self.reset(data)
+        for event in events:
+            # スナップショット済み（コンパクション直後に落ちた場合）や
+            # 書き直しで重複したイベントは飛ばす
+            if event.get("seq", 0) <= self._seq:
+                continue
+            apply_event(self._data, event, self._index)
+            self._seq = event["seq"]
+            self._journal_count += 1
+
+        if torn:
+            # 途切れた行の後ろに追記しないよう、読めた分でスナップショットを作り直す
+            self.compact()
+
+        return self._data
+
+    def reset(self, data: dict):
+        """保存済み状態を設定"""
+        self._data = data
+        self._data.setdefault("messages", [])
+        self._index = {m["id"]: m for m in self._data["messages"]}
+        self._seq = data.get("_journal_seq", 0)
+        self._journal_count = 0
+
+    def append(self, events: List[dict]):
+        """変更イベントをジャーナルに追記"""
+        if not events:
+            return
+
+        seq = self._seq
+        stamped = []
+        for event in events:
+            seq += 1
+            stamped.append(dict(event, seq=seq))
+
+        with open(self.journal_file, 'a', encoding='utf-8') as f:
+            f.write("".join(json.dumps(e, ensure_ascii=False) + "\n" for e in stamped))
+            f.flush()
+            os.fsync(f.fileno())
+
+        # 書き込みが成功してから保存済み状態に反映
+        for event in stamped:
+            apply_event(self._data, event, self._index)
+        self._seq = seq
+        self._journal_count += len(stamped)
+
+    def needs_compaction(self) -> bool:
+        """コンパクションすべき件数たまったか"""
+        return self._journal_count >= self.compact_every
+
+    def compact(self):
+        """スナップショットを書き出してジャーナルを空にする"""
+        self._data["_journal_seq"] = self._seq
+        atomic_write(self.json_file, json.dumps(self._data, ensure_ascii=False, indent=2))
+
+        # スナップショットの置き換えが終わってからジャーナルを消す
+        if os.path.exists(self.journal_file):
+            os.remove(self.journal_file)
+        self._journal_count = 0
+
+    def _read_journal(self) -> Tuple[List[dict], bool]:
+        """
+        ジャーナルを読む（書き込み途中の最終行は無視）
+
+        Returns:
+            (イベント一覧, 途切れた行があったか)
+        """
+        if not os.path.exists(self.journal_file):
+            return [], False
+
+        events = []
+        with open(self.journal_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    events.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # クラッシュで途切れた行。以降は信用しない
+                    return events, True
+        return events, False
+
+
+class BackgroundSaver:
+    """
+    自動保存をバックグラウンドスレッドで行う
+    連続した変更はまとめて1回の追記にする（デバウンス）。REPLスレッドはイベントを渡すだけ
+    討論以外のファイル（計測値の集計など）も、最後に渡された内容だけを同じタイミングで書き出す
+    """
+
+    def __init__(self, store: DiscussionStore, debounce: float = None, max_delay: float = 2.0):
+        self.store = store
+        if debounce is None:
+            debounce = float(os.environ.get('AGORATHEON_SAVE_DEBOUNCE', '0.5'))
+        self.debounce = debounce
+        self.max_delay = max_delay  # 変更が続いてもこれ以上は待たない
+
+        self._pending = []
+        self._files: Dict[str, str] = {}  # パス → 最新の内容
+        self._cond = threading.Condition()
+        self._io_lock = threading.Lock()  # ストアへの書き込みは同時に1つだけ
+        self._thread = None
+        self._closed = False
+        self.last_error = None
+
+    def submit(self, events: List[dict]):
+        """変更イベントを保存キューに入れる（すぐ戻る）"""
+        if not events:
+            return
+        with self._cond:
+            self._pending.extend(events)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="agoratheon-saver", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def submit_file(self, path: str, text: str):
+        """ファイルの書き出しをキューに入れる（すぐ戻る。書き出し前に同じパスが来たら新しい方だけ書く）"""
+        with self._cond:
+            self._files[path] = text
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="agoratheon-saver", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def flush(self, compact: bool = False):
+        """キューに残っている変更を書き出す（compact=True ならスナップショットも更新）"""
+        with self._io_lock:
+            with self._cond:
+                events, self._pending = self._pending, []
+                files, self._files = self._files, {}
+            self._write(events)
+            self._write_files(files)
+            if compact:
+                self.store.compact()
+
+    def close(self):
+        """残りを書き出してスレッドを止める"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self.flush()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._files and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+
+                # 変更が落ち着くまで少し待ってまとめる
+                start = time.monotonic()
+                while not self._closed:
+                    count = len(self._pending)
+                    remaining = self.max_delay - (time.monotonic() - start)
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(min(self.debounce, remaining))
+                    if len(self._pending) == count:
+                        break
+
+            with self._io_lock:
+                with self._cond:
+                    events, self._pending = self._pending, []
+                    files, self._files = self._files, {}
+                self._write(events)
+                self._write_files(files)
+
+    def _write(self, events: List[dict]):
+        """ストアに追記（失敗したら次回に回す）"""
+        if not events:
+            return
+        try:
+            self.store.append(events)
+            self.last_error = None
+        except Exception as e:
+            self.last_error = e
+            print(f"⚠️ 自動保存に失敗: {e}")
+            with self._cond:
+                self._pending[:0] = events
+            return
+
+        if self.store.needs_compaction():
+            try:
+                self.store.compact()
+            except Exception as e:
+                # ジャーナルは書けているので次の機会に再試行
+                self.last_error = e
+                print(f"⚠️ スナップショットの更新に失敗: {e}")
+
+    def _write_files(self, files: Dict[str, str]):
+        """討論以外のファイルを書き出す（失敗しても次の内容で上書きされるので再試行しない）"""
+        for path, text in files.items():
+            try:
+                atomic_write(path, text)
+            except OSError as e:
+                print(f"⚠️ {path} の書き出しに失敗: {e}")
@@ -2,6 +2,8 @@
 AgoraTheon Personas
 """
 
+from .fastroute import FastRouter
+from .routecache import RouteCache
 from .sumire import SumireHost
 
-__all__ = ["SumireHost"]
+__all__ = ["FastRouter", "RouteCache", "SumireHost"]
@@ -0,0 +1,155 @@
+"""
+Fast Router - スミレんのローカル振り分け（LLMを呼ぶ前の高速判定）for AgoraTheon
+
+ROUTING_PROMPT の判断基準をキーワード（文字n-gram）の重み付きスコアにしたもの。
+スコアが十分に高く、2位との差もはっきりしている場合だけその場で決め、
+迷う入力は従来どおり LLM に回す。
+"""
+
+import random
+import unicodedata
+from typing import Dict, List, Optional, Sequence, Tuple
+
+
+# 判断基準ごとのキーワードと重み（日本語は分かち書きしないので部分文字列で照合する）
+KEYWORDS: Dict[str, Dict[str, float]] = {
+    "claude": {
+        "倫理": 2.0, "哲学": 2.0, "道徳": 2.0, "意識": 1.5, "善悪": 2.0, "正義": 1.5,
+        "責任": 1.0, "価値観": 1.0, "本質": 1.5, "存在": 1.0, "意味": 0.5, "自由意志": 2.0,
+        "人間らしさ": 1.5, "尊厳": 1.5, "べきか": 1.0, "深く": 0.5, "考察": 1.0,
+        "ethic": 2.0, "moral": 2.0, "philosoph": 2.0, "conscious": 1.5,
+    },
+    "gemini": {
+        "最新": 2.0, "データ": 2.0, "統計": 2.0, "数字": 1.5, "数値": 1.5, "調査": 1.5,
+        "具体的": 1.5, "実用": 1.5, "解決策": 1.5, "方法": 1.0, "手順": 1.5, "やり方": 1.0,
+        "コスト": 1.0, "比較表": 1.5, "ニュース": 2.0, "現状": 1.0, "事例": 1.0, "分析": 1.5,
+        "グラフ": 1.5, "%": 1.0, "data": 2.0, "latest": 2.0, "how to": 1.5,
+    },
+    "chatgpt": {
+        "まとめ": 2.0, "要約": 1.5, "整理": 2.0, "バランス": 2.0, "両方": 1.0, "多角的": 2.0,
+        "それぞれ": 1.0, "メリット": 1.0, "デメリット": 1.0, "一般的": 1.5, "総括": 2.0,
+        "結論": 1.0, "summar": 2.0, "overview": 1.5,
+    },
+    "grok": {
+        "タブー": 2.5, "禁断": 2.0, "本音": 2.0, "ぶっちゃけ": 2.5, "挑発": 2.0, "過激": 2.0,
+        "常識を疑": 2.0, "逆に": 1.0, "反論": 1.5, "ちゃぶ台": 2.5, "炎上": 1.5, "毒舌": 2.0,
+        "斬新": 2.0, "ひっくり返": 2.0, "あえて": 1.0, "皮肉": 1.5, "controversial": 2.0,
+        "taboo": 2.5,
+    },
+}
+
+# 紹介文の「{topic}」に入れると不自然なキーワード（語の一部・副詞など）
+NOT_TOPIC = {
+    "べきか", "深く", "最新", "まとめ", "具体的", "一般的", "多角的", "実用",
+    "逆に", "あえて", "それぞれ", "両方", "常識を疑", "ひっくり返", "ぶっちゃけ", "%",
+}
+
+# 即決するための最低スコアと、2位との最低差
+MIN_SCORE = 2.0
+MIN_MARGIN = 1.0
+
+# 直前の発言者のスコアに掛ける係数（連続回避）
+LAST_SPEAKER_PENALTY = 0.5
+
+# 即決時の紹介文（{topic} には一番効いたキーワードが入る）
+INTRO_TEMPLATES: Dict[str, List[str]] = {
+    "claude": [
+        "Claudeさん、倫理的な観点からお願いします",
+        "Claudeさん、「{topic}」について深く考えてみてください",
+        "Claudeさん、じっくり掘り下げていただけますか",
+    ],
+    "gemini": [
+        "Geminiさん、最新の情報を踏まえてお願いします",
+        "Geminiさん、「{topic}」について具体的にお願いします",
+        "Geminiさん、データの面から見るとどうでしょう",
+    ],
+    "chatgpt": [
+        "ChatGPTさん、バランスよくまとめてください",
+        "ChatGPTさん、ここまでを整理していただけますか",
+        "ChatGPTさん、「{topic}」について多角的にお願いします",
+    ],
+    "grok": [
+        "Grokさん、ちょっと違う視点から切り込んでください",
+        "Grokさん、「{topic}」について本音でどうぞ",
+        "Grokさん、ここはあえて常識を疑ってみてください",
+    ],
+}
+
+
+class FastRouter:
+    """キーワードのスコアで振り分け先を即決する"""
+
+    def __init__(self, min_score: float = MIN_SCORE, min_margin: float = MIN_MARGIN):
+        self.min_score = min_score
+        self.min_margin = min_margin
+        # 照合用に正規化したキーワード
+        self._keywords = {
+            target: [(self._normalize(word), word, weight) for word, weight in words.items()]
+            for target, words in KEYWORDS.items()
+        }
+
+    def classify(self, user_input: str, last_speaker: str = "",
+                 exclude: Sequence[str] = ()) -> Optional[Tuple[str, str]]:
+        """
+        入力を判定
+
+        Args:
+            user_input: ユーザーの発言
+            last_speaker: 直前の発言者（スコアを下げる）
+            exclude: 振り分けないAI
+
+        Returns:
+            自信があれば (target_ai, sumire_intro)、迷う場合は None
+        """
+        ranked = self._ranked(user_input, last_speaker, exclude)
+        if not ranked:
+            return None
+        target, (best, topic) = ranked[0]
+        second = ranked[1][1][0] if len(ranked) > 1 else 0.0
+        if best < self.min_score or best - second < self.min_margin:
+            return None
+
+        return (target, self._intro(target, topic))
+
+    def best(self, user_input: str, last_speaker: str = "", exclude: Sequence[str] = ()) -> Optional[str]:
+        """自信が無くても一番スコアの高いAI（どのキーワードにも当たらなければ None）"""
+        ranked = self._ranked(user_input, last_speaker, exclude)
+        if not ranked or ranked[0][1][0] <= 0:
+            return None
+        return ranked[0][0]
+
+    def _ranked(self, user_input: str, last_speaker: str, exclude: Sequence[str]) -> list:
+        """(AI名, (スコア, キーワード)) をスコアの高い順に（直前の発言者は減点）"""
+        scores = {t: s for t, s in self.score(user_input).items() if t not in exclude}
+        if last_speaker in scores:
+            score, topic = scores[last_speaker]
+            scores[last_speaker] = (score * LAST_SPEAKER_PENALTY, topic)
+        return sorted(scores.items(), key=lambda item: item[1][0], reverse=True)
+
+    def score(self, user_input: str) -> Dict[str, Tuple[float, str]]:
+        """各AIのスコアと、一番効いたキーワードを返す"""
+        text = self._normalize(user_input)
+        scores = {}
+        for target, keywords in self._keywords.items():
+            total = 0.0
+            topic, topic_weight = "", 0.0
+            for normalized, word, weight in keywords:
+                if normalized in text:
+                    total += weight
+                    if weight > topic_weight and word not in NOT_TOPIC:
+                        topic, topic_weight = word, weight
+            scores[target] = (total, topic)
+        return scores
+
+    def _intro(self, target: str, topic: str) -> str:
+        """テンプレートから紹介文を選ぶ"""
+        templates = INTRO_TEMPLATES[target]
+        if not topic or topic.isascii():
+            # 英語キーワードは会話に差し込むと不自然なので {topic} なしのものから選ぶ
+            templates = [t for t in templates if "{topic}" not in t]
+        return random.choice(templates).format(topic=topic)
+
+    @staticmethod
+    def _normalize(text: str) -> str:
+        """全角/半角・大文字/小文字の揺れをそろえる"""
+        return unicodedata.normalize("NFKC", text).lower()
@@ -0,0 +1,97 @@
+"""
+Route Cache - スミレんの振り分け結果キャッシュ for AgoraTheon
+
+「もっと深く」「反論して」のような同じ入力が続いたとき、LLM に聞き直さず前回の
+(振り分け先, 紹介文) を返す。キーは正規化した入力 + 直前の発言者（+ 任意で討論の指紋）。
+先行の振り分け（route_in_background）からも使われるので、読み書きはロックで守る。
+"""
+
+import os
+import re
+import time
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Optional, Sequence, Tuple
+
+
+# 正規化で取り除く文字（空白・句読点・記号）
+_STRIP_PATTERN = re.compile(r'[\s、。，．,.!?！？…・〜~]+')
+
+
+class RouteCache:
+    """件数上限（LRU）と有効期限（TTL）付きの振り分けキャッシュ"""
+
+    def __init__(self, max_size: int = None, ttl: float = None, use_context: bool = None):
+        """
+        Args:
+            max_size: 保持する件数の上限（SUMIRE_ROUTE_CACHE_SIZE、デフォルト128。0で無効）
+            ttl: 有効期間（秒）（SUMIRE_ROUTE_CACHE_TTL、デフォルト600）
+            use_context: 直近の討論の指紋もキーに含めるか（SUMIRE_ROUTE_CACHE_CONTEXT=1）
+        """
+        if max_size is None:
+            max_size = int(os.environ.get('SUMIRE_ROUTE_CACHE_SIZE', '128'))
+        if ttl is None:
+            ttl = float(os.environ.get('SUMIRE_ROUTE_CACHE_TTL', '600'))
+        if use_context is None:
+            use_context = os.environ.get('SUMIRE_ROUTE_CACHE_CONTEXT', '0') == '1'
+        self.max_size = max_size
+        self.ttl = ttl
+        self.use_context = use_context
+
+        self._entries = OrderedDict()  # キー → (保存時刻, (target, intro))
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, user_input: str, last_speaker: str, context: str = "") -> tuple:
+        """キャッシュキーを作る"""
+        text = _STRIP_PATTERN.sub("", unicodedata.normalize("NFKC", user_input).lower())
+        fingerprint = ""
+        if self.use_context and context:
+            # 直近の数行だけを見る（古い発言の違いでキャッシュを外さない）
+            recent = "\n".join(context.strip().split('\n')[-3:])
+            fingerprint = hashlib.sha1(recent.encode('utf-8')).hexdigest()[:12]
+        return (text, last_speaker, fingerprint)
+
+    def get(self, key: tuple, last_speaker: str = "", exclude: Sequence[str] = ()) -> Optional[Tuple[str, str]]:
+        """
+        キャッシュされた振り分け結果を返す
+
+        直前の発言者と同じ相手になる結果は返さない（連続回避のため LLM に判断し直してもらう）。
+        exclude（呼べないAI）が相手になる結果も返さない
+        """
+        if self.max_size <= 0:
+            return None
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry[0] > self.ttl:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+
+            target, intro = entry[1]
+            if (last_speaker and target == last_speaker) or target in exclude:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return (target, intro)
+
+    def put(self, key: tuple, result: Tuple[str, str]):
+        """振り分け結果を保存（上限を超えたら最も古く使われたものから捨てる）"""
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic(), result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> str:
+        """ヒット/ミス数の表示用文字列"""
+        return f"ヒット {self.hits} / ミス {self.misses}（{len(self._entries)}/{self.max_size}件）"
@@ -3,8 +3,21 @@ Sumire Persona - スミレん（司会AI）for AgoraTheon
 """
 
 import os
+import re
+import json
+import time
+import threading
 import requests
-from typing import Optional, Tuple
+from concurrent.futures import Future
+from requests.adapters import HTTPAdapter
+from typing import Optional, Sequence, Tuple
+
+from api.clients import role_options
+from api.ratelimit import get_limiter
+from utils.tokens import estimate_tokens
+
+from .fastroute import FastRouter
+from .routecache import RouteCache
 
 
 class SumireHost:
@@ -16,6 +29,42 @@ class SumireHost:
     ICON = "💠"
     NAME = "sumire"
     
+    # ヘルスチェックの制限時間（秒）
+    HEALTH_TIMEOUT = 5.0
+    
+    # ウォームアップ（モデル読み込み）の制限時間（秒）
+    WARMUP_TIMEOUT = 300
+    
+    # 振り分け先の候補
+    TARGETS = ["claude", "gemini", "chatgpt", "grok"]
+    
+    # 振り分け結果のJSONスキーマ（Ollama の format に渡す。Gemini は同じ内容を types.Schema で指定）
+    ROUTING_SCHEMA = {
+        "type": "object",
+        "properties": {
+            "target": {"type": "string", "enum": TARGETS},
+            "intro": {"type": "string"}
+        },
+        "required": ["target", "intro"]
+    }
+    
+    # 振り分けの生成トークン上限（JSON1行分。紹介文は短いので十分）
+    ROUTING_MAX_TOKENS = 64
+    
+    # 振り分けに失敗したときの結果
+    FALLBACK = ("chatgpt", "ChatGPTさん、お願いします")
+    
+    # 順番に回すときの紹介文（振り直しのときにも使う）
+    ROTATION_INTROS = {
+        "claude": "Claudeさん、いかがでしょうか",
+        "gemini": "Geminiさん、お願いします",
+        "chatgpt": "ChatGPTさん、どうぞ",
+        "grok": "Grokさん、何かありますか"
+    }
+    
+    # ROUTING_PROMPT を読ませておくための最初の1往復（Ollama の context として使い回す）
+    PRIME_INPUT = "これから討論の振り分けをお願いします。準備ができたら target に chatgpt を選んで返事をしてください。"
+    
     # 振り分け用システムプロンプト
     ROUTING_PROMPT = """あなたは「スミレ」、AI討論会の司会者です。
 
@@ -60,8 +109,34 @@ class SumireHost:
         self.backend = os.environ.get('SUMIRE_BACKEND', 'ollama')
         self.ollama_host = os.environ.get('OLLAMA_HOST', 'http://localhost:11434')
         self.ollama_model = os.environ.get('SUMIRE_MODEL', 'gemma3:27b')
+        # 最後のリクエスト後もモデルをメモリに載せておく時間（Ollama の keep_alive 形式: "30m", "-1" など）
+        self.keep_alive = os.environ.get('SUMIRE_KEEP_ALIVE', '30m')
+        
+        # Ollama への接続は使い回す（毎回 TCP 接続を張らない）
+        self.session = requests.Session()
+        self.session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=4))
+        self.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=4))
+        self._gemini_client = None  # Gemini バックエンド用（遅延初期化）
+        self.gemini_model = role_options("router")["model"]
+        self._warmup_thread = None
+        # ROUTING_PROMPT を読み込み済みの Ollama context（トークン列）。あれば system の代わりに渡す
+        self._routing_context = None
+        
+        # キーワードで即決できる入力は LLM に問い合わせない（SUMIRE_FASTPATH=0 で無効）
+        self.fast_router = None
+        if os.environ.get('SUMIRE_FASTPATH', '1') != '0':
+            self.fast_router = FastRouter()
+        
+        # 同じ入力への LLM 振り分け結果を使い回す
+        self.route_cache = RouteCache()
+        
+        # 振り分けの統計（即決 / キャッシュ / LLM の件数と所要時間）
+        self.route_stats = {"fast": 0, "fast_time": 0.0, "cache": 0, "cache_time": 0.0,
+                            "llm": 0, "llm_time": 0.0, "parse_fail": 0}
+        self.last_route = None  # 直近の振り分け方法（"fast" / "cache" / "llm" / "rotate"）
     
-    def route(self, user_input: str, context: str = "", last_speaker: str = "") -> Tuple[str, str]:
+    def route(self, user_input: str, context: str = "", last_speaker: str = "",
+              exclude: Sequence[str] = ()) -> Tuple[str, str]:
         """
         ユーザー入力を分析して最適なAIを選択
         
@@ -69,6 +144,7 @@ class SumireHost:
             user_input: ユーザーの発言
             context: これまでの討論内容
             last_speaker: 直前の発言者（連続回避用）
+            exclude: 振り分けないAI（停止中・直前に失敗したAI）
         
         Returns:
             (target_ai, sumire_intro): 振り分け先AIと紹介文
@@ -76,19 +152,127 @@ class SumireHost:
         
         # 空のenter → 順番に回す or chatgpt
         if not user_input.strip():
-            return self._rotate_speaker(last_speaker)
+            self.last_route = "rotate"
+            return self._rotate_speaker(last_speaker, exclude)
+        
+        start = time.perf_counter()
+        
+        # キーワードで自信を持って決まるならその場で返す
+        if self.fast_router:
+            result = self.fast_router.classify(user_input, last_speaker, exclude)
+            if result:
+                self._record_route("fast", start)
+                return result
+        
+        # 同じ入力を前にも振り分けていればその結果を使う
+        cache_key = self.route_cache.key(user_input, last_speaker, context)
+        result = self.route_cache.get(cache_key, last_speaker, exclude)
+        if result:
+            self._record_route("cache", start)
+            return result
         
         # LLMで振り分け判断
-        routing_input = self._build_routing_input(user_input, context, last_speaker)
+        routing_input = self._build_routing_input(user_input, context, last_speaker, exclude)
         
         if self.backend == 'gemini':
             result = self._route_with_gemini(routing_input)
         else:
             result = self._route_with_ollama(routing_input)
         
+        if result[0] in exclude:
+            # 呼べないAIを選んだ場合は残りから選び直す
+            result = self._failover_target(last_speaker, exclude)
+        elif result != self.FALLBACK and not exclude:
+            # 除外つきの判断は普段の判断と違うので覚えない
+            self.route_cache.put(cache_key, result)
+        self._record_route("llm", start)
         return result
     
-    def _build_routing_input(self, user_input: str, context: str, last_speaker: str) -> str:
+    def guess(self, user_input: str, last_speaker: str = "", exclude: Sequence[str] = ()) -> str:
+        """
+        LLM に聞く前の見込みの振り分け先（投機的に先に呼び出す相手）
+        
+        キーワードのスコアが一番高いAI。どれにも当たらなければ順番で次のAI
+        """
+        if self.fast_router:
+            target = self.fast_router.best(user_input, last_speaker, exclude)
+            if target:
+                return target
+        return self._rotate_speaker(last_speaker, exclude)[0]
+    
+    def route_in_background(self, user_input: str, context: str = "", last_speaker: str = "",
+                            exclude: Sequence[str] = ()) -> Future:
+        """route() を別スレッドで実行（結果は Future で受け取る。発言の受信と並行して次の振り分けをする用）"""
+        future = Future()
+        
+        def run():
+            try:
+                future.set_result(self.route(user_input, context, last_speaker, exclude))
+            except Exception as e:
+                future.set_exception(e)
+        
+        threading.Thread(target=run, name="sumire-route", daemon=True).start()
+        return future
+    
+    def format_route_stats(self) -> str:
+        """振り分け統計の表示用文字列（即決率と短縮できた時間の概算）"""
+        stats = self.route_stats
+        total = stats["fast"] + stats["cache"] + stats["llm"]
+        if not total:
+            return "振り分け実績なし"
+        
+        text = (f"即決 {stats['fast']}/{total}件（{stats['fast'] / total:.0%}）、"
+                f"キャッシュ {self.route_cache.stats()}")
+        if stats["llm"]:
+            # 即決・キャッシュした分も LLM に聞いていたら平均でこれだけかかった、という見積もり
+            llm_avg = stats["llm_time"] / stats["llm"]
+            skipped = stats["fast"] + stats["cache"]
+            saved = max(0.0, skipped * llm_avg - stats["fast_time"] - stats["cache_time"])
+            text += f"、LLM平均 {llm_avg:.2f}秒、約{saved:.1f}秒短縮"
+            text += f"、解析失敗 {stats['parse_fail']}/{stats['llm']}件"
+        return text
+    
+    def _record_route(self, kind: str, start: float):
+        """振り分けの件数と所要時間を記録"""
+        self.route_stats[kind] += 1
+        self.route_stats[f"{kind}_time"] += time.perf_counter() - start
+        self.last_route = kind
+    
+    def warmup(self):
+        """
+        振り分け用モデルを読み込ませておく（起動時に呼ぶ）
+        
+        Ollama ではモデルの読み込みを兼ねて ROUTING_PROMPT を1度読ませ、返ってきた context を
+        以降の振り分けで使い回す（固定の先頭部分を毎回評価し直さずに済む）
+        """
+        if self.backend == 'gemini':
+            self._get_gemini_client()
+            return
+        
+        response = self.session.post(
+            f"{self.ollama_host}/api/generate",
+            json=self._ollama_request(self.PRIME_INPUT, context=None),
+            timeout=self.WARMUP_TIMEOUT
+        )
+        response.raise_for_status()
+        self._routing_context = response.json().get("context")
+    
+    def start_warmup(self):
+        """ウォームアップをバックグラウンドで開始（REPLの起動を待たせない）"""
+        if self._warmup_thread is not None:
+            return
+        
+        def run():
+            try:
+                self.warmup()
+            except Exception as e:
+                print(f"⚠️ スミレん司会のウォームアップに失敗: {e}")
+        
+        self._warmup_thread = threading.Thread(target=run, name="sumire-warmup", daemon=True)
+        self._warmup_thread.start()
+    
+    def _build_routing_input(self, user_input: str, context: str, last_speaker: str,
+                             exclude: Sequence[str] = ()) -> str:
         """振り分け判断用の入力を構築"""
         parts = []
         
@@ -100,98 +284,140 @@ class SumireHost:
         if last_speaker:
             parts.append(f"【直前の発言者】{last_speaker}（連続回避推奨）")
         
+        if exclude:
+            parts.append(f"【今は呼べないAI】{', '.join(exclude)}（選ばないこと）")
+        
         parts.append(f"【ユーザーの発言】\n{user_input}")
         parts.append("【指示】上記を踏まえて、最適なAIを選び、JSON形式で回答してください。")
         
         return "\n\n".join(parts)
     
+    def _ollama_request(self, prompt: str, context: Optional[list]) -> dict:
+        """Ollama の generate リクエストを構築（出力は ROUTING_SCHEMA のJSONに限定）"""
+        request = {
+            "model": self.ollama_model,
+            "prompt": prompt,
+            "stream": False,
+            "keep_alive": self.keep_alive,
+            "format": self.ROUTING_SCHEMA,
+            "options": {
+                "temperature": 0.3,
+                "num_predict": self.ROUTING_MAX_TOKENS
+            }
+        }
+        if context:
+            # ROUTING_PROMPT は context に含まれている
+            request["context"] = context
+        else:
+            request["system"] = self.ROUTING_PROMPT
+        return request
+    
     def _route_with_ollama(self, routing_input: str) -> Tuple[str, str]:
         """Ollama (gemma3) で振り分け"""
         try:
-            response = requests.post(
+            response = self.session.post(
                 f"{self.ollama_host}/api/generate",
-                json={
-                    "model": self.ollama_model,
-                    "prompt": routing_input,
-                    "system": self.ROUTING_PROMPT,
-                    "stream": False,
-                    "options": {
-                        "temperature": 0.3,
-                        "num_predict": 200
-                    }
-                },
+                json=self._ollama_request(routing_input, self._routing_context),
                 timeout=30
             )
             response.raise_for_status()
             result_text = response.json().get("response", "")
             return self._parse_routing_result(result_text)
         except Exception as e:
+            # context が原因の可能性もあるので、次回は system から送り直す
+            self._routing_context = None
             print(f"[Ollama振り分けエラー] {e}")
-            return ("chatgpt", "ChatGPTさん、お願いします")
+            return self.FALLBACK
     
     def _route_with_gemini(self, routing_input: str) -> Tuple[str, str]:
         """Gemini で振り分け"""
         try:
-            from google import genai
             from google.genai import types
             
-            client = genai.Client(api_key=os.environ.get('GEMINI_API_KEY'))
+            client = self._get_gemini_client()
+            # 討論参加者の Gemini とレート制限の枠を共有する
+            get_limiter("gemini").acquire(
+                estimate_tokens(self.ROUTING_PROMPT) + estimate_tokens(routing_input) + self.ROUTING_MAX_TOKENS)
             response = client.models.generate_content(
-                model="gemini-2.5-flash",
+                model=self.gemini_model,
                 contents=routing_input,
                 config=types.GenerateContentConfig(
                     system_instruction=self.ROUTING_PROMPT,
                     temperature=0.3,
-                    max_output_tokens=200
+                    max_output_tokens=self.ROUTING_MAX_TOKENS,
+                    response_mime_type="application/json",
+                    response_schema=types.Schema(
+                        type=types.Type.OBJECT,
+                        properties={
+                            "target": types.Schema(type=types.Type.STRING, enum=self.TARGETS),
+                            "intro": types.Schema(type=types.Type.STRING)
+                        },
+                        required=["target", "intro"]
+                    ),
+                    # 4択に思考は不要（思考トークンで上限を使い切らないように）
+                    thinking_config=types.ThinkingConfig(thinking_budget=0)
                 )
             )
             return self._parse_routing_result(response.text)
         except Exception as e:
             print(f"[Gemini振り分けエラー] {e}")
-            return ("chatgpt", "ChatGPTさん、お願いします")
+            return self.FALLBACK
+    
+    def _get_gemini_client(self):
+        """Gemini クライアント（討論参加者の Gemini と共有）"""
+        if self._gemini_client is None:
+            from api.clients import base_url_for, get_client
+            self._gemini_client = get_client("gemini", "GEMINI_API_KEY", base_url_for("gemini"))
+        return self._gemini_client
     
     def _parse_routing_result(self, result_text: str) -> Tuple[str, str]:
-        """LLMの出力をパース"""
-        import json
-        import re
+        """LLMの出力をパース（スキーマ指定で通常はそのままJSON。失敗は件数を記録）"""
+        data = None
+        try:
+            data = json.loads(result_text)
+        except (json.JSONDecodeError, TypeError):
+            # スキーマに従わなかった場合は JSON 部分を抽出
+            json_match = re.search(r'\{[^}]+\}', result_text or "")
+            if json_match:
+                try:
+                    data = json.loads(json_match.group())
+                except json.JSONDecodeError:
+                    pass
         
-        # JSON部分を抽出
-        json_match = re.search(r'\{[^}]+\}', result_text)
-        if json_match:
-            try:
-                data = json.loads(json_match.group())
-                target = data.get("target", "chatgpt").lower()
-                intro = data.get("intro", "お願いします")
-                
-                # 有効なターゲットか確認
-                valid_targets = ["claude", "gemini", "chatgpt", "grok"]
-                if target not in valid_targets:
-                    target = "chatgpt"
-                
+        if isinstance(data, dict):
+            target = str(data.get("target", "")).lower()
+            intro = data.get("intro") or "お願いします"
+            
+            # 有効なターゲットか確認
+            if target in self.TARGETS:
                 return (target, intro)
-            except json.JSONDecodeError:
-                pass
         
         # パース失敗時のフォールバック
-        return ("chatgpt", "ChatGPTさん、お願いします")
+        self.route_stats["parse_fail"] += 1
+        return self.FALLBACK
     
-    def _rotate_speaker(self, last_speaker: str) -> Tuple[str, str]:
-        """空enterの場合、順番に回す"""
+    def _rotate_speaker(self, last_speaker: str, exclude: Sequence[str] = ()) -> Tuple[str, str]:
+        """空enterの場合、順番に回す（呼べないAIは飛ばす）"""
         rotation = ["claude", "gemini", "chatgpt", "grok"]
-        intros = {
-            "claude": "Claudeさん、いかがでしょうか",
-            "gemini": "Geminiさん、お願いします",
-            "chatgpt": "ChatGPTさん、どうぞ",
-            "grok": "Grokさん、何かありますか"
-        }
         
         if last_speaker in rotation:
-            idx = rotation.index(last_speaker)
-            next_speaker = rotation[(idx + 1) % len(rotation)]
+            idx = rotation.index(last_speaker) + 1
         else:
-            next_speaker = "claude"
+            idx = 0
         
-        return (next_speaker, intros[next_speaker])
+        for i in range(len(rotation)):
+            next_speaker = rotation[(idx + i) % len(rotation)]
+            if next_speaker not in exclude:
+                return (next_speaker, self.ROTATION_INTROS[next_speaker])
+        return self.FALLBACK
+    
+    def _failover_target(self, last_speaker: str, exclude: Sequence[str]) -> Tuple[str, str]:
+        """呼べるAIの中から選ぶ（まとめ役の chatgpt を優先し、直前の発言者はなるべく避ける）"""
+        candidates = [t for t in ["chatgpt", "claude", "gemini", "grok"] if t not in exclude]
+        if not candidates:
+            return self.FALLBACK
+        preferred = [t for t in candidates if t != last_speaker] or candidates
+        return (preferred[0], self.ROTATION_INTROS[preferred[0]])
     
     def health_check(self) -> dict:
         """ヘルスチェック"""
@@ -199,9 +425,9 @@ class SumireHost:
             return {"status": "using_gemini", "backend": "gemini"}
         
         try:
-            response = requests.get(
+            response = self.session.get(
                 f"{self.ollama_host}/api/tags",
-                timeout=5
+                timeout=self.HEALTH_TIMEOUT
             )
             response.raise_for_status()
             models = [m["name"] for m in response.json().get("models", [])]
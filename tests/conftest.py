@@ -0,0 +1,74 @@
+"""
+pytest の共通設定
+"""
+
+import os
+import sys
+import types
+
+import pytest
+
+# リポジトリのルートを import できるようにする（agoratheon.py と同じ）
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class FakeClock:
+    """time.monotonic の代わり（advance() で進める）"""
+
+    def __init__(self, monkeypatch):
+        self.now = 1000.0
+        self._monkeypatch = monkeypatch
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+    def patch(self, module) -> "FakeClock":
+        """module の time.monotonic をこの時計に差し替える（テストの終わりに元に戻る）"""
+        self._monkeypatch.setattr(module.time, "monotonic", self)
+        return self
+
+
+@pytest.fixture
+def fake_clock(monkeypatch) -> FakeClock:
+    """偽の時計（差し替える対象は各テストで fake_clock.patch(モジュール) と指定する）"""
+    return FakeClock(monkeypatch)
+
+
+class _Recorder:
+    """SDKの設定クラスの代わり（渡された引数を属性にして持つだけ）"""
+
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+@pytest.fixture
+def stub_sdks(monkeypatch):
+    """
+    各社SDKの代わりに最小限の偽モジュールを読み込ませる（SDKが入っていなくてもAPIクラスを import できる）
+
+    リクエストを送るクライアントは各テストで偽物を渡す。api.claude などはテストの後に読み込み直される
+    """
+    anthropic = types.ModuleType("anthropic")
+    anthropic.Anthropic = anthropic.AsyncAnthropic = _Recorder
+
+    genai_types = types.ModuleType("google.genai.types")
+    for name in ("GenerateContentConfig", "CreateCachedContentConfig", "HttpOptions", "GetModelConfig"):
+        setattr(genai_types, name, _Recorder)
+    genai = types.ModuleType("google.genai")
+    genai.Client = _Recorder
+    genai.types = genai_types
+    google = types.ModuleType("google")
+    google.genai = genai
+
+    for name, module in (("anthropic", anthropic), ("google", google), ("google.genai", genai),
+                         ("google.genai.types", genai_types)):
+        monkeypatch.setitem(sys.modules, name, module)
+    api_modules = ["api.claude", "api.gemini"]
+    for name in api_modules:
+        monkeypatch.delitem(sys.modules, name, raising=False)
+    yield
+    for name in api_modules:
+        sys.modules.pop(name, None)  # 偽のSDKで読み込んだものは残さない
@@ -0,0 +1,52 @@
+"""
+討論データ（履歴ウィンドウ・参考資料）のテスト
+"""
+
+from models import Discussion
+from models.discussion import SEPARATOR_TOKENS
+
+
+def discussion_with(count: int) -> Discussion:
+    discussion = Discussion(title="テスト")
+    for i in range(count):
+        discussion.add_message("claude", "✴️", f"発言{i} " + "長い内容 " * 20)
+    return discussion
+
+
+def test_window_start_rounds_up_to_block_boundary():
+    discussion = discussion_with(10)
+    cost = discussion._live[0].token_count() + SEPARATOR_TOKENS
+    lines, _, count = discussion.get_context_window(cost * 5, block_size=4)
+    assert count == 2  # 開始位置 5 → 8
+    assert len(lines) == 2
+
+
+def test_small_budget_without_block_boundary_keeps_sliding_window():
+    """収まる範囲に境界が無いとき、開始位置が発言数を越えない（回帰テスト）"""
+    discussion = discussion_with(6)
+    cost = discussion._live[0].token_count() + SEPARATOR_TOKENS
+    lines, total, count = discussion.get_context_window(cost + 1, block_size=4)
+    assert count == 1
+    assert len(lines) == 1
+    assert total > 0
+
+    # 外れたブロックは終わりまでそろったものだけ
+    assert discussion.evicted_blocks(discussion.active_count() - count, 4) == [(0, 4)]
+    assert discussion.evicted_blocks(discussion.active_count() + 2, 4) == [(0, 4)]
+
+
+def test_zero_budget_returns_no_messages():
+    discussion = discussion_with(6)
+    assert discussion.get_context_window(0, block_size=4) == ([], 0, 0)
+
+
+def test_add_data_files_skips_registered_files():
+    discussion = Discussion(title="テスト")
+    discussion.add_data_files(["a.md", "b.md"])
+    discussion.pop_events()
+    for _ in range(3):
+        discussion.add_data_files(["a.md", "b.md"])  # バッチの再実行
+    assert discussion.data_files == ["a.md", "b.md"]
+    assert discussion.pop_events() == []
+    discussion.add_data_files(["b.md", "c.md", "c.md"])
+    assert discussion.data_files == ["a.md", "b.md", "c.md"]
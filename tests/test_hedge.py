@@ -0,0 +1,149 @@
+"""
+予備リクエスト（ヘッジ）のテスト（偽のストリーム・偽の時計）
+"""
+
+import threading
+
+import pytest
+
+from utils import hedge
+from utils.hedge import DEFAULT_DELAY, Hedger
+
+
+class FakeStreams:
+    """呼び出し順に primary / backup のストリームを返す偽のAPI"""
+
+    def __init__(self, *sources):
+        self.sources = list(sources)
+        self.closed = [threading.Event() for _ in sources]  # ストリームが閉じられたか
+        self.calls = 0
+
+    def request(self, usage: dict):
+        i = self.calls
+        self.calls += 1
+        return self._wrap(self.sources[i](usage), self.closed[i])
+
+    @staticmethod
+    def _wrap(iterator, closed: threading.Event):
+        try:
+            yield from iterator
+        finally:
+            closed.set()
+
+
+def slow(gate: threading.Event, *deltas):
+    """gate が開くまで最初の差分を返さない"""
+    def source(usage):
+        gate.wait(5)
+        usage["output_tokens"] = len(deltas)
+        yield from deltas
+    return source
+
+
+def fast(*deltas, tag="fast"):
+    def source(usage):
+        usage["output_tokens"] = len(deltas)
+        usage["tag"] = tag
+        yield from deltas
+    return source
+
+
+def failing(error: Exception):
+    def source(usage):
+        raise error
+        yield
+    return source
+
+
+@pytest.fixture
+def hedger(monkeypatch):
+    hedger = Hedger(budget=1.0)
+    monkeypatch.setattr(hedger, "delay", lambda name: 0.05)
+    return hedger
+
+
+def test_backup_wins_and_primary_is_cancelled(hedger):
+    gate = threading.Event()
+    streams = FakeStreams(slow(gate, "遅い", "応答"), fast("速い", "応答", tag="backup"))
+    usage = {}
+
+    assert "".join(hedger.stream("x", streams.request, usage)) == "速い応答"
+    assert hedger.stats["x"] == {"requests": 1, "fired": 1, "won": 1}
+    assert usage["tag"] == "backup"
+
+    gate.set()
+    assert streams.closed[0].wait(2), "負けた方のストリームが閉じられていない"
+
+
+def test_primary_before_deadline_fires_no_backup(hedger):
+    streams = FakeStreams(fast("一番手"))
+    assert "".join(hedger.stream("x", streams.request, {})) == "一番手"
+    assert hedger.stats["x"]["fired"] == 0
+
+
+def test_budget_limits_backups(monkeypatch):
+    hedger = Hedger(budget=0.0)
+    monkeypatch.setattr(hedger, "delay", lambda name: 0.01)
+    gate = threading.Event()
+    threading.Timer(0.1, gate.set).start()
+    streams = FakeStreams(slow(gate, "待った"))
+    assert "".join(hedger.stream("x", streams.request, {})) == "待った"
+    assert hedger.stats["x"]["fired"] == 0
+
+
+def test_primary_failing_after_backup_fired_uses_backup(hedger):
+    backup_started = threading.Event()
+
+    def primary(usage):
+        backup_started.wait(5)
+        raise ConnectionError("一番手")
+        yield
+
+    def backup(usage):
+        backup_started.set()
+        yield from fast("予備")(usage)
+
+    streams = FakeStreams(primary, backup)
+    assert "".join(hedger.stream("x", streams.request, {})) == "予備"
+    assert hedger.stats["x"]["won"] == 1
+
+
+def test_both_failing_raises_primary_error(hedger):
+    streams = FakeStreams(failing(ConnectionError("一番手")), failing(TimeoutError("予備")))
+    with pytest.raises(ConnectionError, match="一番手"):
+        list(hedger.stream("x", streams.request, {}))
+
+
+def test_reader_stopping_early_cancels_winner(hedger):
+    def endless(usage):
+        while True:
+            yield "続き"
+
+    streams = FakeStreams(endless)
+    stream = hedger.stream("x", streams.request, {})
+    assert next(stream) == "続き"
+    stream.close()
+    assert streams.closed[0].wait(2), "読むのをやめたのにストリームが閉じられていない"
+
+
+def test_first_token_latency_is_recorded(fake_clock):
+    clock = fake_clock.patch(hedge)
+    hedger = Hedger(budget=0.0)
+    gate = threading.Event()
+
+    def tick():
+        clock.advance(0.3)
+        gate.set()
+
+    threading.Timer(0.02, tick).start()
+    streams = FakeStreams(slow(gate, "一番手"))
+    assert "".join(hedger.stream("x", streams.request, {})) == "一番手"
+    assert list(hedger._latencies["x"]) == [pytest.approx(0.3)]
+
+
+def test_delay_uses_recent_percentile():
+    hedger = Hedger(percentile=0.5)
+    for latency in (1.0, 2.0, 3.0, 4.0, 5.0):
+        hedger._record("x", latency)
+    assert hedger.delay("x") == 3.0
+    assert hedger.delay("unknown") == DEFAULT_DELAY  # 履歴が少ないうちはデフォルト
@@ -0,0 +1,140 @@
+"""
+保存（スナップショット + ジャーナル）のテスト
+"""
+
+import json
+import os
+
+import pytest
+
+from models import Discussion, DiscussionStore
+from models.journal import BackgroundSaver, atomic_write
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "討論.json")
+
+
+def new_discussion(store: DiscussionStore) -> Discussion:
+    """AgoraTheon._load_or_create と同じ手順で新規作成"""
+    discussion = Discussion(title="テスト", created="2025-01-01T00:00:00")
+    assert store.load(discussion.to_dict()) is None
+    discussion.record_creation()
+    return discussion
+
+
+def reload(path: str) -> dict:
+    """読み直したデータ（保存用の通し番号は除く）"""
+    data = DiscussionStore(path).load(Discussion(title="テスト").to_dict())
+    data.pop("_journal_seq", None)
+    return data
+
+
+def test_replay_restores_all_changes(path):
+    store = DiscussionStore(path)
+    discussion = new_discussion(store)
+    discussion.add_message("claude", "✴️", "最初の発言")
+    discussion.add_message("grok", "♨️", "乱暴な発言")
+    discussion.filter_last("穏当な発言")
+    discussion.add_message("gemini", "❇️", "消す発言")
+    discussion.delete_last()
+    discussion.add_data_files(["資料.md"])
+    discussion.set_block_summary(0, 2, "要約")
+    discussion.set_digest("まとめ", 2)
+    store.append(discussion.pop_events())
+
+    assert not os.path.exists(path)
+    assert reload(path) == discussion.to_dict()
+
+
+def test_journal_only_reload_keeps_creation_metadata(path):
+    store = DiscussionStore(path)
+    discussion = new_discussion(store)
+    discussion.add_message("claude", "✴️", "発言")
+    store.append(discussion.pop_events())
+
+    for _ in range(2):
+        data = reload(path)
+        assert data["created"] == "2025-01-01T00:00:00"
+        assert data["title"] == "テスト"
+
+
+def test_compaction_then_reload(path):
+    store = DiscussionStore(path, compact_every=2)
+    discussion = new_discussion(store)
+    for i in range(3):
+        discussion.add_message("claude", "✴️", f"発言{i}")
+    store.append(discussion.pop_events())
+    store.compact()
+    discussion.add_message("grok", "♨️", "コンパクション後")
+    store.append(discussion.pop_events())
+
+    assert os.path.exists(path)
+    assert reload(path) == discussion.to_dict()
+
+
+def test_events_already_in_snapshot_are_skipped(path):
+    """スナップショットを書いた直後、ジャーナルを消す前に落ちた場合"""
+    store = DiscussionStore(path)
+    discussion = new_discussion(store)
+    for i in range(3):
+        discussion.add_message("claude", "✴️", f"発言{i}")
+    store.append(discussion.pop_events())
+
+    with open(store.journal_file, encoding="utf-8") as f:
+        journal = f.read()
+    store.compact()
+    with open(store.journal_file, "w", encoding="utf-8") as f:
+        f.write(journal)  # 消えなかったジャーナル
+
+    data = reload(path)
+    assert [m["content"] for m in data["messages"]] == ["発言0", "発言1", "発言2"]
+
+    # 続きのイベントはスナップショットより後の番号で書かれる
+    store = DiscussionStore(path)
+    restored = Discussion.from_dict(store.load(Discussion(title="テスト").to_dict()))
+    restored.add_message("grok", "♨️", "続き")
+    store.append(restored.pop_events())
+    assert [m["content"] for m in reload(path)["messages"]] == ["発言0", "発言1", "発言2", "続き"]
+
+
+def test_torn_last_line_is_dropped_and_store_recovers(path):
+    store = DiscussionStore(path)
+    discussion = new_discussion(store)
+    discussion.add_message("claude", "✴️", "書けた発言")
+    store.append(discussion.pop_events())
+    with open(store.journal_file, "a", encoding="utf-8") as f:
+        f.write('{"op": "add", "message": {"id": "002", "con')  # 書き込み途中で落ちた
+
+    store = DiscussionStore(path)
+    data = store.load(Discussion(title="テスト").to_dict())
+    assert [m["content"] for m in data["messages"]] == ["書けた発言"]
+    assert data["created"] == "2025-01-01T00:00:00"
+    # 読めた分でスナップショットを作り直し、途切れた行は残さない
+    assert os.path.exists(path)
+    assert not os.path.exists(store.journal_file)
+
+    restored = Discussion.from_dict(data)
+    restored.add_message("grok", "♨️", "再開後の発言")
+    store.append(restored.pop_events())
+    assert [m["content"] for m in reload(path)["messages"]] == ["書けた発言", "再開後の発言"]
+
+
+def test_atomic_write_replaces_file(tmp_path):
+    target = str(tmp_path / "a.json")
+    atomic_write(target, json.dumps({"v": 1}))
+    atomic_write(target, json.dumps({"v": 2}))
+    with open(target, encoding="utf-8") as f:
+        assert json.load(f) == {"v": 2}
+    assert not os.path.exists(target + ".tmp")
+
+
+def test_saver_writes_only_latest_file_contents(path, tmp_path):
+    saver = BackgroundSaver(DiscussionStore(path), debounce=60)
+    target = str(tmp_path / "metrics.json")
+    for n in range(3):
+        saver.submit_file(target, json.dumps({"turns": n}))
+    saver.close()
+    with open(target, encoding="utf-8") as f:
+        assert json.load(f) == {"turns": 2}
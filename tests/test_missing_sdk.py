@@ -0,0 +1,40 @@
+"""
+SDKが入っていない・壊れている場合のテスト（SDKは初回使用時に読み込むので、起動後に失敗する）
+"""
+
+import sys
+
+import pytest
+
+from agoratheon import AgoraTheon
+from api import API_MAP
+
+
+SDK_MODULES = ["anthropic", "openai", "google.genai"]
+API_MODULES = ["api.claude", "api.gemini", "api.chatgpt", "api.grok", "api.openai_compat"]
+
+
+@pytest.fixture
+def agora(tmp_path, monkeypatch):
+    for module in SDK_MODULES:
+        monkeypatch.setitem(sys.modules, module, None)  # import が ImportError になる
+    for module in API_MODULES:
+        monkeypatch.delitem(sys.modules, module, raising=False)
+    monkeypatch.setattr(API_MAP, "_loaded", {})
+    agora = AgoraTheon(str(tmp_path / "討論.md"), auto_mode=False, streaming=False)
+    yield agora
+    agora.close()
+
+
+def test_direct_call_reports_failure(agora):
+    output, should_exit = agora.process_command("/claude")
+    assert output.startswith("❌")
+    assert not should_exit
+    assert agora.discussion.active_count() == 0
+
+
+def test_panel_reports_failure(agora):
+    output, _ = agora.process_command("/panel")
+    for name in API_MAP:
+        assert f"{name}: " in output
+    assert output.count("❌") == len(API_MAP)
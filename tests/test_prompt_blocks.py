@@ -0,0 +1,41 @@
+"""
+プロンプトブロック（履歴のまとめ方）のテスト
+"""
+
+from api.base import BaseAPI
+
+
+def build(lines, size):
+    api = BaseAPI()
+    api.history_block = size
+    return api._build_blocks(lines, "指示")
+
+
+def test_history_grouped_by_window_block():
+    lines = [f"発言{i}" for i in range(10)]
+    blocks = build(lines, 4)
+    assert [kind for kind, _ in blocks] == ["history", "history", "recent", "instruction"]
+
+
+def test_grouping_keeps_message_text():
+    lines = [f"発言{i}" for i in range(10)]
+    api = BaseAPI()
+    assert api._build_message(build(lines, 4)) == api._build_message(build(lines, 1))
+
+
+def test_complete_blocks_unchanged_by_next_message():
+    lines = [f"発言{i}" for i in range(8)]
+    before = build(lines, 4)
+    after = build(lines + ["発言8"], 4)
+    assert after[:2] == before[:2]
+
+
+def test_claude_cache_breakpoint_on_last_complete_block(stub_sdks):
+    from api.claude import ClaudeAPI
+
+    api = ClaudeAPI(client=object())
+    api.history_block = 4
+    lines = [f"発言{i}" for i in range(10)]
+    content = api._request(api._build_blocks(lines, "指示"), 0.7, 100)["messages"][0]["content"]
+    assert len(content) == 4
+    assert [("cache_control" in block) for block in content] == [False, True, False, False]
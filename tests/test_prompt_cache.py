@@ -0,0 +1,112 @@
+"""
+プロンプトキャッシュ（Gemini の cached contents・キャッシュ読込トークンの記録）のテスト（偽のSDK・偽のクライアント）
+"""
+
+from types import SimpleNamespace
+
+import pytest
+
+DATA = "参考資料。" * 2000  # キャッシュできる大きさ（CACHE_MIN_TOKENS 以上）
+
+
+class FakeGeminiClient:
+    """caches.create / delete と models.generate_content を記録する偽のクライアント"""
+
+    def __init__(self):
+        self.created = []
+        self.deleted = []
+        self.requests = []
+        self.caches = SimpleNamespace(create=self._create, delete=self._delete)
+        self.models = SimpleNamespace(generate_content=self._generate_content)
+
+    def _create(self, model, config):
+        name = f"cachedContents/{len(self.created)}"
+        self.created.append((name, config))
+        return SimpleNamespace(name=name)
+
+    def _delete(self, name):
+        self.deleted.append(name)
+
+    def _generate_content(self, model, contents, config):
+        self.requests.append((contents, config))
+        metadata = SimpleNamespace(prompt_token_count=3000, candidates_token_count=20,
+                                   cached_content_token_count=2500 if getattr(config, "cached_content", None) else None)
+        return SimpleNamespace(text="応答", usage_metadata=metadata)
+
+
+@pytest.fixture
+def gemini(stub_sdks, monkeypatch):
+    from api import gemini as module
+
+    now = [1000.0]
+    monkeypatch.setattr(module.time, "time", lambda: now[0])
+    api = module.GeminiAPI(client=FakeGeminiClient())
+    api.cache_ttl = 600
+    api.now = now  # テストから時刻を進める
+    return api
+
+
+def test_gemini_cache_created_then_reused(gemini):
+    usage = {}
+    assert gemini.generate(["発言1"], "指示", data=DATA, usage=usage) == "応答"
+    gemini.generate(["発言1", "発言2"], "指示", data=DATA)
+
+    client = gemini.client
+    assert [name for name, _ in client.created] == ["cachedContents/0"]
+    assert client.created[0][1].ttl == "600s"
+    for contents, config in client.requests:
+        assert config.cached_content == "cachedContents/0"
+        assert DATA not in contents  # 参考資料はキャッシュ側にあるので送らない
+    assert usage == {"input_tokens": 3000, "output_tokens": 20, "cached_tokens": 2500}
+
+
+def test_gemini_cache_recreated_after_expiry(gemini):
+    gemini.generate(["発言1"], "指示", data=DATA)
+    gemini.now[0] += gemini.cache_ttl - 29  # 期限の少し前に切り替える
+    gemini.generate(["発言1"], "指示", data=DATA)
+
+    client = gemini.client
+    assert [name for name, _ in client.created] == ["cachedContents/0", "cachedContents/1"]
+    assert client.deleted == ["cachedContents/0"]
+    assert client.requests[-1][1].cached_content == "cachedContents/1"
+
+
+def test_gemini_cache_replaced_when_data_changes(gemini):
+    gemini.generate(["発言1"], "指示", data=DATA)
+    gemini.generate(["発言1"], "指示", data=DATA + "追記")
+    assert gemini.client.deleted == ["cachedContents/0"]
+    assert gemini._cached[1] == "cachedContents/1"
+
+
+def test_gemini_small_data_is_sent_without_cache(gemini):
+    usage = {}
+    gemini.generate(["発言1"], "指示", data="短い資料", usage=usage)
+    contents, config = gemini.client.requests[0]
+    assert gemini.client.created == []
+    assert "短い資料" in contents and config.system_instruction == gemini.SYSTEM_PROMPT
+    assert usage["cached_tokens"] == 0
+
+
+def test_gemini_cache_failure_falls_back(gemini, capsys):
+    def broken(model, config):
+        raise RuntimeError("quota")
+
+    gemini.client.caches.create = broken
+    assert gemini.generate(["発言1"], "指示", data=DATA) == "応答"
+    assert DATA in gemini.client.requests[0][0]
+    assert "キャッシュ作成失敗" in capsys.readouterr().out
+
+
+def test_claude_usage_counts_cache_reads_and_writes(stub_sdks):
+    from api.claude import ClaudeAPI
+
+    api = ClaudeAPI(client=object())
+    usage = {}
+    api._record_response_usage(SimpleNamespace(input_tokens=100, output_tokens=30,
+                                               cache_read_input_tokens=2000, cache_creation_input_tokens=500), usage)
+    assert usage == {"input_tokens": 2600, "output_tokens": 30, "cached_tokens": 2000}
+    assert api.cache_hit_rate() == pytest.approx(2000 / 2600)
+
+    # キャッシュの項目が無い応答（古いSDK・キャッシュ未使用）
+    api._record_response_usage(SimpleNamespace(input_tokens=100, output_tokens=30), usage)
+    assert usage["cached_tokens"] == 0
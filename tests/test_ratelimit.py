@@ -0,0 +1,105 @@
+"""
+レート制限（RPM/TPM）のテスト
+"""
+
+import threading
+import time
+
+import pytest
+
+from api import ratelimit
+from api.ratelimit import RateLimiter, TokenBucket
+
+
+@pytest.fixture
+def clock(fake_clock):
+    return fake_clock.patch(ratelimit)
+
+
+def test_bucket_refills_continuously(clock):
+    bucket = TokenBucket(60)
+    bucket.take(60)
+    assert bucket.wait_time(1) == pytest.approx(1.0)
+    clock.advance(30)
+    bucket.refill()
+    assert bucket.level == pytest.approx(30)
+    clock.advance(300)
+    bucket.refill()
+    assert bucket.level == 60  # 上限まで
+
+
+def test_unlimited_never_waits(clock):
+    limiter = RateLimiter("t")
+    for _ in range(1000):
+        assert limiter.acquire(10_000) == 0.0
+    assert limiter.acquired == 1000
+    assert limiter.waited == 0
+
+
+def test_tpm_reserves_estimate(clock):
+    limiter = RateLimiter("t", tpm=1000)
+    limiter.acquire(300)
+    assert limiter._tokens.level == pytest.approx(700)
+
+
+def test_settle_returns_unused_tokens(clock):
+    limiter = RateLimiter("t", tpm=1000)
+    limiter.acquire(300)
+    limiter.settle(300, 100)
+    assert limiter._tokens.level == pytest.approx(900)
+
+
+def test_settle_charges_overrun(clock):
+    limiter = RateLimiter("t", tpm=1000)
+    limiter.acquire(300)
+    limiter.settle(300, 500)
+    assert limiter._tokens.level == pytest.approx(500)
+
+
+def test_settle_never_exceeds_limit(clock):
+    limiter = RateLimiter("t", tpm=1000)
+    limiter.acquire(100)
+    clock.advance(60)
+    limiter.settle(100, 10)
+    assert limiter._tokens.level == 1000
+
+
+def test_estimate_larger_than_tpm_is_capped(clock):
+    limiter = RateLimiter("t", tpm=1000)
+    assert limiter.acquire(5000) == 0.0  # 上限に丸めるので永久には待たない
+    assert limiter._tokens.level == pytest.approx(0)
+
+
+def test_waiters_are_served_in_order():
+    """待っている呼び出しは来た順に通る（実時間、RPM 600 = 0.1秒に1回）"""
+    limiter = RateLimiter("t", rpm=600)
+    limiter._requests.level = 0
+    order = []
+
+    def call(i):
+        limiter.acquire()
+        order.append(i)
+
+    threads = []
+    for i in range(4):
+        thread = threading.Thread(target=call, args=(i,))
+        thread.start()
+        threads.append(thread)
+        deadline = time.monotonic() + 1
+        while limiter.depth <= i and time.monotonic() < deadline and thread.is_alive():
+            time.sleep(0.001)
+    for thread in threads:
+        thread.join(5)
+
+    assert order == [0, 1, 2, 3]
+    assert limiter.waited == 4
+    assert limiter.max_depth == 4
+
+
+def test_get_limiter_reads_environment(monkeypatch):
+    monkeypatch.setattr(ratelimit, "_limiters", {})
+    monkeypatch.setenv("AGORATHEON_RPM_TESTAI", "12")
+    monkeypatch.setenv("AGORATHEON_TPM_TESTAI", "3400")
+    limiter = ratelimit.get_limiter("testai")
+    assert (limiter.rpm, limiter.tpm) == (12, 3400)
+    assert ratelimit.get_limiter("testai") is limiter
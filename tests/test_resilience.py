@@ -0,0 +1,229 @@
+"""
+サーキットブレーカー・再試行のテスト（偽の時計・偽のAPI）
+"""
+
+import itertools
+
+import pytest
+
+from api import resilience
+from api.base import BaseAPI
+from api.resilience import CircuitBreaker, CircuitOpenError, ProviderError
+
+
+_names = itertools.count()
+
+
+@pytest.fixture
+def clock(fake_clock):
+    return fake_clock.patch(resilience)
+
+
+class FakeAPI(BaseAPI):
+    """決めた順に成功・失敗する偽のAPI（ブレーカーはテストごとに別）"""
+
+    DISPLAY_NAME = "Fake"
+
+    def __init__(self, outcomes=(), deltas=("a", "b", "c")):
+        self.NAME = f"fake{next(_names)}"
+        super().__init__()
+        self.outcomes = list(outcomes)  # 例外なら送出、それ以外は成功
+        self.deltas = deltas
+        self.calls = 0
+
+    def _next(self):
+        self.calls += 1
+        outcome = self.outcomes.pop(0) if self.outcomes else "ok"
+        if isinstance(outcome, BaseException):
+            raise outcome
+
+    def _generate(self, blocks, temperature, max_tokens, usage):
+        self._next()
+        return "ok"
+
+    def _stream(self, blocks, temperature, max_tokens, usage):
+        self._next()
+        yield from self.deltas
+
+
+class RetryableError(Exception):
+    status_code = 503
+
+
+class FatalError(Exception):
+    status_code = 400
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    """再試行の待ち時間をなくす"""
+    monkeypatch.setattr("api.base.backoff_delay", lambda attempt: 0.0)
+
+
+def trip(breaker: CircuitBreaker):
+    for _ in range(breaker.failure_threshold):
+        breaker.before_call()
+        breaker.record_failure()
+
+
+def test_breaker_opens_after_threshold(clock):
+    breaker = CircuitBreaker("t", failure_threshold=3, cooldown=30)
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert breaker.trips == 1
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_breaker_success_resets_failures(clock):
+    breaker = CircuitBreaker("t", failure_threshold=3, cooldown=30)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == "closed"
+
+
+def test_breaker_half_open_allows_one_trial(clock):
+    breaker = CircuitBreaker("t", failure_threshold=1, cooldown=30)
+    trip(breaker)
+    clock.advance(29)
+    assert breaker.is_open()
+    clock.advance(1)
+    assert breaker.state == "half-open"
+    assert not breaker.is_open()
+
+    assert breaker.before_call() is True
+    assert breaker.is_open()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.before_call() is False
+
+
+def test_breaker_failed_trial_reopens(clock):
+    breaker = CircuitBreaker("t", failure_threshold=3, cooldown=30)
+    trip(breaker)
+    clock.advance(30)
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert breaker.trips == 2
+    clock.advance(30)
+    assert breaker.state == "half-open"
+
+
+def test_breaker_release_trial(clock):
+    breaker = CircuitBreaker("t", failure_threshold=1, cooldown=30)
+    trip(breaker)
+    clock.advance(30)
+    breaker.before_call()
+    breaker.release_trial()
+    assert breaker.state == "half-open"
+    assert breaker.before_call() is True
+
+
+def test_half_open_stream_closed_early_releases_trial(clock):
+    """試し呼び出しのストリームを途中で閉じても、次の呼び出しは通る（回帰テスト）"""
+    api = FakeAPI()
+    api.breaker.failure_threshold = 1
+    trip(api.breaker)
+    clock.advance(api.breaker.cooldown)
+
+    stream = api.stream(["発言"])
+    assert next(stream) == "a"
+    stream.close()  # 先行呼び出しの外れ・ヘッジの負け・Ctrl-C と同じ
+
+    assert not api.breaker.is_open()
+    assert "".join(api.stream(["発言"])) == "abc"
+    assert api.breaker.state == "closed"
+
+
+def test_half_open_call_interrupted_releases_trial(clock):
+    api = FakeAPI(outcomes=[KeyboardInterrupt()])
+    api.breaker.failure_threshold = 1
+    trip(api.breaker)
+    clock.advance(api.breaker.cooldown)
+
+    with pytest.raises(KeyboardInterrupt):
+        api.generate(["発言"])
+
+    assert api.generate(["発言"]) == "ok"
+    assert api.breaker.state == "closed"
+
+
+def test_retryable_error_is_retried(clock):
+    api = FakeAPI(outcomes=[RetryableError("503"), RetryableError("503")])
+    assert api.generate(["発言"]) == "ok"
+    assert api.calls == 3
+    assert api.retry_count == 2
+
+
+def test_retries_are_limited(clock):
+    api = FakeAPI(outcomes=[RetryableError("503")] * 5)
+    api.breaker.failure_threshold = 10
+    with pytest.raises(ProviderError) as info:
+        api.generate(["発言"])
+    assert info.value.retryable
+    assert api.calls == api.MAX_RETRIES + 1
+
+
+def test_fatal_error_is_not_retried(clock):
+    api = FakeAPI(outcomes=[FatalError("400")])
+    with pytest.raises(ProviderError) as info:
+        api.generate(["発言"])
+    assert not info.value.retryable
+    assert api.calls == 1
+
+
+def test_stream_not_retried_after_first_delta(clock):
+    class Broken(FakeAPI):
+        def _stream(self, blocks, temperature, max_tokens, usage):
+            self._next()
+            yield "a"
+            raise RetryableError("503")
+
+    api = Broken()
+    with pytest.raises(ProviderError):
+        list(api.stream(["発言"]))
+    assert api.calls == 1
+
+
+def test_retry_stops_when_breaker_opens(clock):
+    api = FakeAPI(outcomes=[RetryableError("503")] * 5)
+    api.breaker.failure_threshold = 1
+    with pytest.raises(ProviderError):
+        api.generate(["発言"])
+    assert api.calls == 1
+    with pytest.raises(CircuitOpenError):
+        api.generate(["発言"])
+
+
+def test_backoff_delay_is_capped():
+    for attempt in range(10):
+        assert 0 <= resilience.backoff_delay(attempt, base=0.5, cap=8.0) <= min(8.0, 0.5 * 2 ** attempt)
+
+
+def test_retry_waits_with_backoff(clock, monkeypatch):
+    attempts = []
+    monkeypatch.setattr("api.base.backoff_delay", lambda attempt: attempts.append(attempt) or 0.0)
+    api = FakeAPI(outcomes=[RetryableError("503"), RetryableError("503")])
+    api.generate(["発言"])
+    assert attempts == [0, 1]
+
+
+@pytest.mark.parametrize("error, expected", [
+    (TimeoutError(), True),
+    (ConnectionError(), True),
+    (RetryableError("503"), True),
+    (FatalError("400"), False),
+    (type("APITimeoutError", (Exception,), {})(), True),
+    (ValueError("bad"), False),
+])
+def test_is_retryable(error, expected):
+    assert resilience.is_retryable(error) is expected
@@ -0,0 +1,40 @@
+"""
+スミレんの振り分けキャッシュのテスト
+"""
+
+import threading
+
+import pytest
+
+pytest.importorskip("requests")  # personas パッケージがスミレん（Ollama 接続）を読み込むため
+
+from personas import RouteCache  # noqa: E402
+
+
+def test_concurrent_get_and_put_keep_lru_consistent():
+    cache = RouteCache(max_size=8, ttl=600, use_context=False)
+    rounds = 2000
+
+    def worker(n):
+        for i in range(rounds):
+            key = cache.key(f"入力{(n + i) % 16}", "")
+            if cache.get(key) is None:
+                cache.put(key, ("claude", "どうぞ"))
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(cache._entries) <= cache.max_size
+    assert cache.hits + cache.misses == 4 * rounds
+
+
+def test_get_skips_last_speaker_and_excluded():
+    cache = RouteCache(max_size=8, ttl=600, use_context=False)
+    key = cache.key("もっと深く！", "")
+    cache.put(key, ("grok", "どうぞ"))
+    assert cache.get(cache.key("もっと 深く", ""), "") == ("grok", "どうぞ")
+    assert cache.get(key, "grok") is None
+    assert cache.get(key, "", exclude=["grok"]) is None
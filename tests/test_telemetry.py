@@ -0,0 +1,40 @@
+"""
+計測値の集計のテスト
+"""
+
+from utils import telemetry
+
+
+def sample(provider, latency, ttft=None, input_tokens=100, cached_tokens=0):
+    return telemetry.make_telemetry(provider, "gpt-4o", {"input_tokens": input_tokens, "output_tokens": 10,
+                                                         "cached_tokens": cached_tokens}, latency, ttft=ttft)
+
+
+def test_aggregate_matches_full_recount():
+    samples = [sample("chatgpt", latency, ttft=latency / 2, cached_tokens=n * 10)
+               for n, latency in enumerate([3.0, 1.0, 2.0, 5.0, 4.0])]
+    samples.append(sample("grok", 0.5))
+    aggregate = telemetry.TelemetryAggregate()
+    for n, t in enumerate(samples):
+        aggregate.add(t)
+        assert aggregate.summary() == telemetry.summarize(samples[:n + 1])
+
+    entry = aggregate.summary()["chatgpt"]
+    assert entry["latency"] == {"p50": 3.0, "p95": 5.0, "count": 5, "sum": 15.0}
+    assert entry["cached_tokens"] == 100
+    assert entry["routing_latency"]["count"] == 0
+
+
+def test_summary_is_a_copy():
+    aggregate = telemetry.TelemetryAggregate()
+    aggregate.add(sample("chatgpt", 1.0))
+    aggregate.summary()["chatgpt"]["models"].append("x")
+    assert aggregate.summary()["chatgpt"]["models"] == ["gpt-4o"]
+
+
+def test_speculation_saved_is_a_separate_timing():
+    t = telemetry.make_telemetry("claude", "m", {}, 2.0, ttft=0.5, routing_latency=0.8, speculation_saved=0.7)
+    entry = telemetry.summarize([t, sample("claude", 1.0)])["claude"]
+    assert entry["speculation_saved"] == {"p50": 0.7, "p95": 0.7, "count": 1, "sum": 0.7}
+    assert entry["latency"]["count"] == 2
+    assert "agoratheon_speculation_saved_seconds_count" in telemetry.to_prometheus({"claude": entry})
@@ -0,0 +1,86 @@
+"""
+Data File Cache for AgoraTheon
+参考資料（--data）の読み込みキャッシュ
+
+ファイルごとに (パス, mtime, サイズ) をキーにして内容を保持し、
+変更が無い限り【資料: ...】ブロックを作り直さない
+"""
+
+import os
+import mmap
+from typing import List, Tuple
+
+from .tokens import estimate_tokens
+
+
+class DataFileCache:
+    """参考資料ファイルのキャッシュ"""
+
+    def __init__(self):
+        self._files = {}  # パス → (キー, 内容)
+        self._block_key = None
+        self._block = ""
+        self.block_tokens = 0  # 現在のブロックの推定トークン数
+        self.hits = 0
+        self.misses = 0
+
+    def get_block(self, paths: List[str]) -> str:
+        """
+        参考資料ブロックを取得
+
+        Args:
+            paths: 参考資料ファイルのパス（存在しないものは無視）
+
+        Returns:
+            「【資料: パス】\\n内容」を空行区切りで連結した文字列
+        """
+        keys = []
+        for path in paths:
+            key = self._file_key(path)
+            if key is not None:
+                keys.append(key)
+        keys = tuple(keys)
+
+        # どのファイルも変わっていなければ前回のブロックをそのまま返す
+        if keys == self._block_key:
+            self.hits += len(keys)
+            return self._block
+
+        parts = [f"【資料: {key[0]}】\n{self._read(key)}" for key in keys]
+        self._block = "\n\n".join(parts)
+        self.block_tokens = estimate_tokens(self._block)
+        self._block_key = keys
+        return self._block
+
+    def stats(self) -> str:
+        """ヒット/ミス数の表示用文字列"""
+        return f"ヒット {self.hits} / ミス {self.misses}"
+
+    def _file_key(self, path: str) -> Tuple[str, int, int]:
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return (path, st.st_mtime_ns, st.st_size)
+
+    def _read(self, key: Tuple[str, int, int]) -> str:
+        """ファイル内容を取得（キーが同じならキャッシュを使う）"""
+        path, _, size = key
+        cached = self._files.get(path)
+        if cached and cached[0] == key:
+            self.hits += 1
+            return cached[1]
+
+        self.misses += 1
+        if size == 0:
+            text = ""
+        else:
+            # 大きな資料でも一度のコピーで済むよう mmap で読む
+            with open(path, 'rb') as f:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    text = mm[:].decode('utf-8')
+            if '\r' in text:
+                # テキストモードで読んだ場合と同じ改行にそろえる
+                text = text.replace('\r\n', '\n').replace('\r', '\n')
+        self._files[path] = (key, text)
+        return text
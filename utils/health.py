@@ -0,0 +1,119 @@
+"""
+Health Check Utilities for AgoraTheon
+ヘルスチェックの並列実行と結果キャッシュ
+"""
+
+import os
+import json
+import time
+import threading
+from typing import Callable, Dict, Optional
+
+
+# 正常とみなすステータス
+HEALTHY_STATUSES = ("healthy", "using_gemini")
+
+
+def default_cache_dir() -> str:
+    """キャッシュディレクトリ（AGORATHEON_CACHE_DIR で変更可）"""
+    return os.environ.get(
+        'AGORATHEON_CACHE_DIR',
+        os.path.join(os.path.expanduser('~'), '.cache', 'agoratheon')
+    )
+
+
+class HealthCache:
+    """
+    ヘルスチェック結果のTTL付きキャッシュ
+    プロセスをまたいで使えるようにJSONファイルにも保存する（--health の連続実行用）
+    """
+
+    def __init__(self, path: str = None, ttl: float = None):
+        self.path = path or os.path.join(default_cache_dir(), 'health.json')
+        if ttl is None:
+            ttl = float(os.environ.get('AGORATHEON_HEALTH_TTL', '60'))
+        self.ttl = ttl
+        self._entries = self._load()
+
+    def get(self, name: str) -> Optional[dict]:
+        """有効期限内の結果を返す（無ければ None）"""
+        entry = self._entries.get(name)
+        if not entry:
+            return None
+        age = time.time() - entry.get("checked_at", 0)
+        if age > self.ttl:
+            return None
+        return dict(entry, age=age)
+
+    def put(self, results: Dict[str, dict]):
+        """結果を保存"""
+        if not results:
+            return
+        now = time.time()
+        for name, result in results.items():
+            self._entries[name] = dict(result, checked_at=now)
+        self._save()
+
+    def _load(self) -> dict:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self):
+        # キャッシュの書き込み失敗でヘルスチェック自体は失敗させない
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._entries, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            pass
+
+
+def run_checks(checks: Dict[str, Callable[[], dict]], deadlines: Dict[str, float]) -> Dict[str, dict]:
+    """
+    ヘルスチェックを並列実行
+
+    Args:
+        checks: 名前 → チェック関数（結果dictを返す）
+        deadlines: 名前 → 制限時間（秒）
+
+    Returns:
+        名前 → 結果dict（制限時間を過ぎたものは status=timeout）
+    """
+    results = {}
+    threads = {}
+
+    def run_one(name: str, check: Callable[[], dict]):
+        start = time.perf_counter()
+        try:
+            result = check()
+        except Exception as e:
+            result = {"status": "unhealthy", "error": str(e)}
+        result["latency"] = time.perf_counter() - start
+        results[name] = result
+
+    for name, check in checks.items():
+        # 応答しないAPIが終了を妨げないよう daemon スレッドで実行
+        thread = threading.Thread(target=run_one, args=(name, check), daemon=True)
+        thread.start()
+        threads[name] = thread
+
+    start = time.monotonic()
+    for name, thread in threads.items():
+        remaining = deadlines.get(name, 5.0) - (time.monotonic() - start)
+        thread.join(max(0.0, remaining))
+
+    collected = {}
+    for name in checks:
+        if name in results:
+            collected[name] = results[name]
+        else:
+            collected[name] = {
+                "status": "timeout",
+                "error": f"{deadlines.get(name, 5.0):.0f}秒以内に応答なし"
+            }
+    return collected
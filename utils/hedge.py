@@ -0,0 +1,175 @@
+"""
+Hedged Requests for AgoraTheon
+初回トークンが遅いときに予備リクエストを出す（テールレイテンシ対策）
+
+- 最初のリクエストが「最近の初回トークン時間の p95」を過ぎても応答しなければ、同じ内容の予備リクエストを出す
+- 先に応答し始めた方を採用し、もう一方は打ち切る
+- 予備リクエストは全リクエストの一定割合（予算）までに抑える
+"""
+
+import os
+import time
+import queue
+import threading
+from collections import deque
+from typing import Callable, Dict, Iterator
+
+
+# 履歴が少ないうちの待ち時間（秒）
+DEFAULT_DELAY = 3.0
+
+# 待ち時間の下限（秒）
+MIN_DELAY = 0.5
+
+# 待ち時間の算出に必要な履歴の件数
+MIN_SAMPLES = 5
+
+
+class BackgroundStream:
+    """
+    イテレータをバックグラウンドスレッドで読み、(種類, タグ, 値) をキューに入れる
+
+    種類は "delta"（テキスト差分）/ "end"（完了）/ "error"（例外）
+    """
+
+    def __init__(self, source: Callable[[], Iterator[str]], out: queue.Queue, tag: str):
+        self.tag = tag
+        self._source = source
+        self._out = out
+        self._cancelled = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"agoratheon-hedge-{tag}", daemon=True)
+        self._thread.start()
+
+    def cancel(self):
+        """打ち切る（次の差分を受け取った時点で読むのをやめる）"""
+        self._cancelled.set()
+
+    def _run(self):
+        iterator = None
+        try:
+            iterator = self._source()
+            for delta in iterator:
+                if self._cancelled.is_set():
+                    return
+                self._out.put(("delta", self.tag, delta))
+            self._out.put(("end", self.tag, None))
+        except Exception as e:
+            self._out.put(("error", self.tag, e))
+        finally:
+            close = getattr(iterator, "close", None)
+            if self._cancelled.is_set() and close:
+                try:
+                    close()
+                except Exception:
+                    pass
+
+
+class Hedger:
+    """AIごとの初回トークン時間を覚えて、予備リクエストを出すか判断する"""
+
+    def __init__(self, budget: float = None, percentile: float = None, window: int = 50):
+        """
+        Args:
+            budget: 予備リクエストを出してよい割合（AGORATHEON_HEDGE_BUDGET、デフォルト0.1）
+            percentile: 待ち時間に使うパーセンタイル（AGORATHEON_HEDGE_PERCENTILE、デフォルト0.95）
+            window: 覚えておく直近の件数
+        """
+        if budget is None:
+            budget = float(os.environ.get('AGORATHEON_HEDGE_BUDGET', '0.1'))
+        if percentile is None:
+            percentile = float(os.environ.get('AGORATHEON_HEDGE_PERCENTILE', '0.95'))
+        self.budget = budget
+        self.percentile = percentile
+        self.window = window
+
+        self._latencies: Dict[str, deque] = {}
+        # AIごとの件数: requests（リクエスト数）/ fired（予備を出した）/ won（予備が勝った）
+        self.stats: Dict[str, Dict[str, int]] = {}
+
+    def delay(self, name: str) -> float:
+        """予備リクエストを出すまでの待ち時間（直近の初回トークン時間のパーセンタイル）"""
+        samples = sorted(self._latencies.get(name, ()))
+        if len(samples) < MIN_SAMPLES:
+            return DEFAULT_DELAY
+        index = min(len(samples) - 1, int(len(samples) * self.percentile))
+        return max(MIN_DELAY, samples[index])
+
+    def stream(self, name: str, request: Callable[[dict], Iterator[str]], usage: dict) -> Iterator[str]:
+        """
+        ヘッジ付きでストリームを読む
+
+        Args:
+            name: AI名（履歴・統計のキー）
+            request: 使用量の書き込み先を受け取ってテキスト差分のイテレータを返す関数
+            usage: 採用した方の使用量を書き込む
+
+        Yields:
+            採用した方のテキスト差分
+
+        Raises:
+            採用できる応答が無かった場合、最初のリクエストの例外
+        """
+        stats = self.stats.setdefault(name, {"requests": 0, "fired": 0, "won": 0})
+        stats["requests"] += 1
+
+        events = queue.Queue()
+        usages = {"primary": {}, "backup": {}}
+        streams = {"primary": BackgroundStream(lambda: request(usages["primary"]), events, "primary")}
+        errors = {}
+        start = time.monotonic()
+        deadline = start + self.delay(name)
+
+        # どちらかが応答し始めるまで待つ
+        while True:
+            timeout = None
+            if "backup" not in streams and stats["fired"] < self.budget * stats["requests"]:
+                timeout = max(0.0, deadline - time.monotonic())
+            try:
+                kind, tag, value = events.get(timeout=timeout)
+            except queue.Empty:
+                streams["backup"] = BackgroundStream(lambda: request(usages["backup"]), events, "backup")
+                stats["fired"] += 1
+                continue
+
+            if kind == "error":
+                errors[tag] = value
+                if len(errors) == len(streams):
+                    raise errors.get("primary", value)
+                continue
+            break
+
+        winner = tag
+        for other in streams.values():
+            if other.tag != winner:
+                other.cancel()
+        if winner == "backup":
+            stats["won"] += 1
+        self._record(name, time.monotonic() - start)
+
+        try:
+            while kind != "end":
+                if kind == "error":
+                    raise value
+                yield value
+                kind, tag, value = events.get()
+                while tag != winner:
+                    kind, tag, value = events.get()
+        finally:
+            if kind != "end":
+                # 途中で読むのをやめた（または失敗した）場合は採用した方も打ち切る
+                streams[winner].cancel()
+            usage.update(usages[winner])
+
+    def format_stats(self, name: str) -> str:
+        """統計の表示用文字列"""
+        stats = self.stats.get(name)
+        if not stats:
+            return ""
+        return (f"予備リクエスト {stats['fired']}/{stats['requests']}回"
+                f"（採用 {stats['won']}回、待ち時間 {self.delay(name):.2f}秒）")
+
+    def _record(self, name: str, latency: float):
+        samples = self._latencies.get(name)
+        if samples is None:
+            samples = self._latencies[name] = deque(maxlen=self.window)
+        samples.append(latency)
@@ -0,0 +1,96 @@
+"""
+Speculative Calls for AgoraTheon
+振り分けの結果を待たずに、見込みの相手への呼び出しを先に始める
+
+- スミレんの振り分け（LLM）と並行して、見込みのAIの応答をバックグラウンドで受信しておく
+- 振り分けが一致したら受信済みの分から表示する（振り分けの待ち時間が応答時間に重なる）
+- 外れたら打ち切り、使ってしまったトークン数を数える
+"""
+
+import queue
+import time
+from typing import Callable, Iterator
+
+from .hedge import BackgroundStream
+from .tokens import estimate_tokens
+
+
+class Speculation:
+    """投機的に始めた1回の呼び出し（採用されるまで受信内容をためておく）"""
+
+    def __init__(self, name: str, source: Callable[[], Iterator[str]], history: list, data: str,
+                 context_info: dict, usage: dict):
+        """
+        Args:
+            name: 呼び出したAI
+            source: テキスト差分のイテレータを返す関数（バックグラウンドで読む）
+            history / data / context_info: 送ったコンテキスト（採用時にそのまま使う）
+            usage: 使用量の書き込み先
+        """
+        self.name = name
+        self.history = history
+        self.data = data
+        self.context_info = context_info
+        self.usage = usage
+        self.started = time.perf_counter()
+        self.first_token = None  # 最初のテキスト差分を受信した時刻（採用前でも記録する）
+        self._events = queue.Queue()
+        self._stream = BackgroundStream(lambda: self._timed(source()), self._events, name)
+
+    def _timed(self, deltas: Iterator[str]) -> Iterator[str]:
+        for delta in deltas:
+            if self.first_token is None:
+                self.first_token = time.perf_counter()
+            yield delta
+
+    def deltas(self) -> Iterator[str]:
+        """採用: 受信済みの分から順にテキスト差分を返す（失敗していればその例外を送出）"""
+        while True:
+            kind, _, value = self._events.get()
+            if kind == "end":
+                return
+            if kind == "error":
+                raise value
+            yield value
+
+    def cancel(self) -> int:
+        """破棄: 打ち切って、使ったトークン数（概算）を返す"""
+        self._stream.cancel()
+        received = []
+        while True:
+            try:
+                kind, _, value = self._events.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "delta":
+                received.append(value)
+        if self.usage.get("input_tokens"):
+            # 受信し終わっていれば実際の使用量
+            return self.usage["input_tokens"] + self.usage.get("output_tokens", 0)
+        return self.context_info["tokens"] + estimate_tokens("".join(received))
+
+
+class SpeculationStats:
+    """投機的な呼び出しの当たり外れ"""
+
+    def __init__(self):
+        self.tried = 0
+        self.hits = 0
+        self.wasted_tokens = 0
+        self.saved_time = 0.0  # 当たったときに振り分けと重ねられた時間（秒）
+
+    def record_hit(self, speculation: Speculation):
+        self.tried += 1
+        self.hits += 1
+        self.saved_time += time.perf_counter() - speculation.started
+
+    def record_miss(self, wasted_tokens: int):
+        self.tried += 1
+        self.wasted_tokens += wasted_tokens
+
+    def format(self) -> str:
+        """表示用文字列"""
+        if not self.tried:
+            return "実績なし"
+        return (f"的中 {self.hits}/{self.tried}回（{self.hits / self.tried:.0%}）、"
+                f"約{self.saved_time:.1f}秒短縮、外れで約{self.wasted_tokens:,}トークン消費")
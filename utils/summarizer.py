@@ -0,0 +1,73 @@
+"""
+Background Summarizer for AgoraTheon
+履歴から外れた発言の要約をバックグラウンドで作る
+
+要約（APIの呼び出し）だけを別スレッドで行い、討論への反映はメインスレッドで行う
+（出来上がった要約は take_results() で受け取る）。REPLはターンの後に要約を待たない。
+"""
+
+import queue
+import threading
+from typing import Callable, Hashable, List, Optional, Set, Tuple
+
+
+class BackgroundSummarizer:
+    """要約の依頼を1つずつ順に処理するワーカー"""
+
+    def __init__(self, summarize: Callable[[str, Optional[int]], str]):
+        """
+        Args:
+            summarize: (プロンプト, 最大トークン数) → 要約 を返す関数（失敗時は例外）
+        """
+        self._summarize = summarize
+        self._jobs = queue.Queue()
+        self._lock = threading.Lock()
+        self._pending = set()  # 依頼済みでまだ結果を受け取っていないキー
+        self._results: List[Tuple[Hashable, Optional[str], Optional[Exception]]] = []
+        self._thread = None
+
+    def submit(self, key: Hashable, prompt: str, max_tokens: int = None) -> bool:
+        """
+        要約を依頼（同じキーが処理中なら何もしない）
+
+        Returns:
+            依頼したか
+        """
+        with self._lock:
+            if key in self._pending:
+                return False
+            self._pending.add(key)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="agoratheon-summarizer", daemon=True)
+                self._thread.start()
+        self._jobs.put((key, prompt, max_tokens))
+        return True
+
+    @property
+    def pending(self) -> Set[Hashable]:
+        """処理中・未受け取りの依頼のキー"""
+        with self._lock:
+            return set(self._pending)
+
+    def take_results(self) -> List[Tuple[Hashable, Optional[str], Optional[Exception]]]:
+        """出来上がった (キー, 要約, 例外) を古い順に取り出す"""
+        with self._lock:
+            results, self._results = self._results, []
+            for key, _, _ in results:
+                self._pending.discard(key)
+        return results
+
+    def wait(self):
+        """依頼済みの要約がすべて出来上がるまで待つ"""
+        self._jobs.join()
+
+    def _run(self):
+        while True:
+            key, prompt, max_tokens = self._jobs.get()
+            try:
+                result = (key, self._summarize(prompt, max_tokens), None)
+            except Exception as e:
+                result = (key, None, e)
+            with self._lock:
+                self._results.append(result)
+            self._jobs.task_done()
@@ -0,0 +1,229 @@
+"""
+Telemetry for AgoraTheon
+発言ごとの計測値（レイテンシ・トークン数・費用）の記録と集計
+
+- 計測値は Message.telemetry に保存する（討論ファイルに残るので、過去のセッションも含めて集計できる）
+- /stats でAIごとの p50/p95 と合計を表示し、JSON / Prometheus テキスト形式で書き出す
+"""
+
+import os
+import json
+import bisect
+from typing import Dict, Iterable, List, Optional
+
+
+# モデルごとの料金の目安（USD / 100万トークン）: (入力, キャッシュ読込, 出力)
+# AGORATHEON_PRICE_<NAME>="入力,キャッシュ読込,出力" でAIごとに上書きできる
+PRICES = {
+    "claude-sonnet-4-20250514": (3.0, 0.3, 15.0),
+    "gemini-2.5-flash": (0.3, 0.075, 2.5),
+    "gpt-4o": (2.5, 1.25, 10.0),
+    "grok-3-fast": (5.0, 5.0, 25.0),
+}
+
+# 分布を出す計測値（Message.telemetry のキー → 表示名）
+TIMINGS = {"ttft": "初回トークン", "latency": "完了", "routing_latency": "振り分け",
+           "speculation_saved": "先行呼び出しで短縮"}
+
+
+def make_telemetry(provider: str, model: str, usage: dict, latency: float,
+                   ttft: float = None, routing_latency: float = None, speculation_saved: float = None) -> dict:
+    """
+    Message.telemetry に保存する計測値を作る
+
+    Args:
+        provider: AI名
+        model: モデル名
+        usage: generate() などが書き込んだ使用量（空なら各トークン数は None）
+        latency: 呼び出しから応答完了までの秒数
+        ttft: 初回トークンまでの秒数（ストリーミング時のみ）
+        routing_latency: スミレんの振り分けにかかった秒数（司会モード時のみ）
+        speculation_saved: 先行呼び出しが振り分けと重なった秒数（先行呼び出しを採用した時のみ）
+    """
+    return {
+        "provider": provider,
+        "model": model,
+        "input_tokens": usage.get("input_tokens"),
+        "output_tokens": usage.get("output_tokens"),
+        "cached_tokens": usage.get("cached_tokens"),
+        "ttft": _round(ttft),
+        "latency": _round(latency),
+        "routing_latency": _round(routing_latency),
+        "speculation_saved": _round(speculation_saved),
+    }
+
+
+def price_for(provider: str, model: str) -> Optional[tuple]:
+    """(入力, キャッシュ読込, 出力) の料金（USD / 100万トークン）。不明なら None"""
+    override = os.environ.get(f'AGORATHEON_PRICE_{provider.upper()}')
+    if override:
+        return tuple(float(x) for x in override.split(','))
+    return PRICES.get(model)
+
+
+def estimate_cost(telemetry: dict) -> Optional[float]:
+    """1回分の費用の目安（USD）。料金かトークン数が不明なら None"""
+    price = price_for(telemetry["provider"], telemetry.get("model") or "")
+    if price is None or telemetry.get("input_tokens") is None:
+        return None
+    cached = telemetry.get("cached_tokens") or 0
+    uncached = telemetry["input_tokens"] - cached
+    return (uncached * price[0] + cached * price[1] + (telemetry.get("output_tokens") or 0) * price[2]) / 1_000_000
+
+
+def percentile(values: List[float], p: float) -> Optional[float]:
+    """パーセンタイル（最近傍順位法）。値が無ければ None"""
+    return _sorted_percentile(sorted(values), p)
+
+
+def _sorted_percentile(values: List[float], p: float) -> Optional[float]:
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+class TelemetryAggregate:
+    """
+    計測値の集計を1件ずつ積み上げる（ターンごとに全発言を集計し直さない）
+    分布はソート済みのリストで持つので、パーセンタイルは並べ替えずに取り出せる
+    """
+
+    def __init__(self):
+        self._entries: Dict[str, dict] = {}
+        self._samples: Dict[str, Dict[str, List[float]]] = {}
+        self._sums: Dict[str, Dict[str, float]] = {}
+
+    def add(self, t: dict):
+        """1回分の計測値を加える"""
+        name = t["provider"]
+        entry = self._entries.get(name)
+        if entry is None:
+            entry = self._entries[name] = {"turns": 0, "models": [], "input_tokens": 0, "output_tokens": 0,
+                                           "cached_tokens": 0, "cost": 0.0, "priced_turns": 0}
+            self._samples[name] = {key: [] for key in TIMINGS}
+            self._sums[name] = {key: 0.0 for key in TIMINGS}
+        entry["turns"] += 1
+        if t.get("model") and t["model"] not in entry["models"]:
+            entry["models"].append(t["model"])
+        for key in ("input_tokens", "output_tokens", "cached_tokens"):
+            entry[key] += t.get(key) or 0
+        cost = estimate_cost(t)
+        if cost is not None:
+            entry["cost"] += cost
+            entry["priced_turns"] += 1
+        for key in TIMINGS:
+            if t.get(key) is not None:
+                bisect.insort(self._samples[name][key], t[key])
+                self._sums[name][key] += t[key]
+
+    def summary(self) -> Dict[str, dict]:
+        """summarize() と同じ形式の集計結果"""
+        result = {}
+        for name, entry in self._entries.items():
+            entry = dict(entry, models=list(entry["models"]))
+            for key, values in self._samples[name].items():
+                entry[key] = {"p50": _sorted_percentile(values, 0.5), "p95": _sorted_percentile(values, 0.95),
+                              "count": len(values), "sum": round(self._sums[name][key], 3)}
+            result[name] = entry
+        return result
+
+
+def summarize(telemetries: Iterable[dict]) -> Dict[str, dict]:
+    """
+    AIごとに集計
+
+    Returns:
+        AI名 → {"turns", "models", "input_tokens", "output_tokens", "cached_tokens", "cost",
+                 "ttft"/"latency"/"routing_latency"/"speculation_saved": {"p50", "p95", "count", "sum"}}
+    """
+    aggregate = TelemetryAggregate()
+    for t in telemetries:
+        aggregate.add(t)
+    return aggregate.summary()
+
+
+def format_stats(summary: Dict[str, dict], icons: Dict[str, str] = None) -> str:
+    """/stats の表示用文字列"""
+    if not summary:
+        return "計測データがありません"
+    icons = icons or {}
+    lines = []
+    totals = {"turns": 0, "input_tokens": 0, "output_tokens": 0, "cost": 0.0}
+    for name, entry in summary.items():
+        lines.append(f"{icons.get(name, '')}{name}（{entry['turns']}回、{', '.join(entry['models']) or 'モデル不明'}）")
+        timings = []
+        for key, label in TIMINGS.items():
+            stats = entry[key]
+            if stats["count"]:
+                timings.append(f"{label} p50 {stats['p50']:.2f}秒 / p95 {stats['p95']:.2f}秒")
+        if timings:
+            lines.append("  " + "、".join(timings))
+        tokens = (f"  入力 {entry['input_tokens']:,}（キャッシュ {entry['cached_tokens']:,}）"
+                  f" / 出力 {entry['output_tokens']:,}トークン")
+        if entry["priced_turns"]:
+            tokens += f" / 約${entry['cost']:.4f}"
+        lines.append(tokens)
+        for key in totals:
+            totals[key] += entry[key]
+    lines.append(f"合計: {totals['turns']}回 / 入力 {totals['input_tokens']:,} / 出力 {totals['output_tokens']:,}トークン"
+                 f" / 約${totals['cost']:.4f}")
+    return "\n".join(lines)
+
+
+def to_json(summary: Dict[str, dict]) -> str:
+    """集計結果の JSON"""
+    return json.dumps({"providers": summary}, ensure_ascii=False, indent=2)
+
+
+def to_prometheus(summary: Dict[str, dict]) -> str:
+    """集計結果の Prometheus テキスト形式（node_exporter の textfile collector 用）"""
+    lines = [
+        "# HELP agoratheon_turns_total Completed turns per provider.",
+        "# TYPE agoratheon_turns_total counter",
+    ]
+    for name, entry in summary.items():
+        lines.append(f'agoratheon_turns_total{{provider="{name}"}} {entry["turns"]}')
+
+    lines += [
+        "# HELP agoratheon_tokens_total Tokens used per provider.",
+        "# TYPE agoratheon_tokens_total counter",
+    ]
+    for name, entry in summary.items():
+        for kind in ("input", "output", "cached"):
+            lines.append(f'agoratheon_tokens_total{{provider="{name}",kind="{kind}"}} {entry[kind + "_tokens"]}')
+
+    lines += [
+        "# HELP agoratheon_cost_usd_total Estimated cost per provider in USD.",
+        "# TYPE agoratheon_cost_usd_total counter",
+    ]
+    for name, entry in summary.items():
+        lines.append(f'agoratheon_cost_usd_total{{provider="{name}"}} {entry["cost"]:.6f}')
+
+    for key, help_text in (("ttft", "Time to first token"), ("latency", "Total response latency"),
+                           ("routing_latency", "Sumire routing latency"),
+                           ("speculation_saved", "Routing time overlapped by a speculative call")):
+        metric = f"agoratheon_{key}_seconds"
+        lines += [
+            f"# HELP {metric} {help_text} per provider in seconds.",
+            f"# TYPE {metric} summary",
+        ]
+        for name, entry in summary.items():
+            stats = entry[key]
+            if not stats["count"]:
+                continue
+            for q, quantile in (("p50", "0.5"), ("p95", "0.95")):
+                lines.append(f'{metric}{{provider="{name}",quantile="{quantile}"}} {stats[q]}')
+            lines.append(f'{metric}_sum{{provider="{name}"}} {stats["sum"]}')
+            lines.append(f'{metric}_count{{provider="{name}"}} {stats["count"]}')
+    return "\n".join(lines) + "\n"
+
+
+def render(summary: Dict[str, dict], path: str) -> str:
+    """書き出し先の拡張子に合わせた形式（.prom / .txt なら Prometheus、それ以外は JSON）"""
+    if path.endswith(('.prom', '.txt')):
+        return to_prometheus(summary)
+    return to_json(summary)
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return None if value is None else round(value, 3)
@@ -0,0 +1,32 @@
+"""
+Token Estimation for AgoraTheon
+トークン数の概算（日本語対応）
+
+各社のトークナイザを読み込まずに済むよう、文字種ごとの平均で概算する
+- ひらがな・カタカナ・漢字・全角記号: 1文字 ≒ 1トークン
+- それ以外（英数字・半角記号など）: 4文字 ≒ 1トークン
+"""
+
+import re
+
+
+# 日本語（CJK）として数える文字
+_CJK_PATTERN = re.compile(
+    r'[\u3000-\u30ff'   # 全角記号・ひらがな・カタカナ
+    r'\u3400-\u4dbf'    # CJK統合漢字拡張A
+    r'\u4e00-\u9fff'    # CJK統合漢字
+    r'\uf900-\ufaff'    # CJK互換漢字
+    r'\uff00-\uffef]'   # 全角英数・半角カナ
+)
+
+# それ以外の文字の 1トークンあたりの文字数
+_CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """テキストのトークン数を概算"""
+    if not text:
+        return 0
+    cjk = len(_CJK_PATTERN.findall(text))
+    other = len(text) - cjk
+    return cjk + (other + _CHARS_PER_TOKEN - 1) // _CHARS_PER_TOKEN